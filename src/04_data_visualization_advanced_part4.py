@@ -1,169 +1,318 @@
-from flask import Flask, render_template, jsonify
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import plotly.utils
-import pandas as pd
-import json
+from flask import Flask, render_template, jsonify, request, make_response, abort, g, has_request_context
+import logging
 import os
-from pathlib import Path
-from functools import lru_cache
+import sys
+import time
+from dataset_snapshot import load_reviews
+from chunked_aggregation import aggregate_reviews
+from dashboard_data import AggregateData, DashboardData, DashboardLoader
+from dashboard_logging import configure_logging
+from dashboard_metrics import CONTENT_TYPE, SIZE_BUCKETS, Counter, Gauge, MetricsRegistry, timed
+from dataset_reloader import DatasetReloader
+from figure_executor import FigureExecutor
+from figure_graph import FigureGraph
+from figure_json import dumps, encode_panels, encoded_template, payload_sizes
+from review_ingest import ingest_records, parse_jsonl
+from response_cache import ResponseCache, make_entry, negotiate
+from score_batcher import ScoreBatcher
+from score_cache import DEFAULT_CACHE_PATH
+from sentiment_scoring import SENTIMENT_LABELS, classify_codes, preprocess
+from sentiment_timeline import COUNT_COLUMNS, bucket_dates, to_bucket
+import numpy as np
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Setup template directory
 template_dir = os.path.abspath('../templates')
 app = Flask(__name__, template_folder=template_dir)
 
-@lru_cache(maxsize=1)
+DATA_PATH = os.environ.get('DASHBOARD_DATA_PATH',
+                           '../data/processed/final_indepth_sentiment_analysis_w_processed_category.csv')
+
+# Encoded dashboard responses with their gzip/brotli variants, bounded by total size
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('DASHBOARD_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Precompute every category's response before serving
+WARM_CACHE_ON_STARTUP = os.environ.get('DASHBOARD_WARM_CACHE', '0') == '1'
+# Seconds between checks of DATA_PATH for a new dataset; 0 disables hot reloading
+RELOAD_INTERVAL = float(os.environ.get('DASHBOARD_RELOAD_INTERVAL', 30))
+# Serve / as a skeleton whose panels are fetched one by one
+PROGRESSIVE_DASHBOARD = os.environ.get('DASHBOARD_PROGRESSIVE', '0') == '1'
+# How the figures of a response are built: 'thread', 'process' or 'serial'
+FIGURE_EXECUTOR = os.environ.get('DASHBOARD_FIGURE_EXECUTOR', 'thread')
+FIGURE_WORKERS = int(os.environ.get('DASHBOARD_FIGURE_WORKERS', 0)) or None
+# Seconds a response waits for its figures before serving placeholders
+FIGURE_TIMEOUT = float(os.environ.get('DASHBOARD_FIGURE_TIMEOUT', 10))
+# Aggregate the dataset in chunks of OUT_OF_CORE_CHUNK_ROWS reviews instead of loading it
+OUT_OF_CORE = os.environ.get('DASHBOARD_OUT_OF_CORE', '0') == '1'
+OUT_OF_CORE_CHUNK_ROWS = int(os.environ.get('DASHBOARD_CHUNK_ROWS', 1_000_000))
+# Processes counting the cube of a full load, over partitions of the ASINs
+AGGREGATION_WORKERS = int(os.environ.get('DASHBOARD_AGGREGATION_WORKERS', 1))
+# POST /score: texts per scoring batch, milliseconds a batch waits for more requests,
+# and the score cache file ('' scores without one)
+SCORE_BATCH_SIZE = int(os.environ.get('DASHBOARD_SCORE_BATCH_SIZE', 32))
+SCORE_BATCH_WAIT = float(os.environ.get('DASHBOARD_SCORE_BATCH_WAIT_MS', 5)) / 1000
+SCORE_CACHE_PATH = os.environ.get('DASHBOARD_SCORE_CACHE', DEFAULT_CACHE_PATH)
+# Texts accepted by one /score request, and seconds it waits for their scores
+SCORE_MAX_TEXTS = 1000
+SCORE_TIMEOUT = 30
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
+# Metrics of this process, served on /metrics
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram('dashboard_request_duration_seconds',
+                                    'Time to answer a request, by route',
+                                    ['route', 'method', 'status'])
+response_bytes = metrics.histogram('dashboard_response_bytes',
+                                   'Size of response bodies as sent, by route',
+                                   ['route'], buckets=SIZE_BUCKETS)
+figure_seconds = metrics.histogram('dashboard_figure_build_duration_seconds',
+                                   'Time spent in each create_* figure builder',
+                                   ['function'])
+panel_bytes = metrics.histogram('dashboard_panel_bytes',
+                                'Encoded size of each panel, before compression',
+                                ['panel'], buckets=SIZE_BUCKETS)
+dataset_load_seconds = metrics.histogram('dashboard_dataset_load_duration_seconds',
+                                         'Time to load the dataset and build its aggregates')
+payload_sizes.observers.append(lambda panel, size: panel_bytes.observe(size, panel=panel))
+score_batch_texts = metrics.histogram('dashboard_score_batch_texts',
+                                      'Texts per /score scoring batch',
+                                      buckets=tuple(2 ** i for i in range(11)))
+score_batch_seconds = metrics.histogram('dashboard_score_batch_duration_seconds',
+                                        'Time to score one /score batch')
+scored_texts = metrics.counter('dashboard_scored_texts_total',
+                               'Texts classified by /score, by whether they went through the analyzers',
+                               ['source'])
+
+score_batcher = ScoreBatcher(SCORE_BATCH_SIZE, SCORE_BATCH_WAIT, SCORE_CACHE_PATH or None)
+
+def observe_score_batch(requests, texts, analyzed, seconds):
+    score_batch_texts.observe(texts)
+    score_batch_seconds.observe(seconds)
+    scored_texts.inc(analyzed, source='analyzed')
+    scored_texts.inc(texts - analyzed, source='cached')
+
+score_batcher.observers.append(observe_score_batch)
+
+def read_dashboard_data():
+    """Load the review store and build the cube and rankings the charts read from
+
+    Reads the binary snapshot next to the CSV when it is up to date, and falls
+    back to parsing the CSV (and rebuilding the snapshot) when it is not. In
+    out-of-core mode only the aggregates are kept, counted chunk by chunk.
+    """
+    start = time.perf_counter()
+    if OUT_OF_CORE:
+        cube, reviews, version = aggregate_reviews(DATA_PATH, OUT_OF_CORE_CHUNK_ROWS)
+        data = AggregateData(cube, reviews, version)
+    else:
+        store = load_reviews(DATA_PATH)
+        data = DashboardData(store, workers=AGGREGATION_WORKERS)
+    seconds = time.perf_counter() - start
+    dataset_load_seconds.observe(seconds)
+    logger.info("Loaded %d reviews (%d bytes held) in %.2fs", data.reviews, data.nbytes(), seconds,
+                extra={'reviews': data.reviews, 'version': data.version, 'seconds': seconds})
+    return data
+
+dashboard_loader = DashboardLoader(read_dashboard_data)
+
 def load_data():
-    df = pd.read_csv('../data/processed/final_indepth_sentiment_analysis_w_processed_category.csv')
-    df['review_date'] = pd.to_datetime(df['review_date'])
-    return df
+    """Dashboard data of the current request, or the current version outside of requests
+
+    A request keeps the version it started with even when a reload swaps in a
+    new one while it runs.
+    """
+    if not has_request_context():
+        return dashboard_loader.get()
+    if 'dashboard_data' not in g:
+        g.dashboard_data = dashboard_loader.get()
+    return g.dashboard_data
+
+def on_dataset_reload(data):
+    """Drop the responses of replaced versions once a reload has swapped in data"""
+    response_cache.retain_version(data.version)
+    logger.info("Reloaded %d reviews as version %s in %.2fs",
+                data.reviews, data.version, dashboard_loader.load_seconds,
+                extra={'reviews': data.reviews, 'version': data.version,
+                       'seconds': dashboard_loader.load_seconds})
+    if WARM_CACHE_ON_STARTUP:
+        warm_response_cache()
+
+dataset_reloader = None
+
+def start_reloader():
+    """Start the background reloader of this process, once"""
+    global dataset_reloader
+    if dataset_reloader is None or dataset_reloader.pid != os.getpid():
+        dataset_reloader = DatasetReloader(DATA_PATH, dashboard_loader, RELOAD_INTERVAL, on_dataset_reload)
+        dataset_reloader.pid = os.getpid()
+        dataset_reloader.start()
+    return dataset_reloader
 
-def create_rating_sentiment_distribution_plot(df):
+def is_all_categories(category):
+    """True when no specific category filter was requested"""
+    return not category or category in ['All Categories', 'all']
+
+def select_category(cube, overall_category=None):
+    """Sub-cube of one overall_category, or the whole cube"""
+    if is_all_categories(overall_category):
+        return cube
+    return cube.select(overall_category=overall_category)
+
+def valid_brand_table(cube, main_category=None):
+    """Sentiment counts of known brands with at least 10 reviews, largest first"""
+    if not is_all_categories(main_category):
+        cube = cube.select(main_category=main_category)
+    
+    brand_df = cube.sentiment_table('brand')
+    brand_df = brand_df[(brand_df.index != 'Unknown Brand') & (brand_df['total'] >= 10)]
+    brand_df = brand_df.sort_values('total', ascending=False, kind='stable')
+    return brand_df.rename_axis('brand').reset_index()
+
+def message_figure(text, height=400):
+    """Empty figure showing text in its middle"""
+    layout = dict(
+        annotations=[dict(
+            text=text,
+            xref="paper",
+            yref="paper",
+            x=0.5,
+            y=0.5,
+            showarrow=False
+        )],
+        height=height
+    )
+    return dict(data=[], layout=layout)
+
+def placeholder_figure(name):
+    """Stand-in for a figure that did not finish in time"""
+    return message_figure("This chart is taking longer than usual, reload the page to try again")
+
+@timed(figure_seconds)
+def create_rating_sentiment_distribution_plot(cube, rating_counts=None):
     """Grouped bar chart of sentiment distribution by rating"""
-    ratings = sorted(df['overall'].unique())
+    if rating_counts is None:
+        rating_counts = cube.rating_sentiment_counts()
+    ratings = sorted(rating_counts.index)
     sentiments = ['positive', 'neutral', 'negative']
     colors = {'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}
     
     data = []
     for sentiment in sentiments:
-        counts = [len(df[(df['overall'] == rating) & (df['sentiment'] == sentiment)]) for rating in ratings]
-        data.append(
-            go.Bar(
-                name=sentiment,
-                x=ratings,
-                y=counts,
-                marker_color=colors[sentiment]
-            )
-        )
-    
-    fig = go.Figure(data=data)
+        counts = [
+            int(rating_counts.at[rating, sentiment])
+            if rating in rating_counts.index and sentiment in rating_counts.columns else 0
+            for rating in ratings
+        ]
+        data.append(dict(
+            type='bar',
+            name=sentiment,
+            x=[int(rating) for rating in ratings],
+            y=counts,
+            marker=dict(color=colors[sentiment])
+        ))
     
-    fig.update_layout(
-        title='Sentiment Distribution by Rating for Electronic Products',
-        xaxis_title='Rating Score',
-        yaxis_title='Number of Reviews',
+    layout = dict(
+        title=dict(text='Sentiment Distribution by Rating for Electronic Products'),
+        xaxis=dict(title=dict(text='Rating Score')),
+        yaxis=dict(title=dict(text='Number of Reviews')),
         barmode='group',
         showlegend=True
     )
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return dict(data=data, layout=layout)
 
-def create_category_distribution_plot(df):
+@timed(figure_seconds)
+def create_category_distribution_plot(cube, category_df=None):
     """Distribution of reviews across categories"""
-    # Debug prints
-    print("\nUnique categories before filtering:")
-    print(df['overall_category'].unique())
+    if category_df is None:
+        category_df = cube.sentiment_table('overall_category')
+    category_counts = category_df['total']
     
     # Filter out Uncategorized before getting counts
-    df_filtered = df[df['overall_category'] != 'Uncategorized']
-    
-    # Debug prints
-    print("\nUnique categories after filtering:")
-    print(df_filtered['overall_category'].unique())
-    
-    category_counts = df_filtered['overall_category'].value_counts().head(10)
-    
-    # Debug prints
-    print("\nTop 10 categories and their counts:")
-    print(category_counts)
-    
-    fig = go.Figure(data=[
-        go.Bar(
-            x=category_counts.values,
-            y=category_counts.index,
-            orientation='h',
-            marker_color='#3498db'
-        )
-    ])
-    
-    fig.update_layout(
-        title='Top 10 Product Categories by Review Count',
-        xaxis_title='Number of Reviews',
-        yaxis_title='Category',
+    category_counts = category_counts[category_counts.index != 'Uncategorized']
+    
+    category_counts = category_counts.sort_values(ascending=False, kind='stable').head(10)
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Unique categories before filtering: %s", list(cube.values('overall_category')))
+        logger.debug("Top 10 categories and their counts: %s", category_counts.to_dict())
+    
+    data = [dict(
+        type='bar',
+        x=category_counts.to_numpy(),
+        y=category_counts.index.to_numpy(),
+        orientation='h',
+        marker=dict(color='#3498db')
+    )]
+    
+    layout = dict(
+        title=dict(text='Top 10 Product Categories by Review Count'),
+        xaxis=dict(title=dict(text='Number of Reviews')),
+        yaxis=dict(title=dict(text='Category')),
         height=400,
         showlegend=False
     )
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return dict(data=data, layout=layout)
 
-def create_enhanced_category_distribution_plot(df):
+@timed(figure_seconds)
+def create_enhanced_category_distribution_plot(cube, category_df=None):
     # Filter out unwanted categories and get sentiment counts
-    df_filtered = df[
-        (df['overall_category'].notna()) & 
-        (df['overall_category'] != 'Uncategorized') & 
-        (df['overall_category'].str.strip() != '')
+    if category_df is None:
+        category_df = cube.sentiment_table('overall_category')
+    category_df = category_df[
+        (category_df.index.notna()) & 
+        (category_df.index != 'Uncategorized') & 
+        (category_df.index.str.strip() != '')
     ]
-    
-    category_sentiment = []
-    for category in df_filtered['overall_category'].unique():
-        category_data = df_filtered[df_filtered['overall_category'] == category]
-        sentiment_counts = category_data['sentiment'].value_counts()
-        total = len(category_data)
-        
-        positive_count = sentiment_counts.get('positive', 0)
-        neutral_count = sentiment_counts.get('neutral', 0)
-        negative_count = sentiment_counts.get('negative', 0)
-        
-        category_sentiment.append({
-            'category': category,
-            'positive': positive_count,
-            'neutral': neutral_count,
-            'negative': negative_count,
-            'total': total,
-            'positive_pct': (positive_count/total)*100,
-            'neutral_pct': (neutral_count/total)*100,
-            'negative_pct': (negative_count/total)*100
-        })
-    
-    category_df = pd.DataFrame(category_sentiment)
+    category_df = category_df.rename_axis('category').reset_index()
     top_categories = category_df.nlargest(5, 'positive')
     
-    fig = go.Figure()
-    
+    data = []
     for sentiment in ['positive', 'neutral', 'negative']:
-        fig.add_trace(go.Bar(
+        data.append(dict(
+            type='bar',
             name=sentiment,
-            x=top_categories[sentiment],
-            y=top_categories['category'],
+            x=top_categories[sentiment].to_numpy(),
+            y=top_categories['category'].to_numpy(),
             orientation='h',
-            marker_color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment],
-            customdata=top_categories[[f'{sentiment}_pct', sentiment]].values,
+            marker=dict(color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment]),
+            customdata=top_categories[[f'{sentiment}_pct', sentiment]].to_numpy(dtype=float),
             hovertemplate=f"{sentiment} count: %{{customdata[1]}}<br>" +
                          f"{sentiment}: %{{customdata[0]:.1f}}%<br>" +
                          "<extra></extra>"
         ))
 
-    fig.update_layout(
+    layout = dict(
         barmode='stack',
-        title='Top 5 Categories by Positive Review Count',
-        xaxis_title='Number of Reviews',
-        yaxis_title='Category',
+        title=dict(text='Top 5 Categories by Positive Review Count'),
+        xaxis=dict(title=dict(text='Number of Reviews')),
+        yaxis=dict(title=dict(text='Category')),
         height=400,
         hovermode='y unified'
     )
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return dict(data=data, layout=layout)
 
-def create_overall_sentiment_plot(df, overall_category=None):
+@timed(figure_seconds)
+def create_overall_sentiment_plot(cube, overall_category=None, category_cube=None):
     # Filter data
-    filtered_df = df.copy()
-    if overall_category and overall_category not in ['All Categories', 'all']:
-        filtered_df = filtered_df[filtered_df['overall_category'] == overall_category]
+    cube = category_cube if category_cube is not None else select_category(cube, overall_category)
     
     # Get sentiment counts
-    sentiment_counts = filtered_df['sentiment'].value_counts()
-    total_reviews = len(filtered_df)
+    sentiment_counts = cube.sentiment_counts()
+    total_reviews = cube.total()
     
-    # Print debug information
-    print(f"\nCategory: {overall_category}")
-    print(f"Total reviews: {total_reviews}")
-    print("Sentiment counts:", sentiment_counts.to_dict())
+    logger.debug("Category %s: %d reviews, sentiment counts %s",
+                 overall_category, total_reviews, sentiment_counts.to_dict())
     
     # Create pie chart
-    fig = go.Figure(data=[go.Pie(
-        labels=sentiment_counts.index,
-        values=sentiment_counts.values,
+    data = [dict(
+        type='pie',
+        labels=sentiment_counts.index.to_numpy(),
+        values=sentiment_counts.to_numpy(),
         marker=dict(colors=[
             '#3498db',  # positive
             '#9b59b6',  # neutral
@@ -174,10 +323,9 @@ def create_overall_sentiment_plot(df, overall_category=None):
                       "Count: %{value}<br>" +
                       "Percentage: %{percent}<br>" +
                       "<extra></extra>"
-    )])
+    )]
     
-    # Update layout
-    fig.update_layout(
+    layout = dict(
         title=dict(
             text=f'Overall Sentiment Distribution {f"- {overall_category}" if overall_category and overall_category not in ["All Categories", "all"] else ""}<br>Total Reviews: {total_reviews}',
             y=0.95
@@ -186,111 +334,80 @@ def create_overall_sentiment_plot(df, overall_category=None):
         showlegend=True
     )
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return dict(data=data, layout=layout)
 
-def create_rating_sentiment_plot(df, overall_category=None):
-    filtered_df = df.copy()
-    if overall_category and overall_category not in ['All Categories', 'all']:
-        filtered_df = filtered_df[filtered_df['overall_category'] == overall_category]
+@timed(figure_seconds)
+def create_rating_sentiment_plot(cube, overall_category=None, rating_counts=None):
+    if rating_counts is None:
+        rating_counts = select_category(cube, overall_category).rating_sentiment_counts()
+    # Ratings without reviews get empty bars rather than 0/0
+    rating_sentiment = (rating_counts.div(rating_counts.sum(axis=1), axis=0) * 100).fillna(0)
     
-    rating_sentiment = pd.crosstab(filtered_df['overall'], filtered_df['sentiment'], normalize='index') * 100
-    
-    fig = go.Figure()
+    data = []
     for sentiment in ['positive', 'neutral', 'negative']:
         if sentiment in rating_sentiment.columns:
-            fig.add_trace(go.Bar(
+            data.append(dict(
+                type='bar',
                 name=sentiment,
-                x=rating_sentiment.index,
-                y=rating_sentiment[sentiment],
-                marker_color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment]
+                x=rating_sentiment.index.to_numpy(),
+                y=rating_sentiment[sentiment].to_numpy(),
+                marker=dict(color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment])
             ))
     
     title = f'Sentiment Distribution by Rating - {overall_category}' if overall_category and overall_category not in ['All Categories', 'all'] else 'Sentiment Distribution by Rating'
     
-    fig.update_layout(
+    layout = dict(
         barmode='stack',
-        title=title,
-        xaxis_title='Rating',
-        yaxis_title='Percentage',
+        title=dict(text=title),
+        xaxis=dict(title=dict(text='Rating')),
+        yaxis=dict(title=dict(text='Percentage')),
         showlegend=True
     )
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return dict(data=data, layout=layout)
 
-def create_brand_sentiment_analysis_plot(df, main_category=None):
-    if main_category and main_category not in ['All Categories', 'all']:
-        df = df[df['main_category'] == main_category]
-    
-    df = df[df['brand'] != 'Unknown Brand']
-    brand_counts = df['brand'].value_counts()
-    valid_brands = brand_counts[brand_counts >= 10].index
-    
-    brand_sentiment = []
-    for brand in valid_brands:
-        brand_data = df[df['brand'] == brand]
-        sentiment_counts = brand_data['sentiment'].value_counts()
-        total = len(brand_data)
-        
-        positive_count = sentiment_counts.get('positive', 0)
-        neutral_count = sentiment_counts.get('neutral', 0)
-        negative_count = sentiment_counts.get('negative', 0)
-        
-        brand_sentiment.append({
-            'brand': brand,
-            'positive': positive_count,
-            'neutral': neutral_count,
-            'negative': negative_count,
-            'total': total,
-            'positive_pct': (positive_count/total)*100,
-            'neutral_pct': (neutral_count/total)*100,
-            'negative_pct': (negative_count/total)*100
-        })
-    
-    brand_df = pd.DataFrame(brand_sentiment)
+@timed(figure_seconds)
+def create_brand_sentiment_analysis_plot(cube, main_category=None, brand_df=None):
+    if brand_df is None:
+        brand_df = valid_brand_table(cube, main_category)
     if not brand_df.empty:
         top_brands = brand_df.nlargest(10, 'total')
         
-        fig = go.Figure()
-        
+        data = []
         for sentiment in ['positive', 'neutral', 'negative']:
-            fig.add_trace(go.Bar(
+            data.append(dict(
+                type='bar',
                 name=sentiment,
-                x=top_brands[sentiment],
-                y=top_brands['brand'],
+                x=top_brands[sentiment].to_numpy(),
+                y=top_brands['brand'].to_numpy(),
                 orientation='h',
-                marker_color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment],
-                customdata=top_brands[[f'{sentiment}_pct', sentiment]].values,
+                marker=dict(color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment]),
+                customdata=top_brands[[f'{sentiment}_pct', sentiment]].to_numpy(dtype=float),
                 hovertemplate=f"{sentiment} count: %{{customdata[1]}}<br>" +
                              f"{sentiment}: %{{customdata[0]:.1f}}%<br>" +
                              "<extra></extra>"
             ))
 
         title = 'Top 10 Brands by Review Volume and Sentiment Distribution'
-        if main_category and main_category not in ['All Categories', 'all']:
+        if not is_all_categories(main_category):
             title += f' - {main_category}'
 
-        fig.update_layout(
+        layout = dict(
             barmode='stack',
-            title=title,
-            xaxis_title='Number of Reviews',
-            yaxis_title='Brand',
+            title=dict(text=title),
+            xaxis=dict(title=dict(text='Number of Reviews')),
+            yaxis=dict(title=dict(text='Brand')),
             height=500,
             hovermode='y unified'
         )
     else:
-        fig = go.Figure()
-        fig.update_layout(
-            title='No brands with sufficient reviews in this category',
+        data = []
+        layout = dict(
+            title=dict(text='No brands with sufficient reviews in this category'),
             height=500
         )
     
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-
+    return dict(data=data, layout=layout)
 
-import pandas as pd
-import pandas as pd
-import plotly.graph_objects as go
-import json
-import plotly.utils
 
 def process_title(title):
     """Process title to make it more readable and concise"""
@@ -323,93 +440,17 @@ def process_title(title):
         
     return title
 
-def create_top_products_plot(df, overall_category=None, sentiment_type='positive'):
+@timed(figure_seconds)
+def create_top_products_plot(ranking, overall_category=None, sentiment_type='positive'):
     """Create visualization of top 5 products by positive reviews and ratio"""
-    filtered_df = df.copy()
-    if overall_category and overall_category not in ['All Categories', 'all']:
-        filtered_df = filtered_df[filtered_df['overall_category'] == overall_category]
-    
-    filtered_df = filtered_df[
-        (filtered_df['title'].notna()) & 
-        (filtered_df['title'] != '') & 
-        (~filtered_df['title'].str.lower().str.contains('untitled', na=False))
-    ]
+    category = None if is_all_categories(overall_category) else overall_category
+    top_products = ranking.top(category, sentiment_type)
     
-    product_counts = filtered_df['asin'].value_counts()
-    valid_products = product_counts[product_counts >= 5].index
+    if top_products.empty:
+        return message_figure("No products with sufficient reviews in this category")
     
-    if len(valid_products) == 0:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No products with sufficient reviews in this category",
-            xref="paper",
-            yref="paper",
-            x=0.5,
-            y=0.5,
-            showarrow=False
-        )
-        fig.update_layout(height=400)
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    
-    product_sentiment = []
-    for asin in valid_products:
-        product_data = filtered_df[filtered_df['asin'] == asin]
-        sentiment_counts = product_data['sentiment'].value_counts()
-        total = len(product_data)
-        
-        original_title = product_data['title'].iloc[0]
-        processed_title = process_title(original_title)
-        
-        positive_count = sentiment_counts.get('positive', 0)
-        neutral_count = sentiment_counts.get('neutral', 0)
-        negative_count = sentiment_counts.get('negative', 0)
-        
-        # Calculate percentages
-        positive_pct = (positive_count / total) * 100
-        neutral_pct = (neutral_count / total) * 100
-        negative_pct = (negative_count / total) * 100
-        
-        # Format ratio as counts
-        if sentiment_type == 'positive':
-            non_positive = neutral_count + negative_count
-            ratio = f"{positive_count}:{non_positive}"
-            score_ratio = positive_count / (non_positive if non_positive > 0 else 1)
-            sentiment_score = positive_count * score_ratio
-        else:
-            non_negative = neutral_count + positive_count
-            ratio = f"{negative_count}:{non_negative}"
-            score_ratio = negative_count / (non_negative if non_negative > 0 else 1)
-            sentiment_score = negative_count * score_ratio
-        
-        product_sentiment.append({
-            'asin': asin,
-            'title': processed_title,
-            'original_title': original_title,
-            'positive_count': positive_count,
-            'neutral_count': neutral_count,
-            'negative_count': negative_count,
-            'positive_pct': positive_pct,
-            'neutral_pct': neutral_pct,
-            'negative_pct': negative_pct,
-            'ratio': ratio,
-            'sentiment_score': sentiment_score
-        })
-    
-    product_df = pd.DataFrame(product_sentiment)
-    if product_df.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No products meet the criteria",
-            xref="paper",
-            yref="paper",
-            x=0.5,
-            y=0.5,
-            showarrow=False
-        )
-        fig.update_layout(height=400)
-        return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-        
-    top_products = product_df.nlargest(5, 'sentiment_score')
+    # Only the winners need readable titles
+    top_products = top_products.assign(title=top_products['original_title'].map(process_title))
     
     # Create y-axis labels with title, ASIN, and ratio
     y_labels = [
@@ -417,31 +458,31 @@ def create_top_products_plot(df, overall_category=None, sentiment_type='positive
         for row in top_products.itertuples()
     ]
     
-    fig = go.Figure()
-    
     hover_templates = {
         'positive': "count: %{x}<br>percentage: %{customdata[0]:.1f}%",
         'neutral': "count: %{x}<br>percentage: %{customdata[0]:.1f}%",
         'negative': "count: %{x}<br>percentage: %{customdata[0]:.1f}%"
     }
     
+    data = []
     for sentiment in ['positive', 'neutral', 'negative']:
         count_col = f'{sentiment}_count'
         pct_col = f'{sentiment}_pct'
         
-        fig.add_trace(go.Bar(
+        data.append(dict(
+            type='bar',
             name=sentiment,
-            x=top_products[count_col],
+            x=top_products[count_col].to_numpy(),
             y=y_labels,  # Use formatted y-labels instead of positions
             orientation='h',
-            marker_color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment],
-            customdata=top_products[[pct_col]].values,
+            marker=dict(color={'positive': '#3498db', 'neutral': '#9b59b6', 'negative': '#1abc9c'}[sentiment]),
+            customdata=top_products[[pct_col]].to_numpy(dtype=float),
             hovertemplate=hover_templates[sentiment] + "<extra></extra>"
         ))
     
     # Add ratio explanation note
     note_text = "Note: Ratio refers to positive:(neutral + negative)" if sentiment_type == 'positive' else "Note: Ratio refers to negative:(positive + neutral)"
-    fig.add_annotation(
+    note = dict(
         text=note_text,
         xref='paper',
         yref='paper',
@@ -454,19 +495,20 @@ def create_top_products_plot(df, overall_category=None, sentiment_type='positive
     
     title_prefix = 'Top 5'
     title = f'{title_prefix} {sentiment_type.capitalize()} Products'
-    if overall_category and overall_category not in ['All Categories', 'all']:
+    if not is_all_categories(overall_category):
         title += f' - {overall_category}'
         
-    fig.update_layout(
+    layout = dict(
+        annotations=[note],
         barmode='stack',
-        title=title + '<br><sup>Based on both review count and sentiment ratio</sup>',
+        title=dict(text=title + '<br><sup>Based on both review count and sentiment ratio</sup>'),
         xaxis=dict(
-            title='Number of Reviews',
+            title=dict(text='Number of Reviews'),
             range=[0, None],
             zeroline=True,
         ),
         yaxis=dict(
-            title='Products',
+            title=dict(text='Products'),
             tickmode='array',
             ticktext=y_labels,
             tickvals=list(range(len(y_labels)))
@@ -475,31 +517,163 @@ def create_top_products_plot(df, overall_category=None, sentiment_type='positive
         width=1000,
         hovermode='y unified',
         margin=dict(l=300, r=20, t=80, b=80),
-        legend_title_text='Sentiment Categories',
+        legend=dict(title=dict(text='Sentiment Categories')),
         showlegend=True
     )
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return dict(data=data, layout=layout)
+
+def dashboard_categories(cube):
+    """Options of the category selector, in display order"""
+    categories = sorted(cube.values('overall_category'))
+    return ['All Categories'] + [cat for cat in categories if cat != 'All Electronics']
+
+def cached_response(key, build_body, mimetype, cache_control='no-cache'):
+    """Response served from response_cache, compressed as the client accepts, with a strong ETag
+
+    build_body returns (body, complete); bodies with placeholder figures are
+    served without being cached, so the next request builds them again.
+    Concurrent requests missing the same key share one build.
+    """
+    key = (load_data().version,) + key
+    entry, complete = response_cache.get_or_build(key, build_body)
+    if not complete:
+        cache_control = 'no-cache'
+    return encoded_response(entry, mimetype, cache_control)
+
+def encoded_response(entry, mimetype, cache_control):
+    """Response of a CachedResponse in the coding the client accepts, with a strong ETag"""
+    coding, body = negotiate(entry, request.accept_encodings)
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.vary.add('Accept-Encoding')
+    if coding:
+        response.headers['Content-Encoding'] = coding
+        response.set_etag(f'{entry.etag}-{coding}')
+    else:
+        response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def cached_json_response(key, build_body, cache_control='no-cache'):
+    return cached_response(key, build_body, app.json.mimetype, cache_control)
+
+def one_off_json_response(build_body):
+    """JSON response built for this request only: not cached, and compressed at a cheap level"""
+    body, _ = build_body()
+    return encoded_response(make_entry(body, fast=True), app.json.mimetype, 'no-cache')
+
+def versioned_cache_control():
+    """Cache-Control of a URL that names the dataset version in its v argument
+
+    Such a URL always returns the same body, so HTTP caches may keep it until
+    the version changes; URLs naming any other version have to revalidate.
+    """
+    if request.args.get('v') == load_data().version:
+        return 'public, max-age=31536000, immutable'
+    return 'no-cache'
+
+# Figures and the intermediates they share. Intermediates that only depend on
+# the dataset are kept until it changes; everything else is built once per request.
+figure_graph = FigureGraph()
+figure_graph.add('category_cube',
+                 lambda data, overall_category: select_category(data.cube, overall_category),
+                 params=['overall_category'])
+figure_graph.add('category_sentiment_counts',
+                 lambda data: data.cube.sentiment_table('overall_category'),
+                 per_dataset=True)
+figure_graph.add('all_rating_counts',
+                 lambda data: data.cube.rating_sentiment_counts(),
+                 per_dataset=True)
+figure_graph.add('category_rating_counts',
+                 lambda data, category_cube: category_cube.rating_sentiment_counts(),
+                 deps=['category_cube'])
+# update_plots filters the brand chart on main_category with the selected overall_category
+figure_graph.add('valid_brands',
+                 lambda data, overall_category: valid_brand_table(data.cube, overall_category),
+                 params=['overall_category'], per_dataset=True)
+
+figure_graph.add('overall_plot',
+                 lambda data, overall_category, category_cube:
+                     create_overall_sentiment_plot(data.cube, overall_category, category_cube),
+                 deps=['category_cube'], params=['overall_category'])
+figure_graph.add('rating_distribution_plot',
+                 lambda data, all_rating_counts:
+                     create_rating_sentiment_distribution_plot(data.cube, all_rating_counts),
+                 deps=['all_rating_counts'])
+figure_graph.add('category_distribution_plot',
+                 lambda data, category_sentiment_counts:
+                     create_enhanced_category_distribution_plot(data.cube, category_sentiment_counts),
+                 deps=['category_sentiment_counts'])
+figure_graph.add('rating_plot',
+                 lambda data, overall_category, category_rating_counts:
+                     create_rating_sentiment_plot(data.cube, overall_category, category_rating_counts),
+                 deps=['category_rating_counts'], params=['overall_category'])
+figure_graph.add('brand_plot',
+                 lambda data, overall_category, valid_brands:
+                     create_brand_sentiment_analysis_plot(data.cube, overall_category, valid_brands),
+                 deps=['valid_brands'], params=['overall_category'])
+for sentiment_type in ['positive', 'negative']:
+    figure_graph.add(f'top_{sentiment_type}_plot',
+                     lambda data, overall_category, sentiment_type=sentiment_type:
+                         create_top_products_plot(data.ranking, overall_category, sentiment_type),
+                     params=['overall_category'])
+
+LANDING_FIGURES = [
+    'overall_plot', 'rating_distribution_plot', 'category_distribution_plot', 'brand_plot',
+    'rating_plot', 'top_positive_plot', 'top_negative_plot'
+]
+CATEGORY_FIGURES = ['overall_plot', 'rating_plot', 'brand_plot', 'top_positive_plot', 'top_negative_plot']
+
+def build_figure_in_process(name, params, version):
+    """Build one figure of the given dataset version in a worker process of the process figure executor"""
+    data = load_data()
+    if data.version != version:
+        dashboard_loader.reload()
+        data = load_data()
+        if data.version != version:
+            raise RuntimeError(f"Figure worker has dataset version {data.version}, not {version}")
+    return figure_graph.evaluate([name], data, **params)[name]
+
+figure_executor = FigureExecutor(
+    figure_graph,
+    kind=FIGURE_EXECUTOR,
+    max_workers=FIGURE_WORKERS,
+    timeout=FIGURE_TIMEOUT,
+    placeholder=placeholder_figure,
+    build_in_process=build_figure_in_process,
+    # Workers reload the dataset file, which lacks ingested reviews: figures of ingested data build on threads
+    in_process=lambda data: data.ingested == 0
+)
 
 @app.route('/')
 def dashboard():
-    df = load_data()
-    
-    categories = sorted(df['overall_category'].unique())
-    categories = ['All Categories'] + [cat for cat in categories if cat != 'All Electronics']
-    
-    # Create plots
-    overall_sentiment = create_overall_sentiment_plot(df)
-    rating_sentiment_dist = create_rating_sentiment_distribution_plot(df)
-    category_distribution = create_enhanced_category_distribution_plot(df)
-    brand_distribution = create_brand_sentiment_analysis_plot(df)
-    rating_sentiment = create_rating_sentiment_plot(df)
-    category_brand_distribution = create_brand_sentiment_analysis_plot(df)
+    if PROGRESSIVE_DASHBOARD:
+        return progressive_dashboard()
+    return cached_response(('dashboard',), render_dashboard, 'text/html')
+
+def render_dashboard():
+    """(landing page HTML, whether every figure was built in time)"""
+    data = load_data()
+    
+    categories = dashboard_categories(data.cube)
+    
+    # Create plots; the brand chart is shared by both brand panels
+    figures, timed_out = figure_executor.build(LANDING_FIGURES, data, overall_category=None)
+    figures = {name: dumps(figure).decode() for name, figure in figures.items()}
+    for name, figure in figures.items():
+        payload_sizes.record(name, len(figure))
+    overall_sentiment = figures['overall_plot']
+    rating_sentiment_dist = figures['rating_distribution_plot']
+    category_distribution = figures['category_distribution_plot']
+    brand_distribution = figures['brand_plot']
+    rating_sentiment = figures['rating_plot']
+    category_brand_distribution = figures['brand_plot']
     
     # Create and pass the top products plots
-    top_positive_products = create_top_products_plot(df, sentiment_type='positive')
-    top_negative_products = create_top_products_plot(df, sentiment_type='negative')
+    top_positive_products = figures['top_positive_plot']
+    top_negative_products = figures['top_negative_plot']
     
-    return render_template(
+    html = render_template(
         'index_3.html',
         overall_sentiment=overall_sentiment,
         rating_distribution=rating_sentiment_dist,
@@ -510,20 +684,315 @@ def dashboard():
         brand_sentiment=category_brand_distribution,
         main_categories=categories,
         top_positive_products=top_positive_products,  # Add these
-        top_negative_products=top_negative_products   # Add these
+        top_negative_products=top_negative_products,  # Add these
+        plotly_template=encoded_template().decode()
+    )
+    return html.encode(), not timed_out
+
+@app.route('/progressive')
+def progressive_dashboard():
+    """Landing page skeleton; its panels are loaded from /panel/<figure>"""
+    return cached_response(('progressive',), render_skeleton, 'text/html')
+
+def render_skeleton():
+    data = load_data()
+    html = render_template(
+        'index_progressive.html',
+        main_categories=dashboard_categories(data.cube),
+        version=data.version
     )
+    return html.encode(), True
+
+PANEL_FIGURES = set(LANDING_FIGURES + CATEGORY_FIGURES)
+
+@app.route('/panel/<figure>')
+def panel(figure):
+    """One figure of the dashboard, for the category in the category argument"""
+    if figure not in PANEL_FIGURES:
+        abort(404)
+    overall_category = request.args.get('category')
+    return cached_json_response(('panel', figure, overall_category),
+                                lambda: panel_body(figure, overall_category),
+                                versioned_cache_control())
+
+def panel_body(figure, overall_category):
+    figures, timed_out = figure_executor.build([figure], load_data(), overall_category=overall_category)
+    body = dumps(figures[figure])
+    payload_sizes.record(figure, len(body))
+    return body, not timed_out
+
+@app.route('/plotly_template')
+def plotly_template():
+    """Layout template the progressive dashboard applies to every panel"""
+    return cached_json_response(('plotly_template',), lambda: (encoded_template(), True),
+                                versioned_cache_control())
+
+# /trend query argument naming a filter, and the timeline key it filters on
+TREND_FILTERS = {'category': 'overall_category', 'brand': 'brand', 'asin': 'asin'}
+TREND_UNITS = {'day': 'D', 'month': 'M'}
+DEFAULT_TREND_WINDOW = {'D': 30, 'M': 3}
+# Buckets of one /trend series, and the largest window: 27 years of days
+TREND_MAX_BUCKETS = 10_000
+
+@app.route('/trend')
+def trend():
+    """Rolling-window sentiment series of all reviews, or of one category, brand or ASIN
+
+    Query arguments: at most one of category, brand and asin; unit ('day' or
+    'month', default month); window, in units (default 30 days or 3 months);
+    start and end as ISO dates (default: the first and last dated review).
+    """
+    args = request.args
+    filters = [name for name in TREND_FILTERS if args.get(name)]
+    if len(filters) > 1:
+        return jsonify(error=f"Filter on at most one of {list(TREND_FILTERS)}"), 400
+    key = TREND_FILTERS[filters[0]] if filters else None
+    value = args.get(filters[0]) if filters else None
+    unit = TREND_UNITS.get(args.get('unit', 'month'))
+    if unit is None:
+        return jsonify(error=f"unit must be one of {list(TREND_UNITS)}"), 400
+    try:
+        window = int(args.get('window', DEFAULT_TREND_WINDOW[unit]))
+        start = to_bucket(args['start'], unit) if args.get('start') else None
+        end = to_bucket(args['end'], unit) if args.get('end') else None
+    except ValueError as e:
+        return jsonify(error=f"Invalid window or date: {e}"), 400
+    if window < 1 or window > TREND_MAX_BUCKETS or (start is not None and end is not None and start > end):
+        return jsonify(error=f"window must be 1 to {TREND_MAX_BUCKETS} and start not after end"), 400
+    timeline = load_data().timeline
+    if timeline is None:
+        return jsonify(error="The trend is not available while the dataset is aggregated out of core"), 501
+    bounds = timeline.index(key, unit).bucket_range(value)
+    if bounds is None:
+        return jsonify(error=f"No dated reviews for {filters[0]} {value!r}"), 404
+    # Buckets outside the reviews' range are left out, so a wide range costs no more than the data
+    start = bounds[0] if start is None else max(start, bounds[0])
+    end = bounds[1] if end is None else min(end, bounds[1])
+    if end - start + 1 > TREND_MAX_BUCKETS:
+        return jsonify(error=f"At most {TREND_MAX_BUCKETS} {args.get('unit', 'month')}s per series; "
+                             f"narrow start and end or use a coarser unit"), 400
+
+    build_body = lambda: (trend_body(key, value, unit, window, start, end), True)
+    if any(args.get(name) for name in ['window', 'start', 'end']):
+        # Ad-hoc ranges and windows are rarely asked for twice: caching them would only evict the default series
+        return one_off_json_response(build_body)
+    return cached_json_response(('trend', key, value, unit, window, start, end), build_body)
+
+def trend_body(key, value, unit, window, start, end):
+    buckets, counts = load_data().timeline.rolling(key, value, unit, window, start, end)
+    totals = counts[:, -1]
+    series = {
+        'key': key,
+        'value': value,
+        'unit': 'day' if unit == 'D' else 'month',
+        'window': window,
+        'dates': bucket_dates(buckets, unit).tolist()
+    }
+    for position, column in enumerate(COUNT_COLUMNS):
+        series[column] = counts[:, position]
+    for position, sentiment in enumerate(COUNT_COLUMNS[:-1]):
+        series[f'{sentiment}_pct'] = np.round(counts[:, position] / np.maximum(totals, 1) * 100, 2)
+    return dumps(series)
+
+def build_category_plots(overall_category):
+    """(figures of the category panels, names replaced by a placeholder)"""
+    return figure_executor.build(CATEGORY_FIGURES, load_data(), overall_category=overall_category)
+
+def update_plots_body(overall_category):
+    figures, timed_out = build_category_plots(overall_category)
+    return encode_panels(figures), not timed_out
 
 @app.route('/update_plots/<overall_category>')
 def update_plots(overall_category):
-    df = load_data()
-    
-    return jsonify({
-        'overall_plot': create_overall_sentiment_plot(df, overall_category),
-        'rating_plot': create_rating_sentiment_plot(df, overall_category),
-        'brand_plot': create_brand_sentiment_analysis_plot(df, overall_category),
-        'top_positive_plot': create_top_products_plot(df, overall_category, 'positive'),
-        'top_negative_plot': create_top_products_plot(df, overall_category, 'negative')
-    })
+    return cached_json_response(('update_plots', overall_category),
+                                lambda: update_plots_body(overall_category))
+
+@app.route('/figure_timings')
+def figure_timings():
+    """Build counts and times of every figure graph node"""
+    return jsonify(figure_graph.node_timings())
+
+@app.route('/payload_sizes')
+def payload_size_stats():
+    """Encoded size of every panel served so far"""
+    return jsonify(payload_sizes.snapshot())
+
+@app.before_request
+def ensure_reloader():
+    # Server workers forked after create_app() start their own reloader
+    if RELOAD_INTERVAL > 0:
+        start_reloader()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Latency and body size of the request, labelled by route pattern rather than URL"""
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if 'request_start' in g:
+        request_seconds.observe(time.perf_counter() - g.request_start,
+                                route=route, method=request.method, status=response.status_code)
+    if response.content_length is not None:
+        response_bytes.observe(response.content_length, route=route)
+    return response
+
+@metrics.add_collector
+def collect_state_metrics():
+    """Response cache, figure executor and dataset figures, read at scrape time"""
+    cache = response_cache.stats()
+    collected = []
+    counters = [
+        ('dashboard_response_cache_hits_total', 'Responses served from the response cache', cache['hits']),
+        ('dashboard_response_cache_misses_total', 'Responses the response cache had to build', cache['misses']),
+        ('dashboard_response_cache_evictions_total', 'Responses evicted from the response cache', cache['evictions']),
+        ('dashboard_response_cache_coalesced_total', 'Cache misses served by a build already in progress',
+         cache['coalesced']),
+        ('dashboard_figure_timeouts_total', 'Figures replaced by a placeholder after the timeout',
+         figure_executor.timeouts),
+        ('dashboard_figure_failures_total', 'Figures replaced by a placeholder after their build failed',
+         figure_executor.failures),
+        ('dashboard_dataset_reloads_total', 'Reloads swapped in since the process started', dashboard_loader.reloads),
+        ('dashboard_dataset_discarded_reviews_total', 'Ingested reviews dropped by reloads of the dataset',
+         dashboard_loader.discarded_reviews)
+    ]
+    for name, documentation, value in counters:
+        counter = Counter(name, documentation)
+        counter.inc(value)
+        collected.append(counter)
+    lookups = cache['hits'] + cache['misses']
+    gauges = [
+        ('dashboard_response_cache_hit_ratio', 'Share of response cache lookups that hit',
+         cache['hits'] / lookups if lookups else 0.0),
+        ('dashboard_response_cache_entries', 'Responses held by the response cache', cache['entries']),
+        ('dashboard_response_cache_bytes', 'Bytes held by the response cache, variants included', cache['bytes']),
+        ('dashboard_dataset_ready', '1 once the dataset is loaded', int(dashboard_loader.ready)),
+        ('dashboard_dataset_last_load_seconds', 'Duration of the latest dataset load or reload',
+         dashboard_loader.load_seconds or 0.0)
+    ]
+    score_stats = score_batcher.stats()
+    if 'cache' in score_stats:
+        score_lookups = score_stats['cache']['hits'] + score_stats['cache']['misses']
+        gauges.append(('dashboard_score_cache_hit_ratio', 'Share of distinct /score texts found in the score cache',
+                       score_stats['cache']['hits'] / score_lookups if score_lookups else 0.0))
+    data = dashboard_loader.data
+    if data is not None:
+        gauges.append(('dashboard_dataset_reviews', 'Reviews in the dataset being served', data.reviews))
+    for name, documentation, value in gauges:
+        gauge = Gauge(name, documentation)
+        gauge.set(value)
+        collected.append(gauge)
+    return collected
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metrics of this process in the Prometheus text exposition format"""
+    response = make_response(metrics.render())
+    response.headers['Content-Type'] = CONTENT_TYPE
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Add the reviews posted as JSON lines (or a JSON array) to the data being served"""
+    try:
+        if request.is_json:
+            records = request.get_json()
+        else:
+            records = parse_jsonl(request.get_data(as_text=True).splitlines())
+        if not isinstance(records, list) or not records or not all(isinstance(record, dict) for record in records):
+            return jsonify(error='Post a JSON array of review objects or one review object per JSON line'), 400
+        data = ingest_records(dashboard_loader, records)
+    except (ValueError, ImportError) as e:
+        return jsonify(error=str(e)), 400
+    response_cache.retain_version(data.version)
+    return jsonify(accepted=len(records), version=data.version, reviews=data.reviews)
+
+def score_texts(texts):
+    """Sentiment, neutral confidence and raw scores of raw review texts, preprocessed like processed_text"""
+    scores = score_batcher.score([preprocess(text) for text in texts], timeout=SCORE_TIMEOUT)
+    codes, neutral_confidence = classify_codes(scores[:, 0], scores[:, 1], scores[:, 2])
+    return [
+        {
+            'sentiment': SENTIMENT_LABELS[code],
+            'neutral_confidence': confidence,
+            'vader_score': vader,
+            'textblob_score': polarity,
+            'textblob_subjectivity': subjectivity
+        }
+        for code, confidence, (vader, polarity, subjectivity)
+        in zip(codes.tolist(), neutral_confidence.tolist(), scores.tolist())
+    ]
+
+@app.route('/score', methods=['POST'])
+def score():
+    """Classify the posted review texts: {"text": ...} or {"texts": [...]}, or a JSON array of texts"""
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        texts = [body['text']] if 'text' in body else body.get('texts')
+    else:
+        texts = body
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify(error='Post {"text": "..."}, {"texts": ["...", ...]} or a JSON array of texts'), 400
+    if len(texts) > SCORE_MAX_TEXTS:
+        return jsonify(error=f'At most {SCORE_MAX_TEXTS} texts per request'), 413
+    try:
+        results = score_texts(texts)
+    except (ImportError, TimeoutError) as e:
+        return jsonify(error=str(e)), 503
+    if isinstance(body, dict) and 'text' in body:
+        return jsonify(results[0])
+    return jsonify(results=results)
+
+@app.route('/dataset')
+def dataset_status():
+    """Version, reload count and memory of the dataset in use and of the one it replaced"""
+    return jsonify(dashboard_loader.status())
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once the dataset is loaded, 503 before"""
+    if not dashboard_loader.ready:
+        return jsonify(ready=False), 503
+    data = load_data()
+    return jsonify(ready=True, version=data.version, reviews=data.reviews,
+                   load_seconds=dashboard_loader.load_seconds)
+
+def warm_response_cache():
+    """Precompute the landing page and the /update_plots response of every selectable category
+
+    In progressive mode the panels of the landing page are precomputed too.
+    """
+    with app.test_request_context('/'):
+        dashboard()
+    if PROGRESSIVE_DASHBOARD:
+        with app.test_request_context('/plotly_template'):
+            plotly_template()
+        for figure in LANDING_FIGURES:
+            with app.test_request_context(f'/panel/{figure}'):
+                panel(figure)
+    for category in dashboard_categories(load_data().cube):
+        with app.test_request_context(f'/update_plots/{category}'):
+            update_plots(category)
+
+def create_app(preload=True, warm_cache=WARM_CACHE_ON_STARTUP, watch=RELOAD_INTERVAL > 0):
+    """The dashboard app, with its data loaded (and cache warmed) before it serves
+
+    Production servers call this in the parent process before forking workers,
+    so every worker shares the loaded pages copy-on-write. With watch the
+    dataset reloader of this process is started as well.
+    """
+    if preload or warm_cache:
+        load_data()
+    if warm_cache:
+        warm_response_cache()
+    if watch:
+        start_reloader()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # serve_dashboard imports this module by name; let it use the one already running
+    sys.modules.setdefault('04_data_visualization_advanced_part4', sys.modules[__name__])
+    import serve_dashboard
+    serve_dashboard.main()
\ No newline at end of file
@@ -0,0 +1,331 @@
+"""Parallel, resumable VADER + TextBlob scoring of a review CSV
+
+update_all_sentiment_analysis in 03_sentiment_analysis_indepth_part2 scores
+every processed_text serially and writes the CSV at the very end. Here the
+CSV is read in chunks of --chunk-rows reviews, the chunks are scored across
+--workers processes (one SentimentScorer per process) and every scored chunk
+is saved to a checkpoint directory next to the output as soon as it is done.
+An interrupted run started again with the same arguments only scores the
+chunks that are missing. Once every chunk is scored, the input is streamed
+again and written out with the score columns, in the input's order:
+
+    python batch_scoring.py ../data/processed/reviews.csv ../data/processed/reviews_scored.csv --workers 8
+
+The checkpoint is discarded when the input CSV, its text column or the chunk
+size change, and removed after the output has been written. Raw scores are
+looked up in the score cache (--cache, see score_cache.py) first, so a rerun
+only scores the texts it has not seen, and identical texts are scored once
+per run, even when their chunks are scored at the same time.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from dataset_snapshot import source_fingerprint
+from score_cache import DEFAULT_CACHE_PATH, ScoreCache, ScoreLookup
+from sentiment_scoring import SentimentScorer, classify_scores
+
+CHECKPOINT_VERSION = 1
+
+DEFAULT_CHUNK_ROWS = 10_000
+
+SCORE_COLUMNS = ['vader_score', 'textblob_score', 'textblob_subjectivity', 'neutral_confidence', 'sentiment']
+
+# Scorer of a worker process, created once by init_worker
+_scorer = None
+
+
+def init_worker():
+    global _scorer
+    _scorer = SentimentScorer()
+
+
+def score_texts(texts):
+    """(len(texts), 3) array of the raw scores of processed texts, scored in this process"""
+    if _scorer is None:
+        init_worker()
+    return np.array([_scorer.raw_scores(text) for text in texts], dtype=np.float64).reshape(-1, 3)
+
+
+def score_columns(vader, polarity, subjectivity):
+    """SCORE_COLUMNS arrays of raw score arrays"""
+    sentiment, neutral_confidence = classify_scores(vader, polarity, subjectivity)
+    return {
+        'vader_score': vader,
+        'textblob_score': polarity,
+        'textblob_subjectivity': subjectivity,
+        'neutral_confidence': neutral_confidence,
+        'sentiment': sentiment
+    }
+
+
+def text_chunks(csv_path, column='processed_text', chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Lists of the column's texts of at most chunk_rows reviews of the CSV"""
+    with pd.read_csv(csv_path, usecols=[column], chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk[column].tolist()
+
+
+def checkpoint_path(output_path):
+    """Default checkpoint location next to the output"""
+    return f'{output_path}.checkpoint'
+
+
+class ScoringCheckpoint:
+    """Directory of the scored chunks of one input, kept across interrupted runs"""
+
+    def __init__(self, path, csv_path, column, chunk_rows):
+        self.path = path
+        self.manifest = {
+            'version': CHECKPOINT_VERSION,
+            'source': source_fingerprint(csv_path),
+            'column': column,
+            'chunk_rows': chunk_rows
+        }
+
+    def open(self):
+        """Indices of the chunks already scored; starts over when the checkpoint is of another input"""
+        manifest_path = os.path.join(self.path, 'manifest.json')
+        try:
+            with open(manifest_path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = None
+        if stored != self.manifest:
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path)
+            with open(manifest_path, 'w') as f:
+                json.dump(self.manifest, f, indent=2)
+            return set()
+        return {int(name[len('chunk_'):-len('.npz')]) for name in os.listdir(self.path)
+                if name.startswith('chunk_') and name.endswith('.npz')}
+
+    def chunk_path(self, index):
+        return os.path.join(self.path, f'chunk_{index:06d}.npz')
+
+    def save(self, index, columns):
+        """Store the scores of one chunk atomically, so a crash never leaves half a chunk"""
+        tmp_path = f'{self.chunk_path(index)}.tmp-{os.getpid()}.npz'
+        np.savez(tmp_path, **columns)
+        os.replace(tmp_path, self.chunk_path(index))
+
+    def load(self, index):
+        with np.load(self.chunk_path(index)) as stored:
+            return {name: stored[name] for name in SCORE_COLUMNS}
+
+    def rows(self, indices):
+        """Number of reviews scored in the stored chunks of indices; the last chunk may be short"""
+        total = 0
+        for index in indices:
+            with np.load(self.chunk_path(index)) as stored:
+                total += len(stored['vader_score'])
+        return total
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class Progress:
+    """Reviews scored so far and their rate, printed after every chunk"""
+
+    def __init__(self, resumed=0, stream=sys.stderr):
+        self.resumed = resumed
+        self.scored = 0
+        self.start = time.perf_counter()
+        self.stream = stream
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def reviews_per_second(self):
+        return self.scored / max(self.seconds, 1e-9)
+
+    def add(self, reviews):
+        self.scored += reviews
+        if self.stream is not None:
+            print(f"Scored {self.resumed + self.scored} reviews "
+                  f"({self.reviews_per_second:.0f} reviews/s)", file=self.stream)
+
+
+def text_hash(text):
+    """Key of a normalized text in RunScores"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class RunScores:
+    """Raw scores of the texts scored so far in one run, by text hash
+
+    Texts sent to the workers are pending until the chunk they were sent for
+    is done, so a later chunk containing them waits for that result instead
+    of scoring them again.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.pending = {}
+
+    def split(self, lookup):
+        """(texts of lookup.missing never seen in this run, their hashes, the hashes of lookup.missing)"""
+        hashes = [text_hash(text) for text in lookup.missing]
+        new = {}
+        for text, key in zip(lookup.missing, hashes):
+            if key not in self.scores and key not in self.pending:
+                new.setdefault(key, text)
+        return list(new.values()), list(new), hashes
+
+    def submit(self, future, keys):
+        """Mark the texts of keys as being scored by future, in order"""
+        for row, key in enumerate(keys):
+            self.pending[key] = (future, row)
+
+    def add(self, keys, scores):
+        for key, row in zip(keys, scores):
+            self.scores[key] = row
+            self.pending.pop(key, None)
+
+    def get(self, hashes):
+        """(len(hashes), 3) array of the scores of hashes, waiting for the pending ones"""
+        rows = []
+        for key in hashes:
+            row = self.scores.get(key)
+            if row is None:
+                future, position = self.pending[key]
+                row = future.result()[position]
+            rows.append(row)
+        return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+
+def score_chunks(chunks, done, save, workers, progress, cache=None):
+    """Score every (index, texts) chunk whose index is not in done and save() its columns
+
+    Only the distinct texts of a chunk that are neither in the cache nor
+    scored earlier in the run are sent to the workers; texts still being
+    scored for a chunk in flight are taken from its result (see RunScores).
+    At most two chunks per worker are in flight, so the input is never held in
+    memory as a whole. Chunks are saved in the order they finish.
+    """
+    run = RunScores()
+
+    def finish(index, lookup, hashes):
+        save(index, score_columns(*lookup.complete(run.get(hashes))))
+        progress.add(len(lookup.codes))
+
+    todo = ((index, ScoreLookup(texts, cache)) for index, texts in chunks if index not in done)
+    if workers <= 1:
+        for index, lookup in todo:
+            texts, keys, hashes = run.split(lookup)
+            run.add(keys, score_texts(texts))
+            finish(index, lookup, hashes)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+    pending = {}
+
+    def finish_future(future):
+        index, lookup, keys, hashes = pending.pop(future)
+        run.add(keys, future.result())
+        finish(index, lookup, hashes)
+
+    try:
+        for index, lookup in todo:
+            texts, keys, hashes = run.split(lookup)
+            future = pool.submit(score_texts, texts)
+            run.submit(future, keys)
+            pending[future] = (index, lookup, keys, hashes)
+            if len(pending) >= 2 * workers:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish_future(future)
+        for future in list(pending):
+            finish_future(future)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def write_scored_csv(csv_path, output_path, checkpoint, chunk_rows):
+    """Write the input CSV with the checkpoint's score columns, replacing output_path atomically"""
+    tmp_path = f'{output_path}.tmp-{os.getpid()}'
+    rows = 0
+    with pd.read_csv(csv_path, chunksize=chunk_rows) as reader, \
+            open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for index, chunk in enumerate(reader):
+            for name, values in checkpoint.load(index).items():
+                chunk[name] = values
+            chunk.to_csv(f, header=index == 0, index=False)
+            rows += len(chunk)
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+def score_csv(csv_path, output_path, column='processed_text', chunk_rows=DEFAULT_CHUNK_ROWS, workers=None,
+              cache=None, stream=sys.stderr):
+    """Score the column of every review of csv_path into output_path, resuming an earlier run
+
+    Returns the number of reviews, those scored by this run and those taken
+    from the checkpoint, the scoring time and the rate in reviews per second,
+    and the cache's statistics when there is one.
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint = ScoringCheckpoint(checkpoint_path(output_path), csv_path, column, chunk_rows)
+    done = checkpoint.open()
+    resumed = checkpoint.rows(done)
+    progress = Progress(resumed=resumed, stream=stream)
+    if done and stream is not None:
+        print(f"Resuming after {len(done)} scored chunks ({resumed} reviews)", file=stream)
+    score_chunks(enumerate(text_chunks(csv_path, column, chunk_rows)), done, checkpoint.save, workers, progress,
+                 cache)
+    seconds = progress.seconds
+
+    reviews = write_scored_csv(csv_path, output_path, checkpoint, chunk_rows)
+    checkpoint.remove()
+    result = {
+        'reviews': reviews,
+        'scored': progress.scored,
+        'resumed': resumed,
+        'workers': workers,
+        'seconds': seconds,
+        'reviews_per_second': progress.reviews_per_second
+    }
+    if cache is not None:
+        result['cache'] = cache.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score the reviews of a CSV with the VADER + TextBlob ensemble')
+    parser.add_argument('input', help='review CSV with a processed text column')
+    parser.add_argument('output', help='CSV to write the reviews and their scores to')
+    parser.add_argument('--column', default='processed_text', help='column of the texts to score')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='reviews per checkpointed chunk')
+    parser.add_argument('--workers', type=int, help='scoring processes (default: CPU count)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='SQLite file of cached raw scores')
+    parser.add_argument('--no-cache', action='store_true', help='score every text without the cache')
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else ScoreCache(args.cache)
+    try:
+        result = score_csv(args.input, args.output, args.column, args.chunk_rows, args.workers, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    print(f"Scored {result['scored']} reviews in {result['seconds']:.1f}s with {result['workers']} workers "
+          f"({result['reviews_per_second']:.0f} reviews/s), {result['resumed']} resumed from the checkpoint; "
+          f"wrote {result['reviews']} reviews to {args.output}")
+    if cache is not None:
+        stats = result['cache']
+        print(f"Score cache: {stats['hits']} hits, {stats['misses']} misses of distinct texts "
+              f"({stats['hit_ratio']:.1%}), {stats['entries']} texts cached")
+
+
+if __name__ == '__main__':
+    main()
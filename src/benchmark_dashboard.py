@@ -0,0 +1,244 @@
+"""Benchmarks of the dashboard on synthetic datasets of growing size
+
+For every size the dataset is generated once under ../data/synthetic/ and
+benchmarked in a fresh process, so each size reports its own peak RSS. The
+suite times:
+
+  - load_data, parsing the CSV (no snapshot yet) and then from the snapshot;
+  - every create_*_plot function, for all categories and for the largest and
+    smallest category, with the product rankings recomputed on every run;
+  - GET / and GET /update_plots/<category>, cold (empty response cache,
+    figure memo and rankings) and warm (served from the response cache).
+
+Each result carries wall times (min, median, max over --repeat runs), the
+process's peak RSS after the benchmark and the payload size in bytes. Results
+are written as JSON; pass an earlier result file to --compare to see how the
+median times moved between two commits:
+
+    python benchmark_dashboard.py --sizes 10k 100k 1M --output bench.json
+    python benchmark_dashboard.py --sizes 10k 100k 1M --compare bench.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from synthetic_reviews import parse_rows, write_csv
+
+SYNTHETIC_DIR = '../data/synthetic'
+DEFAULT_SIZES = ['10k', '100k', '1M']
+
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident memory, or None where it is unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(name, function, repeat, before=None, **details):
+    """Result of calling function repeat times; before() runs untimed ahead of each call
+
+    function returns the payload size in bytes, or None when it has none.
+    """
+    seconds = []
+    payload = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        payload = function()
+        seconds.append(time.perf_counter() - start)
+    return dict(
+        name=name,
+        **details,
+        repeat=repeat,
+        wall_seconds={'min': min(seconds), 'median': statistics.median(seconds), 'max': max(seconds)},
+        peak_rss_bytes=peak_rss_bytes(),
+        payload_bytes=payload
+    )
+
+
+def figure_calls(module, data, category):
+    """(function name, call) of every create_*_plot for one category (None for all)"""
+    cube, ranking = data.cube, data.ranking
+    calls = [
+        ('create_overall_sentiment_plot', lambda: module.create_overall_sentiment_plot(cube, category)),
+        ('create_rating_sentiment_plot', lambda: module.create_rating_sentiment_plot(cube, category)),
+        ('create_brand_sentiment_analysis_plot', lambda: module.create_brand_sentiment_analysis_plot(cube, category)),
+        ('create_top_products_plot', lambda: module.create_top_products_plot(ranking, category, 'positive'))
+    ]
+    if category is None:
+        calls += [
+            ('create_rating_sentiment_distribution_plot',
+             lambda: module.create_rating_sentiment_distribution_plot(cube)),
+            ('create_category_distribution_plot', lambda: module.create_category_distribution_plot(cube)),
+            ('create_enhanced_category_distribution_plot',
+             lambda: module.create_enhanced_category_distribution_plot(cube))
+        ]
+    return calls
+
+
+def run_benchmarks(csv_path, repeat):
+    """Results of every benchmark on one dataset, run in this process"""
+    os.environ['DASHBOARD_DATA_PATH'] = csv_path
+    os.environ['DASHBOARD_RELOAD_INTERVAL'] = '0'
+    os.environ['DASHBOARD_WARM_CACHE'] = '0'
+    os.environ['DASHBOARD_PROGRESSIVE'] = '0'
+    from dataset_snapshot import snapshot_path
+    module = importlib.import_module('04_data_visualization_advanced_part4')
+
+    def load_csv():
+        module.load_data()
+
+    def load_snapshot():
+        module.read_dashboard_data()
+
+    # The first load parses the CSV and writes the snapshot the later ones read
+    shutil.rmtree(snapshot_path(csv_path), ignore_errors=True)
+    results = [
+        measure('load_data', load_csv, 1, source='csv'),
+        measure('load_data', load_snapshot, repeat, source='snapshot')
+    ]
+    data = module.load_data()
+
+    counts = data.cube.sentiment_table('overall_category')['total']
+    counts = counts[counts.index != 'Uncategorized'].sort_values(kind='stable')
+    categories = [None] + list(dict.fromkeys([counts.index[-1], counts.index[0]]))
+    for category in categories:
+        for name, call in figure_calls(module, data, category):
+            results.append(measure(name, lambda call=call: len(module.dumps(call())), repeat,
+                                   before=data.ranking.clear, category=category or 'All Categories'))
+
+    client = module.app.test_client()
+
+    def cold():
+        module.response_cache.clear()
+        module.figure_graph.clear()
+        module.load_data().ranking.clear()
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return len(response.data)
+
+    urls = [('/', None)] + [(f'/update_plots/{category or "All Categories"}', category or 'All Categories')
+                            for category in categories]
+    for url, category in urls:
+        route = '/' if url == '/' else '/update_plots/<overall_category>'
+        details = {'url': url} if category is None else {'url': url, 'category': category}
+        results.append(measure(route, lambda url=url: get(url), repeat, before=cold, cache='cold', **details))
+        results.append(measure(route, lambda url=url: get(url), repeat, cache='warm', **details))
+    return {'rows': data.reviews, 'results': results}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_path(rows, seed):
+    return os.path.join(SYNTHETIC_DIR, f'reviews_{rows}_seed{seed}.csv')
+
+
+def run_suite(sizes, repeat, seed):
+    """Benchmark report of every size, each in its own process"""
+    runs = []
+    for size in sizes:
+        rows = parse_rows(size)
+        csv_path = dataset_path(rows, seed)
+        if not os.path.exists(csv_path):
+            print(f"Generating {rows} reviews into {csv_path}", file=sys.stderr)
+            write_csv(csv_path, rows, seed)
+        print(f"Benchmarking {rows} reviews", file=sys.stderr)
+        worker = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', os.path.abspath(csv_path),
+             '--repeat', str(repeat)],
+            stdout=subprocess.PIPE, text=True, check=True
+        )
+        run = json.loads(worker.stdout)
+        run.update(size=size, csv_path=csv_path, csv_bytes=os.path.getsize(csv_path))
+        runs.append(run)
+    return {
+        'suite': 'dashboard',
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'seed': seed,
+        'runs': runs
+    }
+
+
+def result_key(rows, result):
+    details = tuple(sorted((k, str(v)) for k, v in result.items()
+                           if k not in ('wall_seconds', 'peak_rss_bytes', 'payload_bytes', 'repeat')))
+    return (rows,) + details
+
+
+def compare(old, new):
+    """Lines comparing the median time of every benchmark present in both reports"""
+    old_results = {result_key(run['rows'], r): r for run in old['runs'] for r in run['results']}
+    lines = [f"{'rows':>9}  {'benchmark':<70} {'old ms':>9} {'new ms':>9} {'ratio':>6}"]
+    for run in new['runs']:
+        for result in run['results']:
+            previous = old_results.get(result_key(run['rows'], result))
+            if previous is None:
+                continue
+            before = previous['wall_seconds']['median']
+            after = result['wall_seconds']['median']
+            label = ' '.join([result['name']] + [str(v) for k, v in sorted(result.items())
+                                                 if k in ('source', 'category', 'cache')])
+            lines.append(f"{run['rows']:>9}  {label:<70} {before * 1e3:>9.2f} {after * 1e3:>9.2f} "
+                         f"{after / before if before else float('inf'):>6.2f}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard on synthetic datasets')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help='dataset sizes, e.g. 10k 100k 1M 10M')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic datasets')
+    parser.add_argument('--output', help='JSON file to write the report to (default: stdout)')
+    parser.add_argument('--compare', help='earlier JSON report to compare the median times with')
+    parser.add_argument('--worker', metavar='CSV', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        json.dump(run_benchmarks(args.worker, args.repeat), sys.stdout)
+        return
+
+    report = run_suite(args.sizes, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            print('\n'.join(compare(json.load(f), report)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
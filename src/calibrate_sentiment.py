@@ -0,0 +1,184 @@
+"""Threshold-sweep calibration of the sentiment ensemble against manual labels
+
+evaluate_sentiment_model in 03_sentiment_analysis_indepth_part2 scores one
+labelling per call. Here a grid of Thresholds is evaluated in one vectorized
+pass: every configuration's labels are computed at once by classify_codes()
+on (configurations, reviews) arrays, and all confusion matrices come from a
+single bincount over (configuration, manual label, predicted label). The
+result is the accuracy and macro F1 of every configuration and the best one:
+
+    python calibrate_sentiment.py --grid polarity=0:0.5:0.05 neutral_confidence=0.4,0.6,0.8 --output surface.csv
+
+Raw scores are read from the CSV; reviews that lack them (the manual sample
+has no textblob_subjectivity) are scored through the score cache.
+"""
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from score_cache import DEFAULT_CACHE_PATH, ScoreCache, ScoreLookup
+from sentiment_scoring import SENTIMENT_LABELS, THRESHOLDS, SentimentScorer, Thresholds, classify_codes
+
+MANUAL_PATH = '../data/processed/sample_data_vader_textblob_manual.csv'
+
+# Thresholds swept by default; the others keep the notebook's values
+DEFAULT_GRID = {
+    'neutral_score': [0.025, 0.05, 0.1],
+    'neutral_combined': [0.05, 0.1, 0.15],
+    'neutral_subjectivity': [0.4, 0.5, 0.6],
+    # neutral_confidence is a share of five indicators, so only multiples of 0.2 differ
+    'neutral_confidence': [0.2, 0.4, 0.6, 0.8, 1.0],
+    'polarity': np.round(np.arange(0, 0.501, 0.05), 3).tolist(),
+    'objective_subjectivity': [0.2, 0.3, 0.4, 0.5, 0.6]
+}
+
+# Cells of the (configurations, reviews) arrays of one evaluation batch
+BATCH_CELLS = 4_000_000
+
+METRICS = ['accuracy', 'macro_f1']
+
+
+def threshold_grid(values=None):
+    """DataFrame of every combination of the swept thresholds, one configuration per row"""
+    values = {**{field: [getattr(THRESHOLDS, field)] for field in Thresholds._fields},
+              **(DEFAULT_GRID if values is None else values)}
+    unknown = set(values) - set(Thresholds._fields)
+    if unknown:
+        raise ValueError(f"Unknown thresholds {sorted(unknown)}; known: {', '.join(Thresholds._fields)}")
+    return pd.DataFrame(list(itertools.product(*(values[field] for field in Thresholds._fields))),
+                        columns=list(Thresholds._fields), dtype=np.float64)
+
+
+def parse_values(text):
+    """Threshold values of 'start:stop:step' (stop included) or 'v1,v2,...'"""
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        return np.round(np.arange(start, stop + step / 2, step), 6).tolist()
+    return [float(value) for value in text.split(',')]
+
+
+def label_codes(labels):
+    """Positions in SENTIMENT_LABELS of an array of labels; -1 for unknown ones"""
+    codes = np.full(len(labels), -1, dtype=np.int64)
+    for code, label in enumerate(SENTIMENT_LABELS):
+        codes[np.asarray(labels) == label] = code
+    return codes
+
+
+def confusion_matrices(truth, predicted):
+    """(configurations, 3, 3) counts of manual label (rows) against predicted label (columns)
+
+    truth holds the manual label codes of the reviews, predicted the label
+    codes of every configuration, shaped (configurations, reviews).
+    """
+    configurations = predicted.shape[0]
+    labels = len(SENTIMENT_LABELS)
+    cells = (np.arange(configurations)[:, None] * labels + truth) * labels + predicted
+    return np.bincount(cells.ravel(), minlength=configurations * labels * labels).reshape(
+        configurations, labels, labels)
+
+
+def scores_of(matrices):
+    """Accuracy, macro F1 and per-label F1 of confusion matrices"""
+    true_positives = np.diagonal(matrices, axis1=1, axis2=2).astype(np.float64)
+    actual = matrices.sum(axis=2)
+    predicted = matrices.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # F1 = 2TP / (actual + predicted); 0 when a label is neither present nor predicted
+        f1 = np.nan_to_num(2 * true_positives / (actual + predicted))
+    result = {
+        'accuracy': true_positives.sum(axis=1) / matrices.sum(axis=(1, 2)),
+        'macro_f1': f1.mean(axis=1)
+    }
+    for code, label in enumerate(SENTIMENT_LABELS):
+        result[f'f1_{label}'] = f1[:, code]
+    return result
+
+
+def evaluate_grid(vader, polarity, subjectivity, manual, grid):
+    """grid with the accuracy, macro F1 and per-label F1 of every configuration"""
+    truth = label_codes(manual)
+    known = truth >= 0
+    vader, polarity, subjectivity, truth = vader[known], polarity[known], subjectivity[known], truth[known]
+    step = max(BATCH_CELLS // max(len(truth), 1), 1)
+    parts = []
+    for start in range(0, len(grid), step):
+        batch = grid.iloc[start:start + step]
+        # Thresholds of shape (configurations, 1) broadcast against the reviews
+        thresholds = Thresholds(*(batch[field].to_numpy()[:, None] for field in Thresholds._fields))
+        predicted, _ = classify_codes(vader, polarity, subjectivity, thresholds)
+        parts.append(scores_of(confusion_matrices(truth, predicted)))
+    scores = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    return grid.assign(**scores)
+
+
+def raw_scores(df, cache=None):
+    """(vader, polarity, subjectivity) arrays of df, scoring the processed_text of reviews that lack them"""
+    columns = ['vader_score', 'textblob_score', 'textblob_subjectivity']
+    if all(column in df for column in columns) and not df[columns].isna().any().any():
+        return tuple(df[column].to_numpy(dtype=np.float64) for column in columns)
+    lookup = ScoreLookup(df['processed_text'].tolist(), cache)
+    missing = lookup.missing
+    if missing:
+        scorer = SentimentScorer()
+        return lookup.complete(np.array([scorer.raw_scores(text) for text in missing], dtype=np.float64))
+    return lookup.complete([])
+
+
+def calibrate(scores, manual, grid, metric='macro_f1'):
+    """(surface of every configuration sorted best first, seconds spent evaluating it)
+
+    scores are the (vader, polarity, subjectivity) arrays of the reviews.
+    """
+    start = time.perf_counter()
+    surface = evaluate_grid(*scores, manual, grid)
+    seconds = time.perf_counter() - start
+    surface = surface.sort_values([metric] + [name for name in METRICS if name != metric], ascending=False,
+                                  kind='stable')
+    return surface.reset_index(drop=True), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep the ensemble thresholds against manual sentiment labels')
+    parser.add_argument('input', nargs='?', default=MANUAL_PATH, help='CSV with manual_sentiment and raw scores')
+    parser.add_argument('--grid', nargs='+', metavar='THRESHOLD=VALUES',
+                        help="thresholds to sweep, e.g. polarity=0:0.5:0.05 neutral_confidence=0.4,0.6 "
+                             "(default: a grid over every threshold but vader_confidence_floor)")
+    parser.add_argument('--metric', choices=METRICS, default='macro_f1', help='metric the best settings maximize')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='SQLite file of cached raw scores')
+    parser.add_argument('--top', type=int, default=10, help='configurations to print')
+    parser.add_argument('--output', help='CSV to write the whole surface to')
+    args = parser.parse_args()
+
+    grid_values = None
+    if args.grid:
+        grid_values = {}
+        for item in args.grid:
+            field, _, values = item.partition('=')
+            grid_values[field] = parse_values(values)
+    grid = threshold_grid(grid_values)
+
+    df = pd.read_csv(args.input)
+    cache = ScoreCache(args.cache)
+    try:
+        scores = raw_scores(df, cache)
+    finally:
+        cache.close()
+    manual = df['manual_sentiment'].to_numpy()
+    surface, seconds = calibrate(scores, manual, grid, args.metric)
+    baseline = evaluate_grid(*scores, manual, threshold_grid({}))
+
+    print(f"Evaluated {len(grid)} configurations on {len(df)} reviews in {seconds:.2f}s")
+    print(f"Notebook thresholds: accuracy {baseline['accuracy'][0]:.4f}, macro F1 {baseline['macro_f1'][0]:.4f}")
+    print(surface.head(args.top).to_string(index=False))
+    print(json.dumps({'best': surface.iloc[0][list(Thresholds._fields)].to_dict()}, indent=2))
+    if args.output:
+        surface.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
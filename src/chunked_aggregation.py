@@ -0,0 +1,129 @@
+"""Out-of-core aggregation of review datasets too large to load as one frame
+
+Streams the processed CSV, or its snapshot, in chunks of rows, reading only the
+columns the charts need, and folds every chunk into the review counts per
+(overall_category, main_category, brand, asin, overall, sentiment) and the
+title of every product. Memory is bounded by the chunk size plus the number of
+distinct key combinations, not by the number of reviews, and the SentimentCube
+built from the folded counts is identical to SentimentCube.from_store() over
+the whole dataset:
+
+  - counts keep the order in which their key combination first appears, since
+    every fold appends the new combinations after the known ones;
+  - categories are sorted like ReviewStore's, whichever chunks they came from;
+  - a product's title is its first non-missing one, as in ReviewStore.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_snapshot import fingerprint_version, is_fresh, read_manifest, snapshot_path, source_fingerprint
+from review_store import DIMENSIONS, sorted_categories
+from sentiment_cube import CUBE_KEYS, SentimentCube, count_keys
+
+# Columns the aggregates are counted from
+AGGREGATE_COLUMNS = DIMENSIONS + ['overall', 'title']
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def csv_chunks(csv_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """DataFrames of the AGGREGATE_COLUMNS of at most chunk_rows reviews of the CSV"""
+    with pd.read_csv(csv_path, usecols=AGGREGATE_COLUMNS, dtype={name: 'category' for name in DIMENSIONS},
+                     chunksize=chunk_rows) as reader:
+        yield from reader
+
+
+def snapshot_chunks(snapshot_dir, chunk_rows=DEFAULT_CHUNK_ROWS, manifest=None):
+    """DataFrames of the DIMENSIONS and overall of at most chunk_rows reviews of a snapshot
+
+    Only the slice of each memory-mapped column a chunk covers is read. Titles
+    are stored per product in the manifest, so the chunks carry none.
+    """
+    manifest = manifest or read_manifest(snapshot_dir)
+    columns = {name: np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode='r')
+               for name in DIMENSIONS + ['overall']}
+    dtypes = {name: pd.CategoricalDtype(manifest['columns'][name]['categories']) for name in DIMENSIONS}
+    for start in range(0, manifest['rows'], chunk_rows):
+        stop = min(start + chunk_rows, manifest['rows'])
+        chunk = {name: pd.Categorical.from_codes(np.array(columns[name][start:stop]), dtype=dtypes[name],
+                                                 validate=False)
+                 for name in DIMENSIONS}
+        chunk['overall'] = np.array(columns['overall'][start:stop])
+        yield pd.DataFrame(chunk)
+
+
+class CubeAccumulator:
+    """Folds chunks of reviews into the counts and titles of a SentimentCube"""
+
+    def __init__(self):
+        # Counts of the key combinations seen so far, keyed by plain values
+        self.counts = None
+        self.categories = {name: set() for name in DIMENSIONS}
+        # First non-missing title of every product seen so far
+        self.titles = {}
+        self.rows = 0
+
+    def add(self, chunk):
+        """Count the reviews of chunk, a DataFrame with the DIMENSIONS, overall and optionally title"""
+        for name in DIMENSIONS:
+            self.categories[name].update(chunk[name].cat.categories)
+        delta = count_keys(chunk).astype({name: object for name in DIMENSIONS})
+        if self.counts is None:
+            self.counts = delta
+        else:
+            self.counts = (
+                pd.concat([self.counts, delta], ignore_index=True)
+                .groupby(CUBE_KEYS, sort=False, dropna=False)['count'].sum()
+                .reset_index()
+            )
+        if 'title' in chunk:
+            firsts = chunk.groupby('asin', sort=False, observed=True)['title'].first().dropna()
+            for asin, title in firsts.items():
+                self.titles.setdefault(asin, title)
+        self.rows += len(chunk)
+
+    def add_titles(self, titles):
+        """Titles known per product up front, e.g. from a snapshot manifest"""
+        for asin, title in titles.items():
+            if isinstance(title, str):
+                self.titles.setdefault(asin, title)
+
+    def cube(self):
+        """SentimentCube of every review added"""
+        dtypes = {name: pd.CategoricalDtype(sorted_categories(self.categories[name])) for name in DIMENSIONS}
+        if self.counts is None:
+            counts = pd.DataFrame({key: pd.Series(dtype=dtypes.get(key, np.int8)) for key in CUBE_KEYS})
+            counts['count'] = pd.Series(dtype=np.int64)
+        else:
+            counts = self.counts.astype({**dtypes, 'overall': np.int8})
+        asins = dtypes['asin'].categories
+        titles = pd.Series([self.titles.get(asin) for asin in asins], index=asins, dtype=object, name='title')
+        return SentimentCube.from_counts(counts, titles)
+
+
+def aggregate(chunks, titles=None):
+    """(SentimentCube, review count) of the reviews in an iterable of chunks"""
+    accumulator = CubeAccumulator()
+    for chunk in chunks:
+        accumulator.add(chunk)
+    if titles is not None:
+        accumulator.add_titles(titles)
+    return accumulator.cube(), accumulator.rows
+
+
+def aggregate_reviews(csv_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """(SentimentCube, review count, version) of the processed CSV, read in chunks
+
+    Reads the snapshot next to the CSV when it is up to date, the CSV otherwise.
+    No snapshot is written, since that needs every review in memory.
+    """
+    snapshot_dir = snapshot_path(csv_path)
+    manifest = read_manifest(snapshot_dir)
+    if is_fresh(manifest, csv_path):
+        titles = pd.Series(manifest['titles'], index=manifest['columns']['asin']['categories'], dtype=object)
+        cube, rows = aggregate(snapshot_chunks(snapshot_dir, chunk_rows, manifest), titles)
+        return cube, rows, fingerprint_version(manifest['source'])
+    cube, rows = aggregate(csv_chunks(csv_path, chunk_rows))
+    return cube, rows, fingerprint_version(source_fingerprint(csv_path))
@@ -0,0 +1,218 @@
+"""Data structures the dashboard serves from, built once per dataset version"""
+import gc
+import logging
+import threading
+import time
+import weakref
+
+from product_ranking import ProductRanking
+from sentiment_cube import SentimentCube
+from sentiment_timeline import SentimentTimeline
+
+logger = logging.getLogger(__name__)
+
+
+def rank_products(cube):
+    """ProductRanking of cube with every category ranked up front, so top product charts never group per request"""
+    ranking = ProductRanking(cube)
+    categories = [c for c in cube.values('overall_category') if isinstance(c, str)]
+    ranking.precompute([None] + categories)
+    return ranking
+
+
+class DashboardData:
+    """A ReviewStore together with the aggregates derived from it"""
+
+    def __init__(self, store, cube=None, ranking=None, source_version=None, ingested=0, workers=1):
+        self.store = store
+        # Daily and monthly sentiment counts, precomputed on full loads and
+        # built on first use after an append
+        self.timeline = SentimentTimeline(store)
+        if cube is None:
+            self.timeline.precompute()
+        self.cube = cube if cube is not None else SentimentCube.from_store(store, workers)
+        self.ranking = ranking if ranking is not None else rank_products(self.cube)
+        # Version of the dataset file the store was loaded from, before any ingested reviews
+        self.source_version = source_version or store.version
+        # Number of reviews added since the dataset file was loaded
+        self.ingested = ingested
+
+    @property
+    def version(self):
+        return self.store.version
+
+    @property
+    def reviews(self):
+        """Number of reviews the aggregates count"""
+        return len(self.store)
+
+    def append(self, reviews):
+        """DashboardData with the reviews of a ReviewStore added
+
+        The aggregates are updated by the counts of the new reviews instead of
+        being rebuilt, and only the rankings of the categories they touch are
+        recomputed. The store's columns grow geometrically, so an ingest costs
+        the new reviews, not a copy of the loaded ones. The new version is the
+        source version plus the number of reviews added since it was loaded.
+        """
+        ingested = self.ingested + len(reviews)
+        store = self.store.append(reviews, f"{self.source_version}+{ingested}")
+        added = store.frame.iloc[len(self.store):]
+        cube = self.cube.add(added, store.titles)
+        ranking = self.ranking.updated(cube, list(added['overall_category'].unique()))
+        return DashboardData(store, cube, ranking, self.source_version, ingested)
+
+    def nbytes(self):
+        """Bytes held by the review store, the cube, its posting index and the timeline"""
+        return int(
+            self.store.memory_usage().sum() +
+            self.cube.counts.memory_usage(index=False, deep=True).sum() +
+            self.cube.index.nbytes() +
+            self.timeline.nbytes()
+        )
+
+
+class AggregateData(DashboardData):
+    """DashboardData of an out-of-core load: the aggregates without the reviews they count
+
+    Serves every chart from the cube and rankings. The timeline and ingestion
+    need the individual reviews, so timeline is None and append() refuses.
+    """
+
+    def __init__(self, cube, reviews, version):
+        self.store = None
+        self.timeline = None
+        self.cube = cube
+        self.ranking = rank_products(cube)
+        self.source_version = version
+        self.ingested = 0
+        self.review_count = reviews
+
+    @property
+    def version(self):
+        return self.source_version
+
+    @property
+    def reviews(self):
+        return self.review_count
+
+    def append(self, reviews):
+        raise ValueError("Reviews cannot be ingested while the dataset is aggregated out of core")
+
+    def nbytes(self):
+        """Bytes held by the cube and its posting index"""
+        return int(self.cube.counts.memory_usage(index=False, deep=True).sum() + self.cube.index.nbytes())
+
+
+class DashboardLoader:
+    """DashboardData loaded on first use, by exactly one caller, and swapped on reload
+
+    Concurrent first requests wait for the load already in progress instead of
+    each parsing the dataset. A failed load is retried by the next caller.
+
+    reload() builds the next DashboardData while requests keep being served
+    from the current one, then swaps it in with a single assignment; requests
+    already holding the old one finish with it. A reload is skipped until the
+    version replaced by the previous swap has been freed, so reloads never keep
+    more than two versions alive. update() swaps in a DashboardData derived
+    from the current one, serialized with reloads and other updates.
+
+    A reload replaces ingested reviews along with the rest of the data they
+    were added to; their number is logged as a warning and summed in
+    discarded_reviews.
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.data = None
+        self.load_seconds = None
+        self.generation = 0
+        self.reloads = 0
+        self.discarded_reviews = 0
+        self.last_error = None
+        self.previous = None
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+
+    def get(self):
+        data = self.data
+        if data is None:
+            with self.lock:
+                if self.data is None:
+                    start = time.perf_counter()
+                    self.data = self.load()
+                    self.load_seconds = time.perf_counter() - start
+                    self.generation += 1
+                data = self.data
+        return data
+
+    @property
+    def ready(self):
+        return self.data is not None
+
+    def previous_data(self):
+        """The version replaced by the last reload while something still uses it, or None"""
+        return self.previous() if self.previous is not None else None
+
+    def reload(self):
+        """Load the dataset again and swap it in
+
+        Returns the new DashboardData, or None when another reload is running
+        or the previously replaced version is still in use.
+        """
+        if not self.reload_lock.acquire(blocking=False):
+            return None
+        try:
+            if self.previous_data() is not None:
+                gc.collect()
+                if self.previous_data() is not None:
+                    return None
+            start = time.perf_counter()
+            data = self.load()
+            self.load_seconds = time.perf_counter() - start
+            previous = self._swap(data)
+            self.reloads += 1
+            self.last_error = None
+            if previous is not None and previous.ingested:
+                self.discarded_reviews += previous.ingested
+                logger.warning("Reload to version %s discarded %d ingested reviews of version %s",
+                               data.version, previous.ingested, previous.version,
+                               extra={'version': data.version, 'discarded': previous.ingested})
+            return data
+        finally:
+            self.reload_lock.release()
+
+    def update(self, change):
+        """Swap in change(current data) and return it"""
+        with self.reload_lock:
+            data = change(self.get())
+            self._swap(data)
+            return data
+
+    def _swap(self, data):
+        with self.lock:
+            previous, self.data = self.data, data
+            self.generation += 1
+        self.previous = weakref.ref(previous) if previous is not None else None
+        return previous
+
+    def status(self):
+        """Version, generation and memory of the data in use and of the one it replaced"""
+        data = self.data
+        previous = self.previous_data()
+        return {
+            'ready': data is not None,
+            'version': data.version if data is not None else None,
+            'source_version': data.source_version if data is not None else None,
+            'ingested': data.ingested if data is not None else 0,
+            'generation': self.generation,
+            'reloads': self.reloads,
+            'discarded_reviews': self.discarded_reviews,
+            'load_seconds': self.load_seconds,
+            'last_error': self.last_error,
+            'bytes': data.nbytes() if data is not None else 0,
+            'previous': None if previous is None else {
+                'version': previous.version,
+                'bytes': previous.nbytes()
+            }
+        }
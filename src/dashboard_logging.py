@@ -0,0 +1,41 @@
+"""Logging setup shared by the dashboard and its command line tools
+
+DASHBOARD_LOG_LEVEL picks the level (INFO by default; DEBUG adds the figure
+builders' diagnostics) and DASHBOARD_LOG_FORMAT=json writes one JSON object
+per record, with any extra= fields of the call as keys, for log collectors.
+"""
+import json
+import logging
+import os
+
+LOG_LEVEL = os.environ.get('DASHBOARD_LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('DASHBOARD_LOG_FORMAT', 'text')
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through extra=
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': record.getMessage()
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Send log records to stderr, unless whatever embeds the dashboard configured logging already"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    logging.basicConfig(level=level, handlers=[handler])
@@ -0,0 +1,87 @@
+"""Background reload of the dashboard data when its source CSV or its snapshot changes"""
+import logging
+import os
+import threading
+
+from dataset_snapshot import fingerprint_version, is_fresh, read_manifest, snapshot_path, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def stat_state(path):
+    """(size, mtime, inode) of path, or None when it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class DatasetReloader(threading.Thread):
+    """Polls the processed CSV and its snapshot and reloads the DashboardLoader when they change
+
+    A change is only acted on once the files' size and mtime have stayed the
+    same for a whole polling interval, so a CSV that is still being written is
+    not loaded half way. The CSV is fingerprinted only when its size or mtime
+    moved since the last check. on_reload(data) is called after every swap.
+
+    A snapshot rebuilt for the CSV being served (by dataset_snapshot.py) is
+    swapped in as well, so the served columns are mapped from it. Such a
+    rebuild holds the same reviews, so it is not swapped in while ingested
+    reviews would be lost by the reload.
+    """
+
+    def __init__(self, csv_path, loader, interval, on_reload=None):
+        super().__init__(name='dataset-reloader', daemon=True)
+        self.csv_path = csv_path
+        self.snapshot_dir = snapshot_path(csv_path)
+        self.loader = loader
+        self.interval = interval
+        self.on_reload = on_reload
+        self.last_state = None
+        self.checked_state = None
+        self.stopped = threading.Event()
+
+    def file_state(self):
+        """States of the CSV and of the snapshot manifest, or None when there is no CSV"""
+        csv_state = stat_state(self.csv_path)
+        if csv_state is None:
+            return None
+        return csv_state, stat_state(os.path.join(self.snapshot_dir, 'manifest.json'))
+
+    def check(self):
+        """Reload when the CSV or its snapshot settled on new contents; returns the new data or None"""
+        state = self.file_state()
+        settled = state is not None and state == self.last_state
+        self.last_state = state
+        data = self.loader.data
+        if not settled or state == self.checked_state or data is None:
+            return None
+
+        checked, self.checked_state = self.checked_state, state
+        if fingerprint_version(source_fingerprint(self.csv_path)) == data.source_version:
+            # Same CSV: only a snapshot rebuilt since the last check is swapped in
+            if (checked is None or state[1] == checked[1] or data.ingested or
+                    not is_fresh(read_manifest(self.snapshot_dir), self.csv_path)):
+                return None
+        new_data = self.loader.reload()
+        if new_data is None:
+            # Skipped, try again on the next poll
+            self.checked_state = checked
+            return None
+        # Loading a changed CSV rewrites the snapshot, which is not a change to act on
+        self.checked_state = self.last_state = self.file_state()
+        if self.on_reload is not None:
+            self.on_reload(new_data)
+        return new_data
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.loader.last_error = f"{type(e).__name__}: {e}"
+                logger.exception("Reloading %s failed", self.csv_path)
+
+    def stop(self):
+        self.stopped.set()
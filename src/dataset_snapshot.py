@@ -0,0 +1,174 @@
+"""Binary columnar snapshot of the processed review CSV
+
+The snapshot is a directory with one memory-mappable .npy file per ReviewStore
+column and a manifest.json holding the category labels of dictionary encoded
+columns, the product titles and a fingerprint of the source CSV. A snapshot is only
+used while its fingerprint matches the CSV; otherwise the CSV is parsed again
+and the snapshot rebuilt.
+
+Build it ahead of time with:
+
+    python dataset_snapshot.py ../data/processed/final_indepth_sentiment_analysis_w_processed_category.csv
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from review_store import DIMENSIONS, SOURCE_COLUMNS, ReviewStore
+
+SNAPSHOT_VERSION = 3
+
+# Bytes hashed from each end of the CSV on top of its size and mtime
+FINGERPRINT_SAMPLE_BYTES = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_path(csv_path):
+    """Default snapshot location next to the CSV"""
+    return str(Path(csv_path).with_suffix('.snapshot'))
+
+
+def source_fingerprint(csv_path):
+    """Cheap fingerprint of the CSV: size, mtime and a hash of its first and last MB"""
+    stat = os.stat(csv_path)
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE_BYTES))
+        if stat.st_size > FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(stat.st_size - FINGERPRINT_SAMPLE_BYTES, FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read())
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest.hexdigest()
+    }
+
+
+def fingerprint_version(fingerprint):
+    """Short dataset version string derived from a source fingerprint"""
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def read_reviews_csv(csv_path):
+    """Parse the dashboard columns of the processed review CSV into a ReviewStore"""
+    df = pd.read_csv(
+        csv_path,
+        usecols=SOURCE_COLUMNS,
+        dtype={name: 'category' for name in DIMENSIONS}
+    )
+    store = ReviewStore.from_frame(df)
+    store.version = fingerprint_version(source_fingerprint(csv_path))
+    return store
+
+
+def write_snapshot(store, csv_path, snapshot_dir=None):
+    """Write store as a snapshot of csv_path, replacing any existing one atomically"""
+    snapshot_dir = snapshot_dir or snapshot_path(csv_path)
+    tmp_dir = f'{snapshot_dir}.tmp-{os.getpid()}'
+    os.makedirs(tmp_dir)
+
+    columns = {}
+    for name in store.frame.columns:
+        column = store.frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # int32 codes on disk, labels in the manifest
+            values = column.cat.codes.to_numpy().astype(np.int32)
+            columns[name] = {'kind': 'category', 'categories': [str(c) for c in column.cat.categories]}
+        else:
+            values = column.to_numpy()
+            columns[name] = {'kind': 'numeric'}
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(values))
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'rows': len(store),
+        'source': source_fingerprint(csv_path),
+        'columns': columns,
+        'titles': [title if isinstance(title, str) else None for title in store.titles]
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    old_dir = f'{snapshot_dir}.old-{os.getpid()}'
+    if os.path.exists(snapshot_dir):
+        os.rename(snapshot_dir, old_dir)
+    os.rename(tmp_dir, snapshot_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return snapshot_dir
+
+
+def read_manifest(snapshot_dir):
+    """Snapshot manifest, or None if there is no readable snapshot"""
+    try:
+        with open(os.path.join(snapshot_dir, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(manifest, csv_path):
+    """True when the snapshot was built from the current contents of csv_path"""
+    return (
+        manifest is not None and
+        manifest.get('version') == SNAPSHOT_VERSION and
+        manifest.get('source') == source_fingerprint(csv_path)
+    )
+
+
+def read_snapshot(snapshot_dir, manifest=None):
+    """Load a snapshot as a ReviewStore with its column arrays memory-mapped read-only"""
+    manifest = manifest or read_manifest(snapshot_dir)
+    data = {}
+    for name, spec in manifest['columns'].items():
+        values = np.load(os.path.join(snapshot_dir, f'{name}.npy'), mmap_mode='r')
+        if spec['kind'] == 'category':
+            dtype = pd.CategoricalDtype(spec['categories'])
+            data[name] = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        else:
+            data[name] = values
+    frame = pd.DataFrame(data, copy=False)
+    titles = pd.Series(manifest['titles'], index=frame['asin'].cat.categories, dtype=object)
+    return ReviewStore(frame, titles, fingerprint_version(manifest['source']))
+
+
+def load_reviews(csv_path, snapshot_dir=None):
+    """Load the ReviewStore from a fresh snapshot, or from the CSV and rebuild the snapshot"""
+    snapshot_dir = snapshot_dir or snapshot_path(csv_path)
+    manifest = read_manifest(snapshot_dir)
+    if is_fresh(manifest, csv_path):
+        return read_snapshot(snapshot_dir, manifest)
+
+    store = read_reviews_csv(csv_path)
+    try:
+        write_snapshot(store, csv_path, snapshot_dir)
+    except OSError as e:
+        logger.warning("Could not write snapshot %s: %s", snapshot_dir, e)
+        return store
+    # Serve the freshly written snapshot so both paths return identical stores
+    return read_snapshot(snapshot_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the binary snapshot of a processed review CSV')
+    parser.add_argument('csv_path', help='processed review CSV')
+    parser.add_argument('--output', help='snapshot directory (default: next to the CSV)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = read_reviews_csv(args.csv_path)
+    snapshot_dir = write_snapshot(store, args.csv_path, args.output)
+    print(f"Wrote {len(store)} reviews to {snapshot_dir} in {time.perf_counter() - start:.1f}s "
+          f"({store.bytes_per_review():.1f} bytes/review in memory)")
+
+
+if __name__ == '__main__':
+    main()
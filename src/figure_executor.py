@@ -0,0 +1,130 @@
+"""Bounded executor shared by the app for building independent figures concurrently"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+EXECUTOR_KINDS = ['thread', 'process', 'serial']
+
+logger = logging.getLogger(__name__)
+
+
+class FigureExecutor:
+    """Builds the figures of one response concurrently, within a time budget
+
+    kind selects the pool:
+      - 'thread' shares intermediates between the figures of a request and
+        helps when the builders spend their time in code that releases the GIL;
+      - 'process' runs build_in_process(name, params, version) in worker
+        processes, each holding its own copy of the data, for GIL-bound builders;
+      - 'serial' builds the figures one after another in the request thread.
+
+    Worker processes can only load the dataset file, so with 'process' the
+    figures of data that in_process(data) rejects (e.g. data with ingested
+    reviews) are built on threads instead.
+
+    Figures not finished timeout seconds after the request started, and
+    figures whose build raised, are replaced by placeholder(name); unfinished
+    builds are left to finish in the pool. The pools are created on first use,
+    so forked server workers each get their own.
+    """
+
+    def __init__(self, graph, kind='thread', max_workers=None, timeout=None,
+                 placeholder=None, build_in_process=None, in_process=None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown figure executor {kind!r}, expected one of {EXECUTOR_KINDS}")
+        if kind == 'process' and build_in_process is None:
+            raise ValueError("A process figure executor needs build_in_process")
+        self.graph = graph
+        self.kind = kind
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.timeout = timeout
+        self.placeholder = placeholder
+        self.build_in_process = build_in_process
+        self.in_process = in_process
+        # Pools by kind, and the process that created them
+        self.pools = {}
+        self.pool_pid = None
+        self.timeouts = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def _pool(self, kind):
+        with self.lock:
+            if self.pool_pid != os.getpid():
+                self.pools = {}
+                self.pool_pid = os.getpid()
+            if kind not in self.pools:
+                if kind == 'process':
+                    self.pools[kind] = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self.pools[kind] = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                          thread_name_prefix='figure')
+            return self.pools[kind]
+
+    def build(self, names, data, **params):
+        """(figures by name, names replaced by a placeholder) for one request"""
+        if self.kind == 'serial':
+            return self._build_serially(names, data, params)
+
+        start = time.perf_counter()
+        if self.kind == 'process' and (self.in_process is None or self.in_process(data)):
+            pool = self._pool('process')
+            futures = {name: pool.submit(self.build_in_process, name, params, data.version)
+                       for name in names}
+        else:
+            futures = self.graph.submit(self._pool('thread'), names, data, **params)
+
+        done, _ = wait(futures.values(), timeout=self.timeout)
+        figures = {}
+        timed_out = []
+        failed = []
+        for name, future in futures.items():
+            if future in done:
+                try:
+                    figures[name] = future.result()
+                except Exception:
+                    logger.exception("Building figure %s failed, serving a placeholder", name,
+                                     extra={'figure': name})
+                    failed.append(name)
+                    figures[name] = self.placeholder(name)
+            else:
+                future.cancel()
+                timed_out.append(name)
+                figures[name] = self.placeholder(name)
+        with self.lock:
+            self.timeouts += len(timed_out)
+            self.failures += len(failed)
+        if timed_out:
+            seconds = time.perf_counter() - start
+            logger.warning("Figures %s took longer than %ss (%.1fs), serving placeholders",
+                           timed_out, self.timeout, seconds,
+                           extra={'figures': timed_out, 'seconds': seconds})
+        return figures, timed_out + failed
+
+    def _build_serially(self, names, data, params):
+        try:
+            return self.graph.evaluate(names, data, **params), []
+        except Exception:
+            pass
+        # Build the figures one by one to find the ones that fail
+        figures = {}
+        failed = []
+        for name in names:
+            try:
+                figures[name] = self.graph.evaluate([name], data, **params)[name]
+            except Exception:
+                logger.exception("Building figure %s failed, serving a placeholder", name,
+                                 extra={'figure': name})
+                failed.append(name)
+                figures[name] = self.placeholder(name)
+        with self.lock:
+            self.failures += len(failed)
+        return figures, failed
+
+    def shutdown(self):
+        with self.lock:
+            for pool in self.pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self.pools = {}
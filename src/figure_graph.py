@@ -0,0 +1,120 @@
+"""Dependency graph of the dashboard figures and the intermediates they share"""
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import Future
+
+Node = namedtuple('Node', ['name', 'build', 'deps', 'params', 'key_params', 'per_dataset'])
+
+
+class FigureGraph:
+    """Named nodes computed at most once per request, or once per dataset version
+
+    A node is built from the dashboard data, the request parameters it lists in
+    params and the values of the nodes it lists in deps:
+
+        graph.add('valid_brands', lambda data, main_category: ..., params=['main_category'])
+        graph.add('brand_plot', lambda data, main_category, valid_brands: ...,
+                  deps=['valid_brands'], params=['main_category'])
+
+    Nodes marked per_dataset are memoized across requests for as long as the
+    dashboard data they were built from is alive, in a memo of their own per
+    data object, so requests still running on a replaced version never mix
+    their values with the current one's. The others are shared only within
+    one evaluate() call.
+    A node's memo key includes its own params and those of its dependencies.
+
+    submit() builds the requested nodes concurrently on an executor. Nodes
+    reached from several of them are still built once: the first task to need
+    one builds it and the others wait for its value.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        # Per-dataset values by the dashboard data they were built from
+        self.memos = weakref.WeakKeyDictionary()
+        self.timings = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, build, deps=(), params=(), per_dataset=False):
+        key_params = list(params)
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Node {name} depends on unknown node {dep}")
+            key_params += [p for p in self.nodes[dep].key_params if p not in key_params]
+        self.nodes[name] = Node(name, build, tuple(deps), tuple(params), tuple(key_params), per_dataset)
+
+    def evaluate(self, names, data, **params):
+        """Values of the named nodes for one request"""
+        values = self._request_values(data)
+        return {name: self._value(name, data, params, values) for name in names}
+
+    def submit(self, executor, names, data, **params):
+        """Futures of the named nodes for one request, built on executor"""
+        values = self._request_values(data)
+        return {name: executor.submit(self._value, name, data, params, values) for name in names}
+
+    def clear(self):
+        """Forget the per-dataset values, so the next request builds every node again"""
+        with self.lock:
+            self.memos = weakref.WeakKeyDictionary()
+
+    def _request_values(self, data):
+        with self.lock:
+            memo = self.memos.get(data)
+            if memo is None:
+                memo = self.memos[data] = {}
+        # Futures of the nodes built for this request, keyed like the memo
+        return {'lock': threading.Lock(), 'futures': {}, 'memo': memo}
+
+    def _value(self, name, data, params, values):
+        node = self.nodes[name]
+        node_params = {param: params.get(param) for param in node.params}
+        key = (name,) + tuple(params.get(param) for param in node.key_params)
+        with values['lock']:
+            future = values['futures'].get(key)
+            if future is not None:
+                building = False
+            else:
+                future = values['futures'][key] = Future()
+                building = True
+        if not building:
+            return future.result()
+
+        try:
+            value = self._build(node, key, data, params, node_params, values)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        future.set_result(value)
+        return value
+
+    def _build(self, node, key, data, params, node_params, values):
+        memo = values['memo']
+        if node.per_dataset:
+            with self.lock:
+                if key in memo:
+                    return memo[key]
+
+        dep_values = {dep: self._value(dep, data, params, values) for dep in node.deps}
+        start = time.perf_counter()
+        value = node.build(data, **node_params, **dep_values)
+        self._record(node.name, time.perf_counter() - start)
+
+        if node.per_dataset:
+            with self.lock:
+                memo[key] = value
+        return value
+
+    def _record(self, name, seconds):
+        with self.lock:
+            timing = self.timings.setdefault(name, {'calls': 0, 'total_seconds': 0.0, 'last_seconds': 0.0})
+            timing['calls'] += 1
+            timing['total_seconds'] += seconds
+            timing['last_seconds'] = seconds
+
+    def node_timings(self):
+        """Per-node build count, total and last build time in seconds"""
+        with self.lock:
+            return {name: dict(timing) for name, timing in self.timings.items()}
@@ -0,0 +1,93 @@
+"""Single-pass JSON encoding of plain-dict Plotly figures
+
+The chart builders return figures as plain {'data': [...], 'layout': {...}}
+dicts instead of validated plotly.graph_objects figures. Arrays stay numpy
+arrays until they are written out by orjson when it is installed, or by the
+standard json module otherwise. The Plotly template that go.Figure would copy
+into every figure is sent once per page or response and applied in the browser.
+"""
+import json
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@lru_cache(maxsize=1)
+def default_template():
+    """Layout template go.Figure would embed in every figure"""
+    return pio.templates[pio.templates.default].to_plotly_json()
+
+
+def to_jsonable(obj):
+    """Fallback conversion for values the encoder does not handle natively"""
+    if isinstance(obj, (np.ndarray, pd.Series, pd.Index)):
+        return np.asarray(obj).tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Encode obj as JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=to_jsonable, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=to_jsonable, separators=(',', ':')).encode()
+
+
+class PayloadSizes:
+    """Encoded size of every panel, as last seen and summed over all encodings
+
+    observers are called with (panel, size) on every record, e.g. to feed a
+    size histogram.
+    """
+
+    def __init__(self):
+        self.sizes = {}
+        self.observers = []
+        self.lock = threading.Lock()
+
+    def record(self, panel, size):
+        with self.lock:
+            stats = self.sizes.setdefault(panel, {'count': 0, 'total_bytes': 0, 'last_bytes': 0})
+            stats['count'] += 1
+            stats['total_bytes'] += size
+            stats['last_bytes'] = size
+        for observer in self.observers:
+            observer(panel, size)
+
+    def snapshot(self):
+        with self.lock:
+            return {panel: dict(stats) for panel, stats in self.sizes.items()}
+
+
+payload_sizes = PayloadSizes()
+
+
+def encode_panels(panels, include_template=True):
+    """Encode a dict of figures as one JSON object, recording each panel's size
+
+    Each panel is encoded once and the object is assembled from the encoded
+    panels, so per-panel sizes come for free. With include_template the shared
+    Plotly template is added under the 'template' key.
+    """
+    parts = []
+    for name, figure in panels.items():
+        encoded = dumps(figure)
+        payload_sizes.record(name, len(encoded))
+        parts.append(dumps(name) + b':' + encoded)
+    if include_template:
+        parts.append(b'"template":' + encoded_template())
+    return b'{' + b','.join(parts) + b'}'
+
+
+@lru_cache(maxsize=1)
+def encoded_template():
+    return dumps(default_template())
@@ -0,0 +1,269 @@
+"""Concurrent load test of / and /update_plots/<overall_category>
+
+Simulates users who open the dashboard and then switch categories: each user
+requests / and then --switches /update_plots/<category> URLs, the categories
+drawn from a mix. Users run --concurrency at a time, each request waiting for
+the previous one of its user. Runs in this process through the Flask test
+client (one client per thread), or against a running server with --url:
+
+    python load_test.py --concurrency 1 8 32 --users 200 --mix popular
+    python load_test.py --url http://127.0.0.1:5000 --concurrency 16
+
+Mixes: 'uniform' (every category equally), 'popular' (in proportion to the
+category's reviews), 'hot' (80% of switches to the largest category), or a
+JSON file mapping categories to weights.
+
+Every concurrency level is run cold and then warm. In-process, the cold run
+starts with an empty response cache and figure memo and the warm run with
+every response precomputed. A remote server cannot be emptied from here, so
+its cold run is only cold on a freshly started server and its warm run follows
+a pass over every category. The report gives throughput and p50/p95/p99
+latency overall, by route and by category, as JSON.
+"""
+import argparse
+import html
+import importlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+import numpy as np
+
+MIXES = ['uniform', 'popular', 'hot']
+# Share of the switches the 'hot' mix sends to the largest category
+HOT_SHARE = 0.8
+ACCEPT_ENCODING = 'gzip, br'
+# Options of the dashboard's category selector
+OPTION = re.compile(r'<option value="([^"]*)">')
+
+
+def in_process_target(data_path=None):
+    """(get, categories with review counts, reset, warm) of the dashboard app in this process"""
+    if data_path:
+        os.environ['DASHBOARD_DATA_PATH'] = data_path
+    os.environ.setdefault('DASHBOARD_RELOAD_INTERVAL', '0')
+    module = importlib.import_module('04_data_visualization_advanced_part4')
+    module.create_app(watch=False)
+    clients = threading.local()
+
+    def get(path):
+        if not hasattr(clients, 'client'):
+            clients.client = module.app.test_client()
+        response = clients.client.get(path, headers={'Accept-Encoding': ACCEPT_ENCODING})
+        return response.status_code, len(response.data)
+
+    def reset():
+        module.response_cache.clear()
+        module.figure_graph.clear()
+
+    cube = module.load_data().cube
+    counts = cube.sentiment_table('overall_category')['total']
+    categories = {category: int(counts.get(category, 0)) for category in module.dashboard_categories(cube)}
+    categories['All Categories'] = int(cube.total())
+    return get, categories, reset, module.warm_response_cache
+
+
+def http_target(url):
+    """(get, categories with review counts, reset, warm) of a running server
+
+    The categories are the options of the dashboard's category selector and
+    their review counts the totals of their monthly /trend series.
+    """
+    base = url.rstrip('/')
+
+    def get(path):
+        request = urllib.request.Request(base + path, headers={'Accept-Encoding': ACCEPT_ENCODING})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+
+    def fetch(path):
+        with urllib.request.urlopen(base + path) as response:
+            return response.read().decode()
+
+    def reviews(category):
+        query = '' if category == 'All Categories' else '&category=' + urllib.parse.quote(category, safe='')
+        try:
+            return sum(json.loads(fetch(f'/trend?unit=month&window=1{query}'))['total'])
+        except urllib.error.HTTPError:
+            return 0
+
+    names = [html.unescape(name) for name in OPTION.findall(fetch('/'))]
+    categories = {name: reviews(name) for name in names}
+
+    def warm():
+        get('/')
+        for category in categories:
+            get(update_plots_path(category))
+    return get, categories, None, warm
+
+
+def update_plots_path(category):
+    return '/update_plots/' + urllib.parse.quote(category, safe='')
+
+
+def category_weights(mix, categories):
+    """Normalized switch probability of every category"""
+    names = list(categories)
+    if mix == 'uniform':
+        weights = np.ones(len(names))
+    elif mix == 'popular':
+        weights = np.array([categories[name] for name in names], dtype=float)
+    elif mix == 'hot':
+        sizes = [categories[name] if name != 'All Categories' else -1 for name in names]
+        weights = np.full(len(names), (1 - HOT_SHARE) / max(len(names) - 1, 1))
+        weights[int(np.argmax(sizes))] = HOT_SHARE
+    else:
+        with open(mix) as f:
+            chosen = json.load(f)
+        unknown = set(chosen) - set(names)
+        if unknown:
+            raise ValueError(f"Mix {mix} names unknown categories {sorted(unknown)}")
+        names = list(chosen)
+        weights = np.array([chosen[name] for name in names], dtype=float)
+    return dict(zip(names, weights / weights.sum()))
+
+
+def user_scripts(weights, users, switches, seed):
+    """(path, route, category) requests of every simulated user, in order"""
+    rng = np.random.default_rng(seed)
+    names = list(weights)
+    scripts = []
+    for _ in range(users):
+        picks = rng.choice(len(names), size=switches, p=list(weights.values()))
+        script = [('/', '/', None)]
+        script += [(update_plots_path(names[i]), '/update_plots/<overall_category>', names[i]) for i in picks]
+        scripts.append(script)
+    return scripts
+
+
+def run_phase(get, scripts, concurrency):
+    """(samples, seconds) of running scripts with concurrency users at a time
+
+    A sample is (route, category, seconds, status, bytes).
+    """
+    samples = []
+    lock = threading.Lock()
+    next_user = iter(range(len(scripts)))
+
+    def worker():
+        own = []
+        while True:
+            with lock:
+                user = next(next_user, None)
+            if user is None:
+                break
+            for path, route, category in scripts[user]:
+                start = time.perf_counter()
+                try:
+                    status, size = get(path)
+                except OSError:
+                    status, size = None, 0
+                own.append((route, category, time.perf_counter() - start, status, size))
+        with lock:
+            samples.extend(own)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def latency_summary(seconds):
+    milliseconds = np.asarray(seconds) * 1e3
+    p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+    return {
+        'requests': len(milliseconds),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'mean_ms': float(milliseconds.mean()),
+        'max_ms': float(milliseconds.max())
+    }
+
+
+def phase_report(phase, concurrency, samples, seconds):
+    errors = sum(1 for sample in samples if sample[3] != 200)
+    report = {
+        'phase': phase,
+        'concurrency': concurrency,
+        'seconds': seconds,
+        'errors': errors,
+        'throughput_rps': len(samples) / seconds if seconds else 0.0,
+        'bytes': sum(sample[4] for sample in samples),
+        'latency': latency_summary([sample[2] for sample in samples])
+    }
+    for field, position in [('routes', 0), ('categories', 1)]:
+        groups = {}
+        for sample in samples:
+            if sample[position] is not None:
+                groups.setdefault(sample[position], []).append(sample[2])
+        report[field] = {name: latency_summary(values) for name, values in sorted(groups.items())}
+    return report
+
+
+def run_load_test(target, concurrencies, users, switches, mix, seed):
+    get, categories, reset, warm = target
+    weights = category_weights(mix, categories)
+    scripts = user_scripts(weights, users, switches, seed)
+    runs = []
+    for concurrency in concurrencies:
+        for phase in ['cold', 'warm']:
+            if phase == 'cold' and reset is not None:
+                reset()
+            if phase == 'warm':
+                warm()
+            samples, seconds = run_phase(get, scripts, concurrency)
+            runs.append(phase_report(phase, concurrency, samples, seconds))
+            latency = runs[-1]['latency']
+            print(f"{phase:>4} x{concurrency:<4} {runs[-1]['throughput_rps']:8.1f} req/s  "
+                  f"p50 {latency['p50_ms']:7.2f} ms  p95 {latency['p95_ms']:7.2f} ms  "
+                  f"p99 {latency['p99_ms']:7.2f} ms  errors {runs[-1]['errors']}", file=sys.stderr)
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'users': users,
+        'switches': switches,
+        'mix': mix,
+        'weights': {name: float(weight) for name, weight in weights.items()},
+        'seed': seed,
+        'runs': runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the dashboard with users switching categories')
+    parser.add_argument('--url', help='base URL of a running dashboard (default: the app in this process)')
+    parser.add_argument('--data', help='review CSV of the in-process app (default: DASHBOARD_DATA_PATH)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='users running at once')
+    parser.add_argument('--users', type=int, default=100, help='simulated users per run')
+    parser.add_argument('--switches', type=int, default=10, help='category switches per user')
+    parser.add_argument('--mix', default='popular', help=f"category mix: {', '.join(MIXES)} or a JSON file")
+    parser.add_argument('--seed', type=int, default=0, help='seed of the category choices')
+    parser.add_argument('--output', help='JSON file to write the report to (default: stdout)')
+    args = parser.parse_args()
+
+    target = http_target(args.url) if args.url else in_process_target(args.data)
+    report = run_load_test(target, args.concurrency, args.users, args.switches, args.mix, args.seed)
+    report['target'] = args.url or 'in-process'
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
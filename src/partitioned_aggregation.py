@@ -0,0 +1,121 @@
+"""Cube counts aggregated on several cores, over partitions of the reviews by asin
+
+count_keys() groups every review in one thread. partitioned_count_keys()
+assigns every review to the partition of its asin code once, and copies the
+row positions grouped by partition, followed by the integer codes of the
+CUBE_KEYS columns in the same order, into one shared memory block. Each
+worker process maps it, takes the contiguous slice of its partition and
+counts its key combinations by factorizing a mixed-radix composite of the
+codes. The workers receive only the block's name and their slice bounds and
+return their partial counts, never the review columns themselves.
+
+Every key combination includes the asin, so partitions never share one and
+the partial counts are merged by concatenation. Each partial also carries the
+position of its combination's first review, and sorting the merged counts by
+it restores the first-appearance order of count_keys(), which the result
+matches exactly.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from sentiment_cube import CUBE_KEYS, count_keys
+
+
+def partition_rows(asin_codes, partitions):
+    """(row positions grouped by asin partition, bounds of every partition in them)
+
+    Positions keep their order within a partition. Partition numbers are held
+    in the smallest unsigned type, for which numpy's stable sort is a radix sort.
+    """
+    partition = (asin_codes % partitions).astype(np.min_scalar_type(partitions - 1))
+    order = np.argsort(partition, kind='stable')
+    bounds = np.r_[0, np.cumsum(np.bincount(partition, minlength=partitions))]
+    return order, bounds
+
+
+def write_key_codes(frame, overall_codes, order, out):
+    """Fill out, one int32 row per CUBE_KEYS column, with the codes of the rows of frame at order
+
+    Categorical codes keep -1 for missing values; overall is coded by its
+    position among its distinct values (overall_codes).
+    """
+    for row, key in enumerate(CUBE_KEYS):
+        codes = overall_codes if key == 'overall' else frame[key].cat.codes.to_numpy()
+        out[row] = codes[order]
+
+
+def block_arrays(buffer, shape):
+    """(row positions, key codes) views of a shared memory block laid out by partitioned_count_keys()"""
+    positions = np.ndarray(shape[1], dtype=np.int64, buffer=buffer)
+    codes = np.ndarray(shape, dtype=np.int32, buffer=buffer, offset=positions.nbytes)
+    return positions, codes
+
+
+def count_partition(block_name, shape, radices, start, stop):
+    """(composite keys, first review positions, counts) of the reviews in slice start:stop of the block"""
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        positions, codes = block_arrays(block.buf, shape)
+        rows = positions[start:stop].copy()
+        keys = np.zeros(stop - start, dtype=np.int64)
+        for row, radix in enumerate(radices):
+            # Shift by one so missing (-1) codes become 0
+            keys = keys * radix + (codes[row, start:stop] + 1)
+        del positions, codes
+    finally:
+        block.close()
+    # factorize numbers the combinations in order of first appearance, so a
+    # review is the first of its combination when its number exceeds all before it
+    numbers, combinations = pd.factorize(keys)
+    first = np.flatnonzero(numbers > np.maximum.accumulate(np.r_[-1, numbers[:-1]]))
+    return combinations, rows[first], np.bincount(numbers, minlength=len(combinations))
+
+
+def partitioned_count_keys(frame, workers=None, partitions=None):
+    """count_keys(frame), counted by workers processes over partitions of the asins"""
+    workers = workers or os.cpu_count() or 1
+    partitions = partitions or workers
+    overall_values, overall_codes = np.unique(frame['overall'].to_numpy(), return_inverse=True)
+    radices = [len(frame[key].cat.categories) + 1 if key != 'overall' else len(overall_values) + 1
+               for key in CUBE_KEYS]
+    if np.prod(radices, dtype=float) >= 2 ** 63 or len(frame) == 0:
+        # The composite key would overflow int64
+        return count_keys(frame)
+
+    shape = (len(CUBE_KEYS), len(frame))
+    order, bounds = partition_rows(frame['asin'].cat.codes.to_numpy(), partitions)
+    block = shared_memory.SharedMemory(create=True, size=shape[1] * 8 + shape[0] * shape[1] * 4)
+    try:
+        positions, codes = block_arrays(block.buf, shape)
+        positions[:] = order
+        write_key_codes(frame, overall_codes, order, codes)
+        del positions, codes, order, overall_codes
+        with ProcessPoolExecutor(max_workers=min(workers, partitions)) as pool:
+            futures = [pool.submit(count_partition, block.name, shape, radices, start, stop)
+                       for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()) if stop > start]
+            parts = [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+
+    keys = np.concatenate([part[0] for part in parts])
+    first = np.concatenate([part[1] for part in parts])
+    counts = np.concatenate([part[2] for part in parts])
+    order = np.argsort(first, kind='stable')
+    keys, counts = keys[order], counts[order]
+
+    columns = {}
+    for key, radix in reversed(list(zip(CUBE_KEYS, radices))):
+        codes = (keys % radix).astype(np.int32) - 1
+        keys = keys // radix
+        if key == 'overall':
+            columns[key] = overall_values[codes]
+        else:
+            columns[key] = pd.Categorical.from_codes(codes, dtype=frame[key].dtype, validate=False)
+    result = pd.DataFrame({key: columns[key] for key in CUBE_KEYS})
+    result['count'] = counts.astype(np.int64)
+    return result
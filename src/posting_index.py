@@ -0,0 +1,54 @@
+"""Posting-list index from column values to sorted row positions"""
+import numpy as np
+import pandas as pd
+
+EMPTY_POSITIONS = np.empty(0, dtype=np.int64)
+
+
+class PostingIndex:
+    """Sorted row positions of every value of some columns of a frame
+
+    Each column is stored like a CSR matrix: one array with the row positions
+    grouped by value and an offsets array delimiting the groups, so looking up
+    a value returns a view and allocates nothing.
+    """
+
+    def __init__(self, frame, columns):
+        self.rows = len(frame)
+        self.postings = {}
+        for column in columns:
+            values = frame[column]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            codes = values.cat.codes.to_numpy()
+            # Stable sort keeps positions ascending within each value
+            order = np.argsort(codes, kind='stable')
+            # Missing values have code -1 and are not indexed
+            counts = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+            offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            order = order[(codes < 0).sum():]
+            lookup = {value: code for code, value in enumerate(values.cat.categories)}
+            self.postings[column] = (lookup, order, offsets)
+
+    def positions(self, column, value):
+        """Sorted row positions where column == value"""
+        lookup, order, offsets = self.postings[column]
+        code = lookup.get(value)
+        if code is None:
+            return EMPTY_POSITIONS
+        return order[offsets[code]:offsets[code + 1]]
+
+    def nbytes(self):
+        """Memory held by the position and offset arrays"""
+        return sum(order.nbytes + offsets.nbytes for _, order, offsets in self.postings.values())
+
+
+def take_rows(frame, positions):
+    """Rows of frame at sorted positions, as a view when they are contiguous"""
+    if len(positions) == 0:
+        return frame.iloc[:0]
+    start, stop = positions[0], positions[-1] + 1
+    if stop - start == len(positions):
+        return frame.iloc[start:stop]
+    return frame.take(positions)
@@ -0,0 +1,104 @@
+"""Vectorized top-k product ranking behind the top products charts"""
+import numpy as np
+import pandas as pd
+
+SENTIMENT_TYPES = ['positive', 'negative']
+
+# Products need at least this many reviews to be ranked
+MIN_PRODUCT_REVIEWS = 5
+
+
+def top_k_positions(score, total, k):
+    """Positions of the k largest scores, best first
+
+    Ties are broken by larger review total, then by earlier position, which is
+    the order the per-product loop used to produce. Only the candidates at or
+    above the k-th largest score are sorted.
+    """
+    if len(score) <= k:
+        candidates = np.arange(len(score))
+    else:
+        threshold = np.partition(score, len(score) - k)[len(score) - k]
+        candidates = np.flatnonzero(score >= threshold)
+    order = np.lexsort((candidates, -total[candidates], -score[candidates]))
+    return candidates[order[:k]]
+
+
+class ProductRanking:
+    """Top products per overall_category and sentiment type, computed from a SentimentCube
+
+    Per-ASIN sentiment counts come from one groupby over the cube, scores and
+    ratios are computed for every product as arrays and only the k winners are
+    materialized. Rankings are memoized per (category, sentiment type).
+    """
+
+    def __init__(self, cube, k=5):
+        self.cube = cube
+        self.k = k
+        self.tables = {}
+
+    def product_counts(self, overall_category=None):
+        """Per-ASIN sentiment counts of titled products with enough reviews"""
+        cube = self.cube if overall_category is None else self.cube.select(overall_category=overall_category)
+        table = cube.sentiment_table('asin')
+        valid = table.index.isin(cube.titles.index) & (table['total'].to_numpy() >= MIN_PRODUCT_REVIEWS)
+        return table[valid]
+
+    def rank(self, overall_category=None, sentiment_type='positive'):
+        """Top k products as a DataFrame, or an empty one if no product qualifies"""
+        table = self.product_counts(overall_category)
+        positive = table['positive'].to_numpy()
+        neutral = table['neutral'].to_numpy()
+        negative = table['negative'].to_numpy()
+        if sentiment_type == 'positive':
+            count, rest = positive, neutral + negative
+        else:
+            count, rest = negative, neutral + positive
+        score = count * (count / np.where(rest > 0, rest, 1))
+
+        winners = top_k_positions(score, table['total'].to_numpy(), self.k)
+        asins = table.index[winners]
+        return pd.DataFrame({
+            'asin': asins,
+            'original_title': self.cube.titles.reindex(asins).to_numpy(),
+            'positive_count': positive[winners],
+            'neutral_count': neutral[winners],
+            'negative_count': negative[winners],
+            'positive_pct': table['positive_pct'].to_numpy()[winners],
+            'neutral_pct': table['neutral_pct'].to_numpy()[winners],
+            'negative_pct': table['negative_pct'].to_numpy()[winners],
+            'ratio': [f"{c}:{r}" for c, r in zip(count[winners], rest[winners])],
+            'sentiment_score': score[winners]
+        })
+
+    def top(self, overall_category=None, sentiment_type='positive'):
+        """Memoized rank()"""
+        key = (overall_category, sentiment_type)
+        table = self.tables.get(key)
+        if table is None:
+            table = self.tables[key] = self.rank(overall_category, sentiment_type)
+        return table
+
+    def clear(self):
+        """Forget the memoized rankings"""
+        self.tables = {}
+
+    def updated(self, cube, categories):
+        """Ranking over cube that reuses the tables of every category not in categories
+
+        Used when reviews of only some categories were added to the cube.
+        Rankings of the changed categories and of all categories are recomputed.
+        """
+        ranking = ProductRanking(cube, self.k)
+        ranking.tables = {
+            key: table for key, table in self.tables.items()
+            if key[0] is not None and key[0] not in categories
+        }
+        ranking.precompute([None] + [c for c in categories if isinstance(c, str)])
+        return ranking
+
+    def precompute(self, categories):
+        """Rank every category (None for all of them) for both sentiment types"""
+        for category in categories:
+            for sentiment_type in SENTIMENT_TYPES:
+                self.top(category, sentiment_type)
@@ -0,0 +1,54 @@
+"""Relabel scored reviews under new ensemble thresholds without rescoring them
+
+Reads the raw vader_score, textblob_score and textblob_subjectivity columns
+written by batch_scoring.py and recomputes sentiment and neutral_confidence
+with classify_scores(). Every threshold of the ensemble can be overridden;
+the ones left out keep the notebook's values:
+
+    python relabel_sentiment.py reviews_scored.csv reviews_relabelled.csv --neutral-confidence 0.8 --polarity 0.2
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from sentiment_scoring import THRESHOLDS, Thresholds, classify_scores
+
+RAW_SCORE_COLUMNS = ['vader_score', 'textblob_score', 'textblob_subjectivity']
+
+
+def relabel(df, thresholds=THRESHOLDS):
+    """Replace the sentiment and neutral_confidence of df from its raw scores; returns the changed labels"""
+    missing = [column for column in RAW_SCORE_COLUMNS if column not in df]
+    if missing:
+        raise ValueError(f"Relabelling needs the raw scores {missing}; score the reviews with batch_scoring.py")
+    sentiment, neutral_confidence = classify_scores(*(df[column].to_numpy() for column in RAW_SCORE_COLUMNS),
+                                                    thresholds)
+    changes = int((df['sentiment'].to_numpy() != sentiment).sum()) if 'sentiment' in df else len(df)
+    df['neutral_confidence'] = neutral_confidence
+    df['sentiment'] = sentiment
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Relabel scored reviews under new ensemble thresholds')
+    parser.add_argument('input', help='CSV with the raw scores written by batch_scoring.py')
+    parser.add_argument('output', help='CSV to write the relabelled reviews to')
+    for field in Thresholds._fields:
+        parser.add_argument(f"--{field.replace('_', '-')}", type=float, default=getattr(THRESHOLDS, field),
+                            help=f'default: {getattr(THRESHOLDS, field)}')
+    args = parser.parse_args()
+
+    thresholds = Thresholds(*(getattr(args, field) for field in Thresholds._fields))
+    df = pd.read_csv(args.input)
+    start = time.perf_counter()
+    changes = relabel(df, thresholds)
+    seconds = time.perf_counter() - start
+    print(f"Relabelled {len(df)} reviews in {seconds * 1e3:.1f} ms; changes in sentiment classifications: "
+          f"{changes} ({changes / max(len(df), 1):.1%})")
+    print(df['sentiment'].value_counts().to_string())
+    df.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
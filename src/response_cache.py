@@ -0,0 +1,169 @@
+"""Bounded LRU cache of encoded dashboard responses and their compressed variants"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# encoded maps a content coding ('br', 'gzip') to the compressed body
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'encoded'])
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def make_etag(body):
+    """Strong ETag value for a response body"""
+    return hashlib.sha1(body).hexdigest()
+
+
+def compress_variants(body, fast=False):
+    """Compressed variants of body, keyed by content coding
+
+    Entries are compressed once per dataset version, so the highest levels are
+    affordable; fast picks cheap levels for bodies served only once. Variants
+    that are not smaller than the body are dropped.
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return {}
+    encoded = {'gzip': gzip.compress(body, compresslevel=1 if fast else 9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, quality=1 if fast else 11)
+    return {coding: data for coding, data in encoded.items() if len(data) < len(body)}
+
+
+def make_entry(body, fast=False):
+    """CachedResponse of body, with its ETag and compressed variants"""
+    return CachedResponse(body, make_etag(body), compress_variants(body, fast))
+
+
+def entry_size(entry):
+    return len(entry.body) + sum(len(data) for data in entry.encoded.values())
+
+
+def negotiate(entry, accept_encodings):
+    """Pick (content coding or None, body) for a request's Accept-Encoding
+
+    Prefers brotli over gzip when the client accepts both.
+    """
+    for coding in ['br', 'gzip']:
+        if coding in entry.encoded and accept_encodings[coding]:
+            return coding, entry.encoded[coding]
+    return None, entry.body
+
+
+class ResponseCache:
+    """Response bodies keyed by (dataset version, route, arguments)
+
+    Every entry keeps its compressed variants next to the plain body. Entries
+    are evicted least recently used first once their total size, variants
+    included, goes over max_bytes. Entries bigger than max_bytes are never stored.
+
+    get_or_build() builds each missing entry once: concurrent misses on a key
+    wait for the build already in progress instead of starting their own.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        # Future of (entry, complete) of every key being built
+        self.building = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Cached response for key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        """Compress body, store it under key and return its CachedResponse"""
+        entry = make_entry(body)
+        size = entry_size(entry)
+        if size > self.max_bytes:
+            return entry
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= entry_size(old)
+            self.entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= entry_size(evicted)
+                self.evictions += 1
+        return entry
+
+    def get_or_build(self, key, build):
+        """(CachedResponse, complete) of key, built by one caller on a miss
+
+        build returns (body, complete). Complete bodies are stored; incomplete
+        ones (such as pages with placeholder figures) are compressed cheaply
+        and only handed to the requests that waited for this build.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry, True
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                # Stored by a build that finished since the lookup
+                return entry, True
+            future = self.building.get(key)
+            waiting = future is not None
+            if waiting:
+                self.coalesced += 1
+            else:
+                future = self.building[key] = Future()
+        if waiting:
+            return future.result()
+
+        try:
+            body, complete = build()
+            entry = self.put(key, body) if complete else make_entry(body, fast=True)
+            future.set_result((entry, complete))
+            return entry, complete
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.building[key]
+
+    def retain_version(self, version):
+        """Drop the entries cached for any other dataset version"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] != version]:
+                self.size -= entry_size(self.entries.pop(key))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced
+            }
@@ -0,0 +1,180 @@
+"""Incremental ingestion of new reviews into a running dashboard
+
+Accepts JSON lines that are either raw reviews in the reviews_Electronics_5
+schema (reviewerID, asin, reviewText, overall, unixReviewTime, ...) or rows
+already scored like the processed dataset (asin, overall, sentiment,
+review_date, and optionally overall_category, main_category, brand, title).
+Raw reviews are preprocessed and scored with the notebooks' ensemble. Product
+columns a row does not carry are taken from the reviews already loaded for
+the same ASIN.
+
+Post a file to the dashboard with:
+
+    python review_ingest.py new_reviews.jsonl --url http://127.0.0.1:5000
+"""
+import argparse
+import gzip
+import json
+import time
+import urllib.request
+
+import pandas as pd
+
+from review_store import SOURCE_COLUMNS, ReviewStore
+from sentiment_cube import RATINGS, SENTIMENTS
+from sentiment_scoring import SentimentScorer, preprocess
+
+PRODUCT_COLUMNS = ['overall_category', 'main_category', 'brand', 'title']
+
+# Product columns of ASINs the dashboard has never seen
+UNKNOWN_PRODUCT = {
+    'overall_category': 'Uncategorized',
+    'main_category': 'Uncategorized',
+    'brand': 'Unknown Brand',
+    'title': 'Untitled'
+}
+
+_scorer = None
+
+
+def scorer():
+    """SentimentScorer shared by every ingestion, created on first use"""
+    global _scorer
+    if _scorer is None:
+        _scorer = SentimentScorer()
+    return _scorer
+
+
+def parse_jsonl(lines):
+    """Records of non-blank JSON lines"""
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def product_table(data):
+    """overall_category, main_category, brand and title of every loaded ASIN"""
+    counts = data.cube.counts
+    products = counts.drop_duplicates('asin').set_index('asin')[['overall_category', 'main_category', 'brand']]
+    products.index = products.index.astype(object)
+    products = products.astype(object)
+    products['title'] = data.store.titles.reindex(products.index).to_numpy()
+    return products
+
+
+def score_raw_reviews(df):
+    """sentiment of rows that only carry a reviewText"""
+    unscored = df['sentiment'].isna()
+    if unscored.any():
+        if 'reviewText' not in df:
+            raise ValueError("Rows without a sentiment need a reviewText to be scored")
+        texts = df.loc[unscored, 'reviewText'].map(preprocess)
+        df.loc[unscored, 'sentiment'] = [scorer().score(text)['sentiment'] for text in texts]
+    return df
+
+
+def parse_dates(df, column, **kwargs):
+    """Dates of a column; missing values become NaT, values that do not parse are rejected"""
+    values = df[column]
+    dates = pd.to_datetime(values, errors='coerce', **kwargs)
+    given = values.notna() & (values.astype(str).str.strip() != '')
+    invalid = given & dates.isna()
+    if invalid.any():
+        rows = [int(i) for i in df.index[invalid][:10]]
+        raise ValueError(f"{int(invalid.sum())} reviews have a {column} that is not a date (rows {rows})")
+    return dates
+
+
+def records_to_frame(records, products):
+    """Review rows in SOURCE_COLUMNS form, scoring and completing them as needed"""
+    df = pd.DataFrame.from_records(records)
+    if df.empty:
+        return pd.DataFrame(columns=SOURCE_COLUMNS)
+    for column in ['asin', 'overall']:
+        if column not in df:
+            raise ValueError(f"Every review needs {column!r}")
+    if 'sentiment' not in df:
+        df['sentiment'] = None
+    df = score_raw_reviews(df)
+
+    if 'review_date' in df:
+        dates = parse_dates(df, 'review_date', format='mixed')
+    else:
+        dates = pd.Series(pd.NaT, index=df.index)
+    if 'unixReviewTime' in df:
+        dates = dates.fillna(parse_dates(df, 'unixReviewTime', unit='s'))
+    df['review_date'] = dates
+
+    known = products.reindex(df['asin'].astype(object))
+    for column in PRODUCT_COLUMNS:
+        if column not in df:
+            df[column] = None
+        fallback = known[column].fillna(UNKNOWN_PRODUCT[column]).to_numpy()
+        df[column] = df[column].where(df[column].notna(), fallback)
+
+    invalid = ~df['sentiment'].isin(SENTIMENTS) | df['asin'].isna() | ~df['overall'].isin(RATINGS)
+    if invalid.any():
+        rows = [int(i) for i in df.index[invalid][:10]]
+        raise ValueError(f"{int(invalid.sum())} reviews have no asin, a rating outside 1-5 "
+                         f"or an unknown sentiment (rows {rows})")
+    return df[SOURCE_COLUMNS]
+
+
+def ingest_records(loader, records):
+    """Add records to the dashboard data held by loader and return the new DashboardData"""
+    def add(data):
+        if data.store is None:
+            raise ValueError("Reviews cannot be ingested while the dataset is aggregated out of core")
+        df = records_to_frame(records, product_table(data))
+        store = ReviewStore.from_frame(df)
+        return data.append(store)
+    return loader.update(add)
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        yield from f
+
+
+def batches(lines, size):
+    batch = []
+    for line in lines:
+        if line.strip():
+            batch.append(line)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def post_batch(url, lines):
+    request = urllib.request.Request(
+        f'{url.rstrip("/")}/ingest',
+        data=''.join(lines).encode(),
+        headers={'Content-Type': 'application/x-ndjson'},
+        method='POST'
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add new reviews to a running sentiment dashboard')
+    parser.add_argument('path', help='JSON lines file of raw or scored reviews (.gz allowed)')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='dashboard base URL')
+    parser.add_argument('--batch-size', type=int, default=50000, help='reviews per request')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total = 0
+    for batch in batches(read_lines(args.path), args.batch_size):
+        result = post_batch(args.url, batch)
+        total += result['accepted']
+        print(f"Added {result['accepted']} reviews, dashboard now at version {result['version']} "
+              f"with {result['reviews']} reviews")
+    seconds = time.perf_counter() - start
+    print(f"Ingested {total} reviews in {seconds:.1f}s ({total / max(seconds, 1e-9):.0f} reviews/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Compact in-memory review store for the dashboard process"""
+import numpy as np
+import pandas as pd
+
+# Dictionary encoded columns the chart builders group and filter on
+DIMENSIONS = ['overall_category', 'main_category', 'brand', 'asin', 'sentiment']
+
+# CSV columns needed to build the store
+SOURCE_COLUMNS = DIMENSIONS + ['title', 'overall', 'review_date']
+
+# review_day value for reviews without a date
+MISSING_DAY = np.iinfo(np.int32).min
+
+
+def to_days(dates):
+    """Dates as int32 days since 1970-01-01, MISSING_DAY where unknown"""
+    values = pd.to_datetime(dates).to_numpy().astype('datetime64[D]')
+    days = values.view('int64')
+    days = np.where(np.isnat(values), MISSING_DAY, days)
+    return days.astype(np.int32)
+
+
+def from_days(days):
+    """Inverse of to_days"""
+    days = np.asarray(days)
+    dates = days.astype('int64').astype('datetime64[D]')
+    return np.where(days == MISSING_DAY, np.datetime64('NaT'), dates)
+
+
+def sorted_categories(categories):
+    """Categories in the order the review store keeps them (as strings, so mixed types sort too)"""
+    return sorted(categories, key=str)
+
+
+def sorted_categorical(values):
+    """values as a categorical whose categories are sorted
+
+    read_csv orders the categories it infers by the blocks it parsed them in,
+    so sorting them makes the codes depend only on the values, however (and in
+    however many chunks) the reviews were read.
+    """
+    column = values.astype('category')
+    return column.cat.reorder_categories(sorted_categories(column.cat.categories))
+
+
+def code_dtype(dtype):
+    """Integer type pandas keeps the codes of a categorical of dtype in"""
+    return pd.Categorical.from_codes(np.empty(0, np.int8), dtype=dtype, validate=False).codes.dtype
+
+
+class ColumnBuffers:
+    """Column arrays with room at the end, shared by successive appended stores
+
+    A store's frame views the first rows of the buffers (categorical codes for
+    the DIMENSIONS, values otherwise). Only the store viewing all the rows
+    written so far may write after them, so the stores it was appended to
+    keep seeing exactly their own rows.
+    """
+
+    # Capacity allocated on a copy, as a multiple of the rows copied
+    GROWTH = 1.5
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    @property
+    def capacity(self):
+        return len(next(iter(self.columns.values())))
+
+    @classmethod
+    def copy_of(cls, arrays, rows):
+        """Buffers holding arrays (all of one length) with room for rows in total"""
+        length = len(next(iter(arrays.values())))
+        capacity = max(int(rows * cls.GROWTH), rows)
+        columns = {}
+        for name, values in arrays.items():
+            columns[name] = np.empty(capacity, dtype=values.dtype)
+            columns[name][:length] = values
+        return cls(columns, length)
+
+
+class ReviewStore:
+    """Only the review columns the dashboard charts use, in their narrowest types
+
+    sentiment, overall_category, main_category, brand and asin are categoricals,
+    overall is int8 and review_day holds int32 days since the epoch. Titles are
+    kept once per product instead of once per review.
+    """
+
+    def __init__(self, frame, titles, version=None, buffers=None):
+        self.frame = frame
+        # Product title per ASIN, indexed like the asin categories
+        self.titles = titles
+        # Identifies the source data, used to key derived caches
+        self.version = version
+        # ColumnBuffers the frame views, when it was built by append()
+        self.buffers = buffers
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the store from a review DataFrame with the SOURCE_COLUMNS"""
+        frame = pd.DataFrame({name: sorted_categorical(df[name]) for name in DIMENSIONS})
+        frame['overall'] = df['overall'].astype(np.int8).to_numpy()
+        frame['review_day'] = to_days(df['review_date'])
+
+        titles = df.groupby(frame['asin'], sort=False, observed=True)['title'].first()
+        titles = titles.reindex(frame['asin'].cat.categories)
+        return cls(frame, titles)
+
+    def append(self, other, version=None):
+        """New store with the reviews of other after these ones
+
+        Categories new in other are added after the existing ones, so the codes
+        of the reviews already stored do not change. Titles of other fill in
+        products that had none.
+
+        The columns are written into ColumnBuffers with spare capacity, so a
+        store appended to again copies none of its rows unless the buffers are
+        full or a column's codes need a wider type; the copies are amortized
+        over the appends like a growing list.
+        """
+        rows = len(self) + len(other)
+        dtypes = {}
+        added = {}
+        for name in self.frame.columns:
+            if name in DIMENSIONS:
+                categories = self.frame[name].cat.categories
+                other_categories = other.frame[name].cat.categories
+                new = other_categories[~other_categories.isin(categories)]
+                dtypes[name] = pd.CategoricalDtype(categories.append(new))
+                recode = dtypes[name].categories.get_indexer(other_categories)
+                codes = other.frame[name].cat.codes.to_numpy()
+                added[name] = np.where(codes < 0, -1, recode[codes]).astype(code_dtype(dtypes[name]))
+            else:
+                added[name] = other.frame[name].to_numpy()
+
+        buffers = self.buffers
+        if (buffers is None or buffers.length != len(self) or buffers.capacity < rows or
+                any(buffers.columns[name].dtype != values.dtype for name, values in added.items())):
+            current = {name: (self.frame[name].cat.codes.to_numpy() if name in DIMENSIONS
+                              else self.frame[name].to_numpy()).astype(added[name].dtype, copy=False)
+                       for name in self.frame.columns}
+            buffers = ColumnBuffers.copy_of(current, rows)
+        for name, values in added.items():
+            buffers.columns[name][len(self):rows] = values
+        buffers.length = rows
+
+        data = {}
+        for name in self.frame.columns:
+            column = buffers.columns[name][:rows]
+            data[name] = (pd.Categorical.from_codes(column, dtype=dtypes[name], validate=False)
+                          if name in DIMENSIONS else column)
+        frame = pd.DataFrame(data, copy=False)
+
+        categories = frame['asin'].cat.categories
+        titles = self.titles.reindex(categories)
+        titles = titles.where(titles.notna(), other.titles.reindex(categories))
+        return ReviewStore(frame, titles, version, buffers)
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def review_dates(self):
+        """review_day as datetime64 values"""
+        return from_days(self.frame['review_day'].to_numpy())
+
+    def memory_usage(self):
+        """Bytes held per column, with the per-product titles as 'title'"""
+        usage = self.frame.memory_usage(index=False, deep=True)
+        usage['title'] = self.titles.memory_usage(deep=True)
+        return usage
+
+    def bytes_per_review(self):
+        """Average memory footprint of one review"""
+        return self.memory_usage().sum() / max(len(self), 1)
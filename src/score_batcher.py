@@ -0,0 +1,147 @@
+"""Micro-batched online sentiment scoring for the dashboard's POST /score
+
+Requests hand their processed texts to one scoring thread per process,
+which owns a long-lived SentimentScorer and the score cache. The thread takes
+the oldest waiting request and keeps collecting the requests arriving within
+max_wait seconds, up to max_batch texts, then resolves the whole batch at
+once: the texts are deduplicated, cached raw scores are read in one bulk
+lookup and only the remaining texts go through VADER and TextBlob. A request
+alone waits at most max_wait; under load, concurrent requests share batches.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from score_cache import ScoreCache, ScoreLookup
+from sentiment_scoring import SentimentScorer
+
+logger = logging.getLogger(__name__)
+
+
+class PendingScores:
+    """Texts of one request and, once its batch is scored, their raw scores"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.scores = None
+        self.error = None
+
+
+class ScoreBatcher:
+    """Scores processed texts in batches coalesced across concurrent requests
+
+    cache_path names the SQLite score cache; None or a file that cannot be
+    opened scores without one. The thread, scorer and cache are created on
+    first use, so forked server workers each get their own. observers are
+    called with (requests, texts, analyzed texts, seconds) after every batch.
+    """
+
+    def __init__(self, max_batch=32, max_wait=0.005, cache_path=None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_path = cache_path
+        self.observers = []
+        self.queue = None
+        self.pid = None
+        self.scorer = None
+        self.cache = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+        self.analyzed = 0
+
+    def _queue(self):
+        with self.lock:
+            if self.queue is None or self.pid != os.getpid():
+                self.queue = queue.Queue()
+                self.pid = os.getpid()
+                self.scorer = None
+                self.cache = None
+                threading.Thread(target=self._run, args=(self.queue,), name='score-batcher', daemon=True).start()
+            return self.queue
+
+    def score(self, texts, timeout=None):
+        """(len(texts), 3) array of the raw (vader, polarity, subjectivity) scores of processed texts
+
+        Raises TimeoutError when the batch is not scored within timeout seconds.
+        """
+        pending = PendingScores(list(texts))
+        if not pending.texts:
+            return np.empty((0, 3))
+        self._queue().put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"Scoring did not finish within {timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.scores
+
+    def _run(self, requests):
+        while True:
+            batch = [requests.get()]
+            size = len(batch[0].texts)
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                size += len(batch[-1].texts)
+            self._score_batch(batch)
+
+    def _open(self):
+        """Scorer and cache of this process, created by the scoring thread"""
+        if self.scorer is None:
+            self.scorer = SentimentScorer()
+            if self.cache_path:
+                try:
+                    self.cache = ScoreCache(self.cache_path)
+                except sqlite3.Error as e:
+                    logger.warning("Scoring without the score cache %s: %s", self.cache_path, e)
+        return self.scorer, self.cache
+
+    def _score_batch(self, batch):
+        start = time.perf_counter()
+        texts = [text for pending in batch for text in pending.texts]
+        analyzed = 0
+        try:
+            scorer, cache = self._open()
+            lookup = ScoreLookup(texts, cache)
+            missing = lookup.missing
+            analyzed = len(missing)
+            scores = np.array([scorer.raw_scores(text) for text in missing], dtype=np.float64).reshape(-1, 3)
+            rows = np.column_stack(lookup.complete(scores))
+            offset = 0
+            for pending in batch:
+                pending.scores = rows[offset:offset + len(pending.texts)]
+                offset += len(pending.texts)
+        except Exception as e:
+            logger.exception("Scoring a batch of %d texts failed", len(texts))
+            for pending in batch:
+                pending.error = e
+        finally:
+            for pending in batch:
+                pending.done.set()
+        seconds = time.perf_counter() - start
+        with self.lock:
+            self.batches += 1
+            self.texts += len(texts)
+            self.analyzed += analyzed
+        for observer in self.observers:
+            observer(len(batch), len(texts), analyzed, seconds)
+
+    def stats(self):
+        """Batches and texts scored by this process, and the score cache's hits and misses"""
+        with self.lock:
+            stats = {'batches': self.batches, 'texts': self.texts, 'analyzed': self.analyzed}
+        if self.cache is not None and self.pid == os.getpid():
+            stats['cache'] = {'hits': self.cache.hits, 'misses': self.cache.misses}
+        return stats
@@ -0,0 +1,158 @@
+"""Persistent cache of the raw VADER and TextBlob scores of review texts
+
+Scores are stored in a SQLite file, keyed by a hash of the normalized text
+(whitespace collapsed, as both analyzers tokenize on it) salted with the
+vaderSentiment and textblob versions, so upgrading an analyzer never serves
+its predecessor's scores. Only the raw scores are stored (VADER compound,
+TextBlob polarity and subjectivity); the ensemble's label is derived from
+them, so changing its thresholds keeps the cache valid.
+
+A ScoreLookup resolves a batch of texts at once: identical texts are looked
+up and scored once, the known ones are read in bulk and only the remaining
+unique texts are left to score:
+
+    lookup = cache.lookup(texts)
+    vader, polarity, subjectivity = lookup.complete([scorer.raw_scores(text) for text in lookup.missing])
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+
+SCORE_CACHE_VERSION = 1
+
+DEFAULT_CACHE_PATH = '../data/processed/sentiment_scores.sqlite'
+
+# Keys per SELECT, below SQLite's default limit of bound parameters
+LOOKUP_BATCH = 500
+
+
+def analyzer_versions():
+    """Versions of the analyzers the cached scores come from"""
+    versions = {'cache': SCORE_CACHE_VERSION}
+    for package in ['vaderSentiment', 'textblob']:
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def normalize(text):
+    """Text as it is scored and keyed: str() of it, whitespace collapsed"""
+    return ' '.join(str(text).split())
+
+
+class ScoreCache:
+    """SQLite table of raw scores keyed by text hash, shared by threads and processes"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, versions=None):
+        self.path = path
+        self.salt = json.dumps(versions or analyzer_versions(), sort_keys=True).encode() + b'\0'
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS scores ('
+                'key BLOB PRIMARY KEY, vader REAL, polarity REAL, subjectivity REAL'
+                ') WITHOUT ROWID'
+            )
+
+    def key(self, text):
+        """Hash of a normalized text and the analyzer versions"""
+        return hashlib.blake2b(self.salt + text.encode('utf-8'), digest_size=16).digest()
+
+    def get_many(self, keys):
+        """{key: (vader, polarity, subjectivity)} of the keys that are cached"""
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                rows = self.connection.execute(
+                    f"SELECT key, vader, polarity, subjectivity FROM scores "
+                    f"WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                found.update((row[0], row[1:]) for row in rows)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, (vader, polarity, subjectivity)) items"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO scores (key, vader, polarity, subjectivity) VALUES (?, ?, ?, ?)',
+                [(key, *map(float, scores)) for key, scores in items]
+            )
+
+    def lookup(self, texts):
+        return ScoreLookup(texts, self)
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def stats(self):
+        """Hits and misses of the distinct texts looked up so far, and the number of cached texts"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'entries': len(self)
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class ScoreLookup:
+    """Raw scores of a batch of texts: the cached ones and the distinct texts still to score
+
+    Without a cache, every distinct text is left to score, still only once.
+    """
+
+    def __init__(self, texts, cache=None):
+        self.cache = cache
+        positions = {}
+        self.codes = np.array([positions.setdefault(normalize(text), len(positions)) for text in texts],
+                              dtype=np.int64)
+        self.texts = list(positions)
+        self.scores = np.full((len(self.texts), 3), np.nan)
+        if cache is None:
+            self.keys = None
+            self.missing_positions = list(range(len(self.texts)))
+        else:
+            self.keys = [cache.key(text) for text in self.texts]
+            known = cache.get_many(self.keys)
+            self.missing_positions = []
+            for position, key in enumerate(self.keys):
+                if key in known:
+                    self.scores[position] = known[key]
+                else:
+                    self.missing_positions.append(position)
+
+    @property
+    def missing(self):
+        """Distinct normalized texts that have no cached scores"""
+        return [self.texts[position] for position in self.missing_positions]
+
+    def complete(self, scores):
+        """(vader, polarity, subjectivity) arrays of every text, given the scores of missing in order
+
+        The new scores are added to the cache.
+        """
+        if len(scores):
+            self.scores[self.missing_positions] = scores
+            if self.cache is not None:
+                self.cache.put_many(zip([self.keys[position] for position in self.missing_positions], scores))
+        rows = self.scores[self.codes]
+        return rows[:, 0], rows[:, 1], rows[:, 2]
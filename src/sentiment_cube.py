@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from posting_index import PostingIndex, take_rows
+
+CUBE_KEYS = ['overall_category', 'main_category', 'brand', 'asin', 'overall', 'sentiment']
+INDEXED_KEYS = ['overall_category', 'main_category', 'brand']
+SENTIMENTS = ['positive', 'neutral', 'negative']
+RATINGS = [1, 2, 3, 4, 5]
+
+
+def has_valid_title(titles):
+    """Mask of titles usable as product labels (not missing, empty or 'untitled')"""
+    return (
+        titles.notna() &
+        (titles != '') &
+        (~titles.str.lower().str.contains('untitled', na=False))
+    )
+
+
+def plain_index(frame):
+    """Replace a categorical group index by its plain labels"""
+    if isinstance(frame.index, pd.CategoricalIndex):
+        frame.index = pd.Index(frame.index.to_numpy(), name=frame.index.name)
+    return frame
+
+
+def count_keys(frame):
+    """Review count of every observed CUBE_KEYS combination of frame, in order of first appearance"""
+    return (
+        frame.groupby(CUBE_KEYS, sort=False, dropna=False, observed=True)
+        .size()
+        .reset_index(name='count')
+    )
+
+
+class SentimentCube:
+    """Review counts keyed by (overall_category, main_category, brand, asin, overall, sentiment)
+
+    The cube is built once from the review store. Chart builders slice and
+    regroup it, so their cost depends on the number of groups rather than the
+    number of reviews. Rows are grouped by overall_category and indexed by
+    category, main_category and brand, so a selection takes a positional view
+    of the rows it needs instead of masking the whole cube.
+    """
+
+    def __init__(self, counts, titles, index=None):
+        # One row per observed key combination, plus its review count
+        self.counts = counts
+        # Title for every ASIN with a usable title
+        self.titles = titles
+        # PostingIndex over the rows of counts (only kept on the full cube)
+        self.index = index
+
+    @classmethod
+    def from_store(cls, store, workers=1):
+        """Build the cube from a ReviewStore, counting on workers processes when more than one"""
+        if workers > 1:
+            from partitioned_aggregation import partitioned_count_keys
+            return cls.from_counts(partitioned_count_keys(store.frame, workers), store.titles)
+        return cls.from_counts(count_keys(store.frame), store.titles)
+
+    @classmethod
+    def from_counts(cls, counts, titles):
+        """Build the cube from key counts and the title of every product"""
+        # Make every overall_category a contiguous block of rows
+        counts = counts.sort_values('overall_category', kind='stable', ignore_index=True)
+        titles = titles[has_valid_title(titles)]
+        return cls(counts, titles, PostingIndex(counts, INDEXED_KEYS))
+
+    def add(self, frame, titles):
+        """New cube with the reviews of frame counted in
+
+        Only frame is grouped; its counts are added to the existing ones, so the
+        cost depends on the number of cube rows and new reviews, not on the
+        reviews already counted. frame's categoricals must extend the cube's
+        categories, as the tail of ReviewStore.append() does. The result is the
+        cube from_store() would build from all the reviews.
+        """
+        delta = count_keys(frame)
+        counts = self.counts.astype({
+            key: delta[key].dtype for key in CUBE_KEYS if isinstance(delta[key].dtype, pd.CategoricalDtype)
+        })
+        counts = (
+            pd.concat([counts, delta], ignore_index=True)
+            .groupby(CUBE_KEYS, sort=False, dropna=False, observed=True)['count'].sum()
+            .reset_index()
+        )
+        return SentimentCube.from_counts(counts, titles)
+
+    def positions(self, overall_category=None, main_category=None, brand=None):
+        """Sorted positions of the cube rows matching every given key"""
+        positions = None
+        for key, value in [('overall_category', overall_category),
+                           ('main_category', main_category),
+                           ('brand', brand)]:
+            if value is None:
+                continue
+            if self.index is not None:
+                matches = self.index.positions(key, value)
+            else:
+                matches = np.flatnonzero((self.counts[key] == value).to_numpy())
+            positions = matches if positions is None else np.intersect1d(positions, matches, assume_unique=True)
+        return positions
+
+    def select(self, overall_category=None, main_category=None, brand=None):
+        """Sub-cube for one overall_category, main_category and/or brand"""
+        positions = self.positions(overall_category, main_category, brand)
+        if positions is None:
+            return self
+        return SentimentCube(take_rows(self.counts, positions), self.titles)
+
+    def total(self):
+        """Number of reviews in the cube"""
+        return int(self.counts['count'].sum())
+
+    def values(self, key):
+        """Distinct values of a key, in order of first appearance"""
+        return self.counts[key].unique()
+
+    def sentiment_counts(self):
+        """Review count per sentiment, largest first"""
+        counts = self.counts.groupby('sentiment', sort=False, observed=True)['count'].sum()
+        return plain_index(counts.sort_values(ascending=False, kind='stable'))
+
+    def sentiment_table(self, by):
+        """Per-group sentiment counts with 'total' and '<sentiment>_pct' columns
+
+        Groups keep their order of first appearance. 'total' counts every review
+        in the group, including ones without a sentiment label.
+        """
+        grouped = self.counts.groupby([by, 'sentiment'], sort=False, observed=True)['count'].sum()
+        table = grouped.unstack('sentiment', fill_value=0)
+        totals = self.counts.groupby(by, sort=False, observed=True)['count'].sum()
+        table = table.reindex(index=totals.index, columns=SENTIMENTS, fill_value=0)
+        table.columns.name = None
+        table['total'] = totals
+        for sentiment in SENTIMENTS:
+            table[f'{sentiment}_pct'] = (table[sentiment] / table['total']) * 100
+        return plain_index(table)
+
+    def rating_sentiment_counts(self):
+        """Crosstab of review counts with ratings as rows and sentiments as columns
+
+        Every rating from 1 to 5 has a row, with zero counts when no review gives it.
+        """
+        grouped = self.counts.groupby(['overall', 'sentiment'], observed=True)['count'].sum()
+        table = grouped.unstack('sentiment', fill_value=0)
+        table.columns = table.columns.to_numpy()
+        return table.reindex(table.index.union(RATINGS), fill_value=0)
@@ -0,0 +1,202 @@
+"""Review text preprocessing and the VADER + TextBlob sentiment ensemble of the notebooks
+
+clean_text/remove_stopwords follow ReviewPreprocessor in
+02_preprocessing_reviews_data_part1 and classify() follows
+update_all_sentiment_analysis in 03_sentiment_analysis_indepth_part2, so new
+reviews are labelled the same way as the processed dataset. classify_scores()
+applies the same rules to arrays of stored raw scores at once, so relabelling
+under new thresholds needs no rescoring.
+"""
+import re
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+except ImportError:
+    SentimentIntensityAnalyzer = None
+
+try:
+    from textblob import TextBlob
+except ImportError:
+    TextBlob = None
+
+STOP_WORDS = {
+    'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you',
+    "you're", "you've", "you'll", "you'd", 'your', 'yours', 'yourself',
+    'yourselves', 'he', 'him', 'his', 'himself', 'she', "she's", 'her',
+    'hers', 'herself', 'it', "it's", 'its', 'itself', 'they', 'them',
+    'their', 'theirs', 'themselves', 'what', 'which', 'who', 'whom',
+    'this', 'that', "that'll", 'these', 'those', 'am', 'is', 'are',
+    'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having',
+    'do', 'does', 'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if',
+    'or', 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for',
+    'with', 'about', 'against', 'between', 'into', 'through', 'during',
+    'before', 'after', 'above', 'below', 'to', 'from', 'up', 'down',
+    'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further',
+    'then', 'once'
+}
+
+# Thresholds of the ensemble; the defaults are the notebook's
+Thresholds = namedtuple('Thresholds', [
+    'vader_confidence_floor',  # least confidence given to VADER
+    'neutral_score',           # |score| below which an analyzer counts as neutral
+    'neutral_combined',        # |combined score| below which it counts as neutral
+    'neutral_subjectivity',    # subjectivity below which it counts as neutral
+    'neutral_confidence',      # share of neutral indicators that makes a review neutral
+    'polarity',                # |combined score| above which a review is positive or negative
+    'objective_subjectivity'   # subjectivity below which a borderline review is neutral
+])
+THRESHOLDS = Thresholds(0.3, 0.05, 0.1, 0.5, 0.6, 0.15, 0.4)
+
+SENTIMENT_LABELS = np.array(['positive', 'neutral', 'negative'])
+NEUTRAL_INDICATORS = 5
+
+HTML_TAG = re.compile(r'<[^>]+>')
+URL = re.compile(r'http\S+|www.\S+')
+NON_LETTER = re.compile(r'[^a-zA-Z\s]')
+
+
+def clean_text(text):
+    """Lowercase text without HTML tags, URLs, digits and punctuation"""
+    if not isinstance(text, str):
+        return ""
+    text = text.lower()
+    text = HTML_TAG.sub('', text)
+    text = URL.sub('', text)
+    text = NON_LETTER.sub('', text)
+    return ' '.join(text.split())
+
+
+def remove_stopwords(text):
+    return ' '.join(word for word in text.split() if word not in STOP_WORDS)
+
+
+def preprocess(text):
+    """processed_text of a raw review text"""
+    return remove_stopwords(clean_text(text))
+
+
+def classify(vader_score, textblob_score, textblob_subjectivity, thresholds=THRESHOLDS):
+    """(sentiment, neutral_confidence) of one review from its raw scores"""
+    vader_confidence = max(abs(vader_score), thresholds.vader_confidence_floor)
+    textblob_confidence = 1 - textblob_subjectivity
+
+    scores_agree = (
+        (vader_score > 0 and textblob_score > 0) or
+        (vader_score < 0 and textblob_score < 0) or
+        (abs(vader_score) < thresholds.neutral_score and abs(textblob_score) < thresholds.neutral_score)
+    )
+    combined_score = (vader_score * vader_confidence +
+                      textblob_score * textblob_confidence) / (vader_confidence + textblob_confidence)
+
+    neutral_indicators = [
+        abs(combined_score) < thresholds.neutral_combined,
+        abs(vader_score) < thresholds.neutral_score,
+        abs(textblob_score) < thresholds.neutral_score,
+        textblob_subjectivity < thresholds.neutral_subjectivity,
+        not scores_agree
+    ]
+    neutral_confidence = sum(neutral_indicators) / len(neutral_indicators)
+
+    if neutral_confidence >= thresholds.neutral_confidence:
+        sentiment = 'neutral'
+    elif combined_score > thresholds.polarity:
+        sentiment = 'positive'
+    elif combined_score < -thresholds.polarity:
+        sentiment = 'negative'
+    elif textblob_subjectivity < thresholds.objective_subjectivity:
+        # Borderline and very objective
+        sentiment = 'neutral'
+    else:
+        sentiment = 'positive' if combined_score > 0 else 'negative'
+    return sentiment, neutral_confidence
+
+
+def combined_scores(vader, polarity, subjectivity, vader_confidence_floor=THRESHOLDS.vader_confidence_floor):
+    """Confidence-weighted average of the VADER and TextBlob score arrays"""
+    vader_confidence = np.maximum(np.abs(vader), vader_confidence_floor)
+    textblob_confidence = 1 - subjectivity
+    combined = vader * vader_confidence
+    combined += polarity * textblob_confidence
+    vader_confidence += textblob_confidence
+    combined /= vader_confidence
+    return combined
+
+
+def neutral_indicator_counts(vader, polarity, subjectivity, combined, thresholds=THRESHOLDS):
+    """Number of classify()'s neutral indicators that hold for every review, as int8"""
+    vader_neutral = np.abs(vader) < thresholds.neutral_score
+    polarity_neutral = np.abs(polarity) < thresholds.neutral_score
+    scores_agree = (((vader > 0) & (polarity > 0)) | ((vader < 0) & (polarity < 0)) |
+                    (vader_neutral & polarity_neutral))
+    counts = (np.abs(combined) < thresholds.neutral_combined).astype(np.int8)
+    counts += vader_neutral
+    counts += polarity_neutral
+    counts += subjectivity < thresholds.neutral_subjectivity
+    counts += ~scores_agree
+    return counts
+
+
+def sentiment_codes(combined, subjectivity, neutral_confidence, thresholds=THRESHOLDS):
+    """Positions in SENTIMENT_LABELS of classify()'s sentiment of every review, as int8"""
+    positive, neutral, negative = np.int8(0), np.int8(1), np.int8(2)
+    # Borderline reviews: neutral when very objective, else the sign of the combined score
+    codes = np.where(subjectivity < thresholds.objective_subjectivity, neutral,
+                     np.where(combined > 0, positive, negative))
+    codes = np.where(combined > thresholds.polarity, positive,
+                     np.where(combined < -thresholds.polarity, negative, codes))
+    return np.where(neutral_confidence >= thresholds.neutral_confidence, neutral, codes)
+
+
+def classify_codes(vader, polarity, subjectivity, thresholds=THRESHOLDS):
+    """(SENTIMENT_LABELS position array, neutral confidence array) of arrays of raw scores
+
+    Thresholds may hold arrays too, e.g. of shape (configurations, 1) to
+    classify the reviews under several configurations at once.
+    """
+    vader = np.asarray(vader, dtype=np.float64)
+    polarity = np.asarray(polarity, dtype=np.float64)
+    subjectivity = np.asarray(subjectivity, dtype=np.float64)
+    combined = combined_scores(vader, polarity, subjectivity, thresholds.vader_confidence_floor)
+    neutral_confidence = (neutral_indicator_counts(vader, polarity, subjectivity, combined, thresholds)
+                          / NEUTRAL_INDICATORS)
+    return sentiment_codes(combined, subjectivity, neutral_confidence, thresholds), neutral_confidence
+
+
+def classify_scores(vader, polarity, subjectivity, thresholds=THRESHOLDS):
+    """(sentiment label array, neutral confidence array) of arrays of raw scores
+
+    Vectorized classify(): the same rules in the same floating point
+    operations, so the labels and confidences are identical to it.
+    """
+    codes, neutral_confidence = classify_codes(vader, polarity, subjectivity, thresholds)
+    return SENTIMENT_LABELS[codes], neutral_confidence
+
+
+class SentimentScorer:
+    """Scores processed review texts with VADER and TextBlob"""
+
+    def __init__(self):
+        if SentimentIntensityAnalyzer is None or TextBlob is None:
+            raise ImportError("Scoring reviews needs the vaderSentiment and textblob packages")
+        self.analyzer = SentimentIntensityAnalyzer()
+
+    def raw_scores(self, processed_text):
+        """(VADER compound, TextBlob polarity, TextBlob subjectivity) of one processed text"""
+        text = str(processed_text)
+        blob = TextBlob(text).sentiment
+        return self.analyzer.polarity_scores(text)['compound'], blob.polarity, blob.subjectivity
+
+    def score(self, processed_text):
+        """Raw scores, neutral confidence and sentiment label of one processed text"""
+        vader_score, textblob_score, textblob_subjectivity = self.raw_scores(processed_text)
+        sentiment, neutral_confidence = classify(vader_score, textblob_score, textblob_subjectivity)
+        return {
+            'vader_score': vader_score,
+            'textblob_score': textblob_score,
+            'textblob_subjectivity': textblob_subjectivity,
+            'neutral_confidence': neutral_confidence,
+            'sentiment': sentiment
+        }
@@ -0,0 +1,178 @@
+"""Time-bucketed sentiment counts with constant-time date-range sums"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from review_store import MISSING_DAY
+from sentiment_cube import SENTIMENTS
+
+# Keys a timeline is kept for; None counts every review together
+TIMELINE_KEYS = [None, 'overall_category', 'brand', 'asin']
+# Bucket units: 'D' for days, 'M' for months, both counted from 1970-01
+TIMELINE_UNITS = ['D', 'M']
+# Columns of TimeIndex.cumulative
+COUNT_COLUMNS = SENTIMENTS + ['total']
+
+
+def to_bucket(date, unit):
+    """Bucket number of an ISO date"""
+    return int(np.datetime64(date, 'D').astype(f'datetime64[{unit}]').astype(np.int64))
+
+
+def bucket_dates(buckets, unit):
+    """ISO dates of bucket numbers"""
+    return np.datetime_as_string(np.asarray(buckets, dtype='int64').astype(f'datetime64[{unit}]'), unit='D')
+
+
+class TimeIndex:
+    """Prefix sums of per-bucket sentiment counts for every value of one key
+
+    Laid out like PostingIndex: the buckets holding reviews of a value are a
+    contiguous, sorted slice of buckets delimited by offsets, and cumulative
+    holds the running sums of COUNT_COLUMNS over the whole array. The counts
+    of any bucket range are the difference of two cumulative rows found by
+    binary search, so a query costs the same however many reviews it covers.
+    """
+
+    def __init__(self, lookup, offsets, buckets, cumulative, unit):
+        self.lookup = lookup
+        self.offsets = offsets
+        self.buckets = buckets
+        self.cumulative = cumulative
+        self.unit = unit
+
+    @classmethod
+    def from_store(cls, store, key=None):
+        """Daily index of the reviews of store by key"""
+        frame = store.frame
+        days = frame['review_day'].to_numpy()
+        if key is None:
+            categories = pd.Index([None])
+            codes = np.zeros(len(frame), dtype=np.int64)
+        else:
+            categories = frame[key].cat.categories
+            codes = frame[key].cat.codes.to_numpy().astype(np.int64)
+        # Column of every review in COUNT_COLUMNS, -1 for reviews without a sentiment
+        # (their code -1 picks the trailing -1)
+        sentiment = frame['sentiment'].cat
+        columns = np.array([SENTIMENTS.index(s) if s in SENTIMENTS else -1 for s in sentiment.categories] + [-1])
+        sentiment_columns = columns[sentiment.codes.to_numpy()]
+
+        valid = (days != MISSING_DAY) & (codes >= 0)
+        days, codes, sentiment_columns = days[valid], codes[valid], sentiment_columns[valid]
+        buckets = days.astype(np.int64)
+        lowest = buckets.min() if len(buckets) else 0
+        span = (buckets.max() - lowest + 1) if len(buckets) else 1
+        composite, inverse = np.unique(codes * span + (buckets - lowest), return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.zeros((len(composite), len(COUNT_COLUMNS)), dtype=np.int64)
+        for column in range(len(SENTIMENTS)):
+            counts[:, column] = np.bincount(inverse[sentiment_columns == column], minlength=len(composite))
+        counts[:, -1] = np.bincount(inverse, minlength=len(composite))
+
+        cumulative = np.zeros((len(composite) + 1, len(COUNT_COLUMNS)), dtype=np.int64)
+        np.cumsum(counts, axis=0, out=cumulative[1:])
+        offsets = np.searchsorted(composite // span, np.arange(len(categories) + 1))
+        lookup = {value: code for code, value in enumerate(categories)}
+        return cls(lookup, offsets, composite % span + lowest, cumulative, 'D')
+
+    def to_months(self):
+        """Monthly index with the same counts, merged from this daily one without sorting again"""
+        days = self.buckets
+        if len(days) == 0:
+            return TimeIndex(self.lookup, self.offsets, days, self.cumulative, 'M')
+        first = days.min()
+        months = np.arange(first, days.max() + 1).astype('datetime64[D]').astype('datetime64[M]')
+        months = months.astype(np.int64)[days - first]
+        codes = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+        # Rows are sorted by value then day, so each (value, month) is a run of rows
+        starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (months[1:] != months[:-1])])
+        ends = np.r_[starts[1:], len(days)]
+        cumulative = np.concatenate([self.cumulative[:1], self.cumulative[ends]])
+        offsets = np.searchsorted(starts, self.offsets)
+        return TimeIndex(self.lookup, offsets, months[starts], cumulative, 'M')
+
+    def segment(self, value):
+        """(first, last + 1) position of the buckets of value, or None if it has none"""
+        code = self.lookup.get(value)
+        if code is None or self.offsets[code] == self.offsets[code + 1]:
+            return None
+        return self.offsets[code], self.offsets[code + 1]
+
+    def bucket_range(self, value):
+        """First and last bucket with reviews of value, or None"""
+        segment = self.segment(value)
+        if segment is None:
+            return None
+        return int(self.buckets[segment[0]]), int(self.buckets[segment[1] - 1])
+
+    def range_counts(self, value, start, end):
+        """COUNT_COLUMNS of value summed over the buckets start..end (inclusive)"""
+        return self.window_counts(value, np.array([end]), end - start + 1)[0]
+
+    def window_counts(self, value, ends, window):
+        """COUNT_COLUMNS summed over the window buckets ending at each of ends"""
+        ends = np.asarray(ends, dtype=np.int64)
+        segment = self.segment(value)
+        if segment is None:
+            return np.zeros((len(ends), len(COUNT_COLUMNS)), dtype=np.int64)
+        first, last = segment
+        buckets = self.buckets[first:last]
+        lo = np.searchsorted(buckets, ends - window + 1, side='left')
+        hi = np.searchsorted(buckets, ends, side='right')
+        return self.cumulative[first + hi] - self.cumulative[first + lo]
+
+    def nbytes(self):
+        return self.offsets.nbytes + self.buckets.nbytes + self.cumulative.nbytes
+
+
+class SentimentTimeline:
+    """Daily and monthly TimeIndex of every key in TIMELINE_KEYS, built on first use of each"""
+
+    def __init__(self, store):
+        self.store = store
+        self.indexes = {}
+        self.lock = threading.RLock()
+
+    def index(self, key=None, unit='M'):
+        if key not in TIMELINE_KEYS:
+            raise ValueError(f"No timeline by {key!r}, expected one of {TIMELINE_KEYS[1:]}")
+        if unit not in TIMELINE_UNITS:
+            raise ValueError(f"Unknown time unit {unit!r}, expected one of {TIMELINE_UNITS}")
+        with self.lock:
+            index = self.indexes.get((key, unit))
+            if index is None:
+                if unit == 'M':
+                    index = self.index(key, 'D').to_months()
+                else:
+                    index = TimeIndex.from_store(self.store, key)
+                self.indexes[(key, unit)] = index
+            return index
+
+    def precompute(self):
+        for key in TIMELINE_KEYS:
+            for unit in TIMELINE_UNITS:
+                self.index(key, unit)
+
+    def rolling(self, key=None, value=None, unit='M', window=1, start=None, end=None):
+        """Sentiment counts over a rolling window of buckets, for every bucket from start to end
+
+        start and end are bucket numbers, clamped to the first and last bucket
+        with reviews of value, which they default to. Returns (buckets, counts), counts having
+        one row per bucket and COUNT_COLUMNS as columns, or None when value has
+        no dated reviews.
+        """
+        index = self.index(key, unit)
+        bounds = index.bucket_range(value)
+        if bounds is None:
+            return None
+        start = bounds[0] if start is None else max(start, bounds[0])
+        end = bounds[1] if end is None else min(end, bounds[1])
+        buckets = np.arange(start, end + 1, dtype=np.int64)
+        return buckets, index.window_counts(value, buckets, window)
+
+    def nbytes(self):
+        with self.lock:
+            return sum(index.nbytes() for index in self.indexes.values())
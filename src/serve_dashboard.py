@@ -0,0 +1,110 @@
+"""Production entry point of the dashboard
+
+Loads the dataset once in the parent process and then forks the workers, so the
+review store and aggregates are shared copy-on-write instead of loaded per
+worker. Uses gunicorn when it is installed and Werkzeug's threaded server,
+in this one process, otherwise. Run it from src/ like the dashboard script:
+
+    python serve_dashboard.py --workers 4 --threads 8
+
+or point gunicorn at the app factory directly:
+
+    gunicorn --preload -w 4 --threads 8 'serve_dashboard:create_app()'
+"""
+import argparse
+import importlib
+import logging
+import os
+
+try:
+    import gunicorn.app.base
+except ImportError:
+    gunicorn = None
+
+from dashboard_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BIND = os.environ.get('DASHBOARD_BIND', '127.0.0.1:5000')
+DEFAULT_WORKERS = int(os.environ.get('DASHBOARD_WORKERS', os.cpu_count() or 1))
+DEFAULT_THREADS = int(os.environ.get('DASHBOARD_THREADS', 4))
+
+
+def dashboard_module():
+    return importlib.import_module('04_data_visualization_advanced_part4')
+
+
+def create_app(preload=True, warm_cache=None, watch=None):
+    """The dashboard Flask app, with its data loaded before it is returned"""
+    module = dashboard_module()
+    if warm_cache is None:
+        warm_cache = module.WARM_CACHE_ON_STARTUP
+    if watch is None:
+        watch = module.RELOAD_INTERVAL > 0
+    return module.create_app(preload=preload, warm_cache=warm_cache, watch=watch)
+
+
+if gunicorn is not None:
+    class DashboardApplication(gunicorn.app.base.BaseApplication):
+        """gunicorn server for the app factory, loaded once before forking"""
+
+        def __init__(self, options, warm_cache=None):
+            self.options = options
+            self.warm_cache = warm_cache
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Threads do not survive the fork, so each worker starts its own reloader
+            return create_app(warm_cache=self.warm_cache, watch=False)
+
+
+def serve_gunicorn(bind, workers, threads, warm_cache=None):
+    options = {
+        'bind': bind,
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': True
+    }
+    DashboardApplication(options, warm_cache).run()
+
+
+def serve_werkzeug(bind, workers, threads, warm_cache=None):
+    """Werkzeug fallback: one process, threaded
+
+    Werkzeug's multi-process mode forks a child per request, which would lose
+    the response cache, figure memo and reloader state after every request,
+    so several workers need gunicorn.
+    """
+    from werkzeug.serving import run_simple
+
+    if workers > 1:
+        logger.warning("Serving %d workers needs gunicorn; serving from one threaded process instead", workers)
+    host, _, port = bind.rpartition(':')
+    app = create_app(warm_cache=warm_cache)
+    run_simple(host or '127.0.0.1', int(port), app, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the sentiment dashboard with preloaded data')
+    parser.add_argument('--bind', default=DEFAULT_BIND, help='host:port to listen on')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='worker processes')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS, help='threads per worker')
+    parser.add_argument('--warm-cache', action='store_true', default=None,
+                        help='precompute every response before serving (default: DASHBOARD_WARM_CACHE)')
+    args = parser.parse_args()
+
+    configure_logging()
+    if gunicorn is not None:
+        serve_gunicorn(args.bind, args.workers, args.threads, args.warm_cache)
+    else:
+        logger.warning("gunicorn is not installed, serving with Werkzeug")
+        serve_werkzeug(args.bind, args.workers, args.threads, args.warm_cache)
+
+
+if __name__ == '__main__':
+    main()
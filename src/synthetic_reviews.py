@@ -0,0 +1,259 @@
+"""Synthetic review datasets in the schema of the processed review CSV
+
+Generates any number of reviews with the columns of
+final_indepth_sentiment_analysis_w_processed_category.csv, so the dashboard can
+be benchmarked at sizes the 1,441-row samples cannot show. The skew follows the
+real data: a few products, brands and categories hold most reviews (Zipf
+distributed), 'Uncategorized' products have an 'Unknown Brand', ratings lean to
+5 stars and sentiment leans positive depending on the rating. The output only
+depends on the row count and the seed, and is written in chunks so 10M rows
+never have to fit in memory at once.
+
+    python synthetic_reviews.py 1M ../data/synthetic/reviews_1m.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from review_store import SOURCE_COLUMNS
+from sentiment_scoring import clean_text, preprocess
+
+# Columns of the processed review CSV, in its order
+CSV_COLUMNS = [
+    'reviewer_id', 'asin', 'reviewer_name', 'helpful', 'helpful_ratio', 'review_text', 'overall',
+    'summary', 'unix_review_time', 'review_time', 'review_date', 'cleaned_text', 'processed_text',
+    'formatted_date', 'review_length', 'word_count', 'category', 'main_category', 'description',
+    'title', 'brand', 'price', 'manual_sentiment', 'vader_score', 'textblob_score',
+    'neutral_confidence', 'sentiment', 'overall_category'
+]
+
+# Share of products in each overall_category, close to the processed dataset;
+# the category path and main_category(ies) of its products
+CATEGORIES = {
+    'Computers': (0.50, 'Electronics|Computers & Accessories', ['All Electronics', 'Computers']),
+    'Uncategorized': (0.25, 'Electronics', ['Uncategorized']),
+    'Camera & Photo': (0.07, 'Electronics|Camera & Photo', ['Camera & Photo']),
+    'Home Audio & Theater': (0.06, 'Electronics|Home Audio & Theater', ['Home Audio & Theater']),
+    'Cell Phones & Accessories': (0.04, 'Electronics|Cell Phones & Accessories', ['Cell Phones & Accessories']),
+    'Car Electronics': (0.02, 'Electronics|Car Electronics', ['Car Electronics']),
+    'Amazon Devices': (0.015, 'Electronics|Amazon Devices', ['Amazon Devices']),
+    'Musical Instruments': (0.01, 'Electronics|Musical Instruments', ['Musical Instruments']),
+    'Video Games': (0.01, 'Electronics|Video Games', ['Video Games']),
+    'GPS & Navigation': (0.01, 'Electronics|GPS & Navigation', ['GPS & Navigation']),
+    'Office Products': (0.01, 'Electronics|Office Products', ['Office Products']),
+    'Sports & Outdoors': (0.005, 'Electronics|Sports & Outdoors', ['Sports & Outdoors'])
+}
+
+RATING_WEIGHTS = {5: 0.60, 4: 0.20, 3: 0.10, 2: 0.05, 1: 0.05}
+
+# P(positive, neutral, negative | rating)
+SENTIMENT_GIVEN_RATING = {
+    5: (0.90, 0.08, 0.02),
+    4: (0.80, 0.14, 0.06),
+    3: (0.45, 0.30, 0.25),
+    2: (0.20, 0.20, 0.60),
+    1: (0.10, 0.15, 0.75)
+}
+SENTIMENT_LABELS = ['positive', 'neutral', 'negative']
+
+PRODUCT_NOUNS = ['Cable', 'Charger', 'Headphones', 'Speaker', 'Case', 'Adapter', 'Keyboard', 'Mouse',
+                 'Memory Card', 'Tripod', 'Lens', 'Router', 'Hard Drive', 'Battery', 'Screen Protector']
+PHRASES = {
+    'positive': ['works great', 'excellent sound quality', 'very happy with this purchase',
+                 'easy to set up', 'highly recommend it', 'great value for the price', 'sturdy and well made'],
+    'neutral': ['it does what it says', 'arrived on time', 'average product', 'nothing special',
+                'it is okay for the price', 'came in a plain box', 'used it a few times'],
+    'negative': ['stopped working after a week', 'poor build quality', 'would not buy again',
+                 'does not fit as described', 'very disappointed', 'returned it', 'cheap and flimsy']
+}
+
+FIRST_DAY = np.datetime64('2000-01-01')
+LAST_DAY = np.datetime64('2014-07-23')
+
+CHUNK_ROWS = 500_000
+# Distinct review texts per sentiment the rows draw from
+TEXTS_PER_SENTIMENT = 500
+
+
+def parse_rows(text):
+    """Row count of '10k', '1M', '2.5M' or '100000'"""
+    text = text.strip().upper()
+    scale = {'K': 1_000, 'M': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def zipf_weights(n, skew):
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def base36_ids(rng, prefix, n, digits):
+    """n distinct identifiers like Amazon's, e.g. B00FXBKNQC"""
+    numbers = rng.choice(36 ** digits, size=n, replace=False)
+    return np.array([prefix + np.base_repr(int(x), 36).rjust(digits, '0') for x in numbers], dtype=object)
+
+
+def product_catalog(rows, seed=0, skew=1.1):
+    """Products with their category columns, brand, title and price, most popular first"""
+    rng = np.random.default_rng([seed, 0])
+    n_products = max(50, int(rows ** 0.7))
+    n_brands = max(20, int(n_products ** 0.6))
+
+    names = list(CATEGORIES)
+    shares = np.array([CATEGORIES[name][0] for name in names])
+    categories = np.array(names, dtype=object)[rng.choice(len(names), n_products, p=shares / shares.sum())]
+    brands = np.array([f'Brand{i:05d}' for i in range(n_brands)], dtype=object)
+    brand = brands[rng.choice(n_brands, n_products, p=zipf_weights(n_brands, skew))]
+    brand[categories == 'Uncategorized'] = 'Unknown Brand'
+
+    main_category = np.empty(n_products, dtype=object)
+    path = np.empty(n_products, dtype=object)
+    for name, (_, category_path, mains) in CATEGORIES.items():
+        selected = categories == name
+        main_category[selected] = np.array(mains, dtype=object)[rng.integers(len(mains), size=selected.sum())]
+        path[selected] = category_path
+    nouns = np.array(PRODUCT_NOUNS, dtype=object)[rng.integers(len(PRODUCT_NOUNS), size=n_products)]
+    path = path + '|' + nouns
+
+    asins = base36_ids(rng, 'B00', n_products, 7)
+    titles = [f'{b} {noun} {asin[-4:]}' for b, noun, asin in zip(brand, nouns, asins)]
+    price = np.round(rng.lognormal(3.0, 0.9, n_products), 2)
+    price[rng.random(n_products) < 0.4] = np.nan
+    return pd.DataFrame({
+        'asin': asins,
+        'overall_category': categories,
+        'main_category': main_category,
+        'category': path,
+        'brand': brand,
+        'title': titles,
+        'description': [f'{noun} by {b}.' for b, noun in zip(brand, nouns)],
+        'price': price
+    })
+
+
+def review_texts(rng):
+    """(text, cleaned_text, processed_text) arrays of TEXTS_PER_SENTIMENT texts per sentiment"""
+    texts = {}
+    for sentiment, phrases in PHRASES.items():
+        counts = rng.integers(1, 4, size=TEXTS_PER_SENTIMENT)
+        raw = [', '.join(rng.choice(phrases, size=k, replace=False)).capitalize() + '.' for k in counts]
+        texts[sentiment] = (
+            np.array(raw, dtype=object),
+            np.array([clean_text(t) for t in raw], dtype=object),
+            np.array([preprocess(t) for t in raw], dtype=object)
+        )
+    return texts
+
+
+def generate_chunk(catalog, reviewers, texts, size, rng, skew=1.1):
+    """size reviews of catalog's products as a DataFrame with CSV_COLUMNS"""
+    product = rng.choice(len(catalog), size, p=zipf_weights(len(catalog), skew))
+    df = catalog.iloc[product].reset_index(drop=True)
+
+    ratings = np.array(list(RATING_WEIGHTS))
+    overall = ratings[rng.choice(len(ratings), size, p=list(RATING_WEIGHTS.values()))]
+    sentiment = np.empty(size, dtype=object)
+    for rating, probabilities in SENTIMENT_GIVEN_RATING.items():
+        selected = overall == rating
+        sentiment[selected] = np.array(SENTIMENT_LABELS, dtype=object)[
+            rng.choice(3, selected.sum(), p=probabilities)]
+
+    # More reviews in later years, like the original dataset
+    span = int((LAST_DAY - FIRST_DAY).astype(int))
+    days = FIRST_DAY + (span * rng.random(size) ** (1 / 3)).astype('timedelta64[D]')
+    dates = pd.DatetimeIndex(days)
+
+    text, cleaned, processed = (np.empty(size, dtype=object) for _ in range(3))
+    vader = np.empty(size)
+    textblob = np.empty(size)
+    neutral_confidence = np.empty(size)
+    for label in SENTIMENT_LABELS:
+        selected = sentiment == label
+        n = selected.sum()
+        choice = rng.integers(TEXTS_PER_SENTIMENT, size=n)
+        for column, values in zip((text, cleaned, processed), texts[label]):
+            column[selected] = values[choice]
+        if label == 'neutral':
+            vader[selected] = rng.uniform(-0.05, 0.05, n)
+            textblob[selected] = rng.uniform(-0.05, 0.05, n)
+            neutral_confidence[selected] = rng.choice([0.6, 0.8, 1.0], n)
+        else:
+            sign = 1 if label == 'positive' else -1
+            vader[selected] = sign * rng.uniform(0.3, 1.0, n)
+            textblob[selected] = sign * rng.uniform(0.15, 0.8, n)
+            neutral_confidence[selected] = rng.choice([0.0, 0.2, 0.4], n)
+
+    votes = rng.geometric(0.5, size) - 1
+    helpful = rng.binomial(votes, 0.7)
+    reviewer = rng.choice(len(reviewers), size, p=zipf_weights(len(reviewers), 0.8))
+    lengths = np.fromiter((len(t) for t in text), dtype=np.int64, count=size)
+    words = np.fromiter((len(t.split()) for t in text), dtype=np.int64, count=size)
+
+    df.insert(0, 'reviewer_id', reviewers[reviewer])
+    df['reviewer_name'] = [f'Reviewer {r}' for r in reviewer]
+    df['helpful'] = [f'[{h}, {v}]' for h, v in zip(helpful, votes)]
+    df['helpful_ratio'] = np.round(helpful / np.maximum(votes, 1), 2)
+    df['review_text'] = text
+    df['overall'] = overall
+    df['summary'] = [t.split(',')[0].rstrip('.') for t in text]
+    df['unix_review_time'] = days.astype('datetime64[s]').astype(np.int64)
+    df['review_time'] = dates.strftime('%m %d, %Y')
+    df['review_date'] = dates.strftime('%Y-%m-%d')
+    df['cleaned_text'] = cleaned
+    df['processed_text'] = processed
+    df['formatted_date'] = dates.strftime('%d-%b-%y')
+    df['review_length'] = lengths
+    df['word_count'] = words
+    df['manual_sentiment'] = np.nan
+    df['vader_score'] = np.round(vader, 4)
+    df['textblob_score'] = np.round(textblob, 4)
+    df['neutral_confidence'] = neutral_confidence
+    df['sentiment'] = sentiment
+    return df[CSV_COLUMNS]
+
+
+def generate(rows, seed=0, skew=1.1, chunk_rows=CHUNK_ROWS):
+    """DataFrames of at most chunk_rows reviews adding up to rows"""
+    catalog = product_catalog(rows, seed, skew)
+    rng = np.random.default_rng([seed, 1])
+    reviewers = base36_ids(rng, 'A', max(100, rows // 4), 12)
+    texts = review_texts(rng)
+    for index, start in enumerate(range(0, rows, chunk_rows)):
+        chunk_rng = np.random.default_rng([seed, 2, index])
+        yield generate_chunk(catalog, reviewers, texts, min(chunk_rows, rows - start), chunk_rng, skew)
+
+
+def write_csv(path, rows, seed=0, skew=1.1, columns=None):
+    """Write a synthetic dataset to path, atomically; columns defaults to every CSV column"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for index, chunk in enumerate(generate(rows, seed, skew)):
+            chunk.to_csv(f, columns=columns, header=index == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic processed review CSV')
+    parser.add_argument('rows', type=parse_rows, help="number of reviews, e.g. 10k, 1M or 250000")
+    parser.add_argument('output', help='CSV path to write')
+    parser.add_argument('--seed', type=int, default=0, help='random seed; the same seed gives the same file')
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='Zipf exponent of product and brand popularity (higher is more skewed)')
+    parser.add_argument('--dashboard-columns', action='store_true',
+                        help='only write the columns the dashboard reads, for smaller files')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    columns = SOURCE_COLUMNS if args.dashboard_columns else None
+    write_csv(args.output, args.rows, args.seed, args.skew, columns)
+    print(f"Wrote {args.rows} reviews to {args.output} in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
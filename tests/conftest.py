@@ -0,0 +1,99 @@
+"""Fixtures shared by the tests: a small generated review dataset and the dashboard app serving it"""
+import importlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+REVIEWS = 3000
+
+# overall_category of the products, their share of them and their main_category(ies)
+CATEGORIES = {
+    'Computers': (0.45, ['All Electronics', 'Computers']),
+    'Uncategorized': (0.25, ['Uncategorized']),
+    'Camera & Photo': (0.15, ['Camera & Photo']),
+    'Car Electronics': (0.1, ['Car Electronics']),
+    'Office Products': (0.05, ['Office Products'])
+}
+
+WORDS = ['great', 'good', 'bad', 'terrible', 'cable', 'battery', 'works', 'broke', 'love', 'return',
+         'sound', 'screen', 'fast', 'slow', 'cheap', 'fine', 'not', 'very', 'price', 'quality']
+
+
+def make_reviews(rows, seed=0, products=150):
+    """Reviews with the columns the dashboard reads and a processed_text, skewed like the real data
+
+    A few products hold most reviews, ratings lean to 5 stars, and texts are
+    drawn from a small pool so identical texts recur.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORIES)
+    category = rng.choice(names, products, p=[CATEGORIES[name][0] for name in names])
+    main_category = [rng.choice(CATEGORIES[name][1]) for name in category]
+    brand = np.where(category == 'Uncategorized', 'Unknown Brand',
+                     np.char.add('Brand ', rng.integers(0, 20, products).astype(str)))
+    titles = np.array([f'Product {n}' for n in range(products)], dtype=object)
+    titles[rng.choice(products, 5, replace=False)] = 'Untitled'
+    texts = [' '.join(rng.choice(WORDS, rng.integers(3, 9))) for _ in range(rows // 10)]
+
+    weights = 1 / np.arange(1, products + 1)
+    product = rng.choice(products, rows, p=weights / weights.sum())
+    days = rng.integers(0, 5000, rows)
+    return pd.DataFrame({
+        'asin': np.char.add('B', np.char.zfill(product.astype(str), 9)),
+        'overall': rng.choice([1, 2, 3, 4, 5], rows, p=[0.05, 0.05, 0.1, 0.2, 0.6]),
+        'sentiment': rng.choice(['positive', 'neutral', 'negative'], rows, p=[0.7, 0.15, 0.15]),
+        'review_date': np.datetime_as_string(np.datetime64('2000-08-05') + days, unit='D'),
+        'overall_category': category[product],
+        'main_category': np.array(main_category)[product],
+        'brand': brand[product],
+        'title': titles[product],
+        'processed_text': rng.choice(texts, rows)
+    })
+
+
+@pytest.fixture(scope='session')
+def reviews():
+    return make_reviews(REVIEWS, seed=1)
+
+
+@pytest.fixture(scope='session')
+def reviews_csv(tmp_path_factory, reviews):
+    path = str(tmp_path_factory.mktemp('reviews') / 'reviews.csv')
+    reviews.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope='session')
+def dashboard(reviews_csv):
+    """The dashboard module, serving reviews_csv without reloads, a warmed cache or a score cache file"""
+    os.environ.update({
+        'DASHBOARD_DATA_PATH': reviews_csv,
+        'DASHBOARD_RELOAD_INTERVAL': '0',
+        'DASHBOARD_WARM_CACHE': '0',
+        'DASHBOARD_PROGRESSIVE': '0',
+        'DASHBOARD_SCORE_CACHE': ''
+    })
+    # The app finds its templates relative to the directory it is started from
+    cwd = os.getcwd()
+    os.chdir(SRC_DIR)
+    try:
+        module = importlib.import_module('04_data_visualization_advanced_part4')
+    finally:
+        os.chdir(cwd)
+    yield module
+    module.figure_executor.shutdown()
+
+
+@pytest.fixture
+def served(dashboard):
+    """The dashboard module; data swapped in by the test (e.g. by /ingest) is swapped out after it"""
+    data = dashboard.load_data()
+    yield dashboard
+    dashboard.dashboard_loader.update(lambda current: data)
+    dashboard.response_cache.clear()
@@ -0,0 +1,144 @@
+"""ReviewStore, SentimentCube and DashboardData.append against pandas over the raw reviews"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from chunked_aggregation import aggregate_reviews
+from dashboard_data import DashboardData
+from partitioned_aggregation import partitioned_count_keys
+from product_ranking import SENTIMENT_TYPES
+from review_store import DIMENSIONS, ReviewStore
+from sentiment_cube import SENTIMENTS, SentimentCube, count_keys
+
+
+def sentiment_counts(df, by):
+    """Per-group sentiment counts the way the charts counted them before the cube: from the reviews"""
+    table = df.groupby(by)['sentiment'].value_counts().unstack(fill_value=0)
+    return table.reindex(columns=SENTIMENTS, fill_value=0).sort_index()
+
+
+def cube_counts(cube, by):
+    table = cube.sentiment_table(by)[SENTIMENTS]
+    table.index = table.index.astype(object)
+    return table.sort_index()
+
+
+def assert_same_counts(cube, df, by):
+    pd.testing.assert_frame_equal(cube_counts(cube, by), sentiment_counts(df, by),
+                                  check_names=False, check_dtype=False, check_index_type=False)
+
+
+def store_of(df, version='v0'):
+    store = ReviewStore.from_frame(df.reset_index(drop=True))
+    store.version = version
+    return store
+
+
+def cube_of(df):
+    return SentimentCube.from_store(ReviewStore.from_frame(df))
+
+
+def test_store_keeps_the_review_columns(reviews):
+    store = ReviewStore.from_frame(reviews)
+    for name in DIMENSIONS:
+        assert store.frame[name].astype(object).tolist() == reviews[name].tolist()
+    assert store.frame['overall'].tolist() == reviews['overall'].tolist()
+    expected_days = pd.to_datetime(reviews['review_date']).to_numpy().astype('datetime64[D]')
+    np.testing.assert_array_equal(store.review_dates, expected_days)
+    assert store.titles.loc[reviews['asin'].iloc[0]] == reviews['title'].iloc[0]
+
+
+@pytest.mark.parametrize('by', ['overall_category', 'main_category', 'brand', 'asin'])
+def test_cube_matches_the_reviews(reviews, by):
+    cube = cube_of(reviews)
+    assert cube.total() == len(reviews)
+    assert_same_counts(cube, reviews, by)
+
+
+def test_cube_selection_matches_masked_reviews(reviews):
+    cube = cube_of(reviews)
+    for category in reviews['overall_category'].unique():
+        assert_same_counts(cube.select(overall_category=category),
+                           reviews[reviews['overall_category'] == category], 'brand')
+
+
+def test_indexed_selection_matches_masked_reviews(reviews):
+    cube = cube_of(reviews)
+    for (main_category, brand), group in reviews.groupby(['main_category', 'brand']):
+        selected = cube.select(main_category=main_category, brand=brand)
+        assert selected.total() == len(group)
+        assert_same_counts(selected, group, 'asin')
+    assert cube.select(brand='No Such Brand').total() == 0
+
+
+def test_rating_counts_match_the_crosstab(reviews):
+    cube = cube_of(reviews)
+    expected = pd.crosstab(reviews['overall'], reviews['sentiment'])
+    pd.testing.assert_frame_equal(cube.rating_sentiment_counts()[expected.columns], expected,
+                                  check_names=False, check_dtype=False, check_index_type=False)
+
+
+def test_rating_counts_keep_every_rating(reviews):
+    counts = cube_of(reviews[reviews['overall'] >= 3]).rating_sentiment_counts()
+    assert counts.index.tolist() == [1, 2, 3, 4, 5]
+    assert counts.loc[[1, 2]].to_numpy().sum() == 0
+    assert counts.to_numpy().sum() == (reviews['overall'] >= 3).sum()
+
+def test_titles_skip_untitled_products(reviews):
+    cube = cube_of(reviews)
+    titled = reviews.drop_duplicates('asin')
+    titled = titled[titled['title'] != 'Untitled']
+    assert sorted(cube.titles.index) == sorted(titled['asin'])
+
+
+def test_append_matches_a_rebuild(reviews):
+    # Sorted by category, so later parts bring categories, brands and products the first one lacks
+    ordered = reviews.sort_values('overall_category', kind='stable')
+    data = DashboardData(store_of(ordered.iloc[:1500]))
+    for start in range(1500, len(ordered), 300):
+        data = data.append(store_of(ordered.iloc[start:start + 300]))
+    rebuilt = DashboardData(store_of(ordered))
+
+    assert len(data.store) == len(rebuilt.store)
+    assert data.version == f"v0+{len(reviews) - 1500}"
+    for by in ['overall_category', 'main_category', 'brand', 'asin']:
+        pd.testing.assert_frame_equal(cube_counts(data.cube, by), cube_counts(rebuilt.cube, by))
+    pd.testing.assert_frame_equal(data.cube.rating_sentiment_counts(), rebuilt.cube.rating_sentiment_counts())
+    for category in [None] + list(reviews['overall_category'].unique()):
+        for sentiment_type in SENTIMENT_TYPES:
+            appended = data.ranking.top(category, sentiment_type)
+            expected = rebuilt.ranking.top(category, sentiment_type)
+            assert appended['sentiment_score'].tolist() == expected['sentiment_score'].tolist()
+    for unit in ['D', 'M']:
+        buckets, counts = data.timeline.rolling(unit=unit, window=3)
+        expected_buckets, expected_counts = rebuilt.timeline.rolling(unit=unit, window=3)
+        np.testing.assert_array_equal(buckets, expected_buckets)
+        np.testing.assert_array_equal(counts, expected_counts)
+
+
+def test_append_leaves_the_extended_store_unchanged(reviews):
+    first = store_of(reviews.iloc[:1000])
+    second = first.append(store_of(reviews.iloc[1000:1500]))
+    expected = second.frame.copy()
+    # Both extend second; the later one must not write over the rows of the earlier one
+    third = second.append(store_of(reviews.iloc[1500:2000]))
+    other = second.append(store_of(reviews.iloc[2000:2600]))
+    pd.testing.assert_frame_equal(second.frame, expected)
+    assert third.frame['asin'].astype(object).tolist() == reviews['asin'].iloc[:2000].tolist()
+    assert other.frame['asin'].astype(object).tolist() == (
+        reviews['asin'].iloc[:1500].tolist() + reviews['asin'].iloc[2000:2600].tolist())
+
+@pytest.mark.parametrize('chunk_rows', [997, 100_000])
+def test_chunked_aggregation_matches_the_in_memory_cube(reviews, reviews_csv, chunk_rows):
+    cube, rows, _ = aggregate_reviews(reviews_csv, chunk_rows)
+    expected = cube_of(reviews)
+    assert rows == cube.total() == len(reviews)
+    for by in ['overall_category', 'main_category', 'brand', 'asin']:
+        pd.testing.assert_frame_equal(cube_counts(cube, by), cube_counts(expected, by))
+    assert cube.titles.to_dict() == expected.titles.to_dict()
+
+
+@pytest.mark.parametrize('partitions', [1, 3, 200])
+def test_partitioned_counts_match_count_keys(reviews, partitions):
+    frame = ReviewStore.from_frame(reviews).frame
+    pd.testing.assert_frame_equal(partitioned_count_keys(frame, workers=2, partitions=partitions), count_keys(frame))
@@ -0,0 +1,125 @@
+"""Resumable batch scoring, its use of the score cache and its deduplication of texts"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import batch_scoring
+from score_cache import ScoreCache, normalize
+
+CHUNK_ROWS = 40
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def small_csv(reviews, tmp_path):
+    path = str(tmp_path / 'reviews.csv')
+    reviews.iloc[:200].to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def scored_texts(monkeypatch):
+    """Texts the analyzers are run on, recorded by wrapping score_texts"""
+    texts = []
+    score_texts = batch_scoring.score_texts
+
+    def recording(batch):
+        texts.extend(batch)
+        return score_texts(batch)
+    monkeypatch.setattr(batch_scoring, 'score_texts', recording)
+    return texts
+
+
+def score(csv_path, output_path, cache=None):
+    return batch_scoring.score_csv(csv_path, output_path, chunk_rows=CHUNK_ROWS, workers=1, cache=cache,
+                                   stream=None)
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(small_csv, tmp_path, monkeypatch):
+    expected_path = str(tmp_path / 'expected.csv')
+    score(small_csv, expected_path)
+
+    output_path = str(tmp_path / 'scored.csv')
+    save = batch_scoring.ScoringCheckpoint.save
+    saved = []
+
+    def save_two_chunks(checkpoint, index, columns):
+        if len(saved) == 2:
+            raise Interrupted()
+        saved.append(index)
+        save(checkpoint, index, columns)
+    monkeypatch.setattr(batch_scoring.ScoringCheckpoint, 'save', save_two_chunks)
+    with pytest.raises(Interrupted):
+        score(small_csv, output_path)
+    monkeypatch.setattr(batch_scoring.ScoringCheckpoint, 'save', save)
+
+    result = score(small_csv, output_path)
+    assert result['resumed'] == 2 * CHUNK_ROWS
+    assert result['scored'] == 200 - 2 * CHUNK_ROWS
+    pd.testing.assert_frame_equal(pd.read_csv(output_path), pd.read_csv(expected_path))
+
+
+def test_resumed_reviews_count_a_short_last_chunk(reviews, tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'reviews.csv')
+    reviews.iloc[:190].to_csv(csv_path, index=False)
+    output_path = str(tmp_path / 'scored.csv')
+    write_scored_csv = batch_scoring.write_scored_csv
+
+    def interrupted(*args):
+        raise Interrupted()
+    # Every chunk is in the checkpoint, the last one with 30 reviews
+    monkeypatch.setattr(batch_scoring, 'write_scored_csv', interrupted)
+    with pytest.raises(Interrupted):
+        score(csv_path, output_path)
+    monkeypatch.setattr(batch_scoring, 'write_scored_csv', write_scored_csv)
+
+    stream = io.StringIO()
+    result = batch_scoring.score_csv(csv_path, output_path, chunk_rows=CHUNK_ROWS, workers=1, stream=stream)
+    assert (result['resumed'], result['scored']) == (190, 0)
+    assert 'Resuming after 5 scored chunks (190 reviews)' in stream.getvalue()
+
+def test_rerun_takes_every_score_from_the_cache(small_csv, tmp_path, scored_texts):
+    cache = ScoreCache(str(tmp_path / 'scores.sqlite'), versions={'test': 1})
+    try:
+        score(small_csv, str(tmp_path / 'first.csv'), cache)
+        distinct = {normalize(text) for text in pd.read_csv(small_csv)['processed_text']}
+        assert sorted(scored_texts) == sorted(distinct)
+
+        scored_texts.clear()
+        result = score(small_csv, str(tmp_path / 'second.csv'), cache)
+        assert scored_texts == []
+        assert result['cache']['entries'] == len(distinct)
+    finally:
+        cache.close()
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'second.csv'), pd.read_csv(tmp_path / 'first.csv'))
+
+
+def test_texts_of_chunks_in_flight_are_scored_once(monkeypatch):
+    sent = []
+
+    def fake_scores(texts):
+        sent.extend(texts)
+        return np.array([[len(text), 0.0, 0.5] for text in texts], dtype=np.float64).reshape(-1, 3)
+    monkeypatch.setattr(batch_scoring, 'score_texts', fake_scores)
+    monkeypatch.setattr(batch_scoring, 'ProcessPoolExecutor',
+                        lambda max_workers, initializer: ThreadPoolExecutor(max_workers))
+
+    # Every chunk repeats texts of the ones before it, which are still in flight with 3 workers
+    chunks = [(index, [f"text {n % 7}" * (n % 7 + 1) for n in range(index, index + 10)]) for index in range(8)]
+    saved = {}
+
+    class Progress:
+        def add(self, reviews):
+            pass
+    batch_scoring.score_chunks(chunks, set(), saved.__setitem__, 3, Progress())
+
+    assert sorted(sent) == sorted(set(sent))
+    assert len(sent) == 7
+    for index, texts in chunks:
+        assert saved[index]['vader_score'].tolist() == [len(text) for text in texts]
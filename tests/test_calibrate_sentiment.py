@@ -0,0 +1,27 @@
+"""Threshold sweep: grid scores against the scalar classify() of every configuration"""
+import numpy as np
+import pytest
+
+from calibrate_sentiment import evaluate_grid, threshold_grid
+from sentiment_scoring import SENTIMENT_LABELS, THRESHOLDS, Thresholds, classify
+from test_sentiment_scoring import raw_score_arrays
+
+
+def test_grid_scores_match_classify():
+    vader, polarity, subjectivity = raw_score_arrays(size=500, seed=2)
+    manual = np.random.default_rng(2).choice(SENTIMENT_LABELS, len(vader))
+    grid = threshold_grid({'polarity': [0.05, 0.2], 'neutral_confidence': [0.4, 0.6]})
+    surface = evaluate_grid(vader, polarity, subjectivity, manual, grid)
+    assert len(surface) == 4
+    for _, configuration in surface.iterrows():
+        thresholds = Thresholds(*(configuration[field] for field in Thresholds._fields))
+        labels = [classify(v, p, s, thresholds)[0] for v, p, s in zip(vader, polarity, subjectivity)]
+        assert configuration['accuracy'] == pytest.approx(np.mean(np.array(labels) == manual))
+
+
+def test_grid_defaults_to_the_current_thresholds():
+    grid = threshold_grid({})
+    assert len(grid) == 1
+    assert tuple(grid.iloc[0]) == pytest.approx(tuple(THRESHOLDS))
+    with pytest.raises(ValueError):
+        threshold_grid({'no_such_threshold': [1]})
@@ -0,0 +1,131 @@
+"""Dashboard routes: /trend against the reviews, /ingest of new reviews and /score"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from figure_executor import FigureExecutor
+from sentiment_cube import SENTIMENTS
+from sentiment_scoring import SentimentScorer, preprocess
+
+UNITS = {'day': 'D', 'month': 'M'}
+
+
+def brute_force_trend(df, unit, window, start, end):
+    """Sentiment counts of the reviews in the window ending at every bucket from start to end"""
+    buckets = pd.to_datetime(df['review_date']).to_numpy().astype(f'datetime64[{UNITS[unit]}]')
+    first = np.datetime64(start, UNITS[unit])
+    last = np.datetime64(end, UNITS[unit])
+    series = {'dates': [], **{sentiment: [] for sentiment in SENTIMENTS}}
+    for bucket in np.arange(first, last + 1):
+        in_window = (buckets > bucket - window) & (buckets <= bucket)
+        series['dates'].append(str(bucket.astype('datetime64[D]')))
+        for sentiment in SENTIMENTS:
+            series[sentiment].append(int((in_window & (df['sentiment'] == sentiment).to_numpy()).sum()))
+    return series
+
+
+@pytest.mark.parametrize('unit, window, start, end', [
+    ('month', 3, '2008-01-01', '2010-12-31'),
+    ('day', 30, '2009-06-01', '2009-09-30')
+])
+def test_trend_matches_brute_force(dashboard, reviews, unit, window, start, end):
+    category = reviews['overall_category'].value_counts().index[1]
+    response = dashboard.app.test_client().get('/trend', query_string={
+        'category': category, 'unit': unit, 'window': window, 'start': start, 'end': end})
+    assert response.status_code == 200
+    series = response.get_json()
+    expected = brute_force_trend(reviews[reviews['overall_category'] == category], unit, window, start, end)
+    for name, values in expected.items():
+        assert series[name] == values
+
+
+def test_trend_range_is_clamped_to_the_reviews(dashboard, reviews):
+    client = dashboard.app.test_client()
+    entries = dashboard.response_cache.stats()['entries']
+    response = client.get('/trend?unit=day&start=1800-01-01&end=2100-12-31')
+    assert response.status_code == 200
+    dates = response.get_json()['dates']
+    assert dates[0] == reviews['review_date'].min()[:10]
+    assert dates[-1] == reviews['review_date'].max()[:10]
+    # Ad-hoc ranges are not kept in the response cache
+    assert dashboard.response_cache.stats()['entries'] == entries
+
+
+def test_trend_rejects_too_many_buckets(dashboard, monkeypatch):
+    client = dashboard.app.test_client()
+    assert client.get(f'/trend?window={dashboard.TREND_MAX_BUCKETS + 1}').status_code == 400
+    monkeypatch.setattr(dashboard, 'TREND_MAX_BUCKETS', 100)
+    assert client.get('/trend?unit=day').status_code == 400
+    assert client.get('/trend?unit=day&start=2009-01-01&end=2009-03-31').status_code == 200
+
+@pytest.mark.parametrize('body', [{'asin': 'B0001'}, [1, 2], [], 'text'])
+def test_ingest_rejects_anything_but_a_list_of_reviews(served, body):
+    response = served.app.test_client().post('/ingest', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_ingest_rejects_dates_that_do_not_parse(served, reviews):
+    before = served.load_data()
+    asin = reviews['asin'].iloc[0]
+    response = served.app.test_client().post('/ingest', json=[
+        {'asin': asin, 'overall': 5, 'sentiment': 'positive', 'review_date': '2010-05-01'},
+        {'asin': asin, 'overall': 4, 'sentiment': 'neutral'},
+        {'asin': asin, 'overall': 1, 'sentiment': 'negative', 'review_date': 'last tuesday'}
+    ])
+    assert response.status_code == 400
+    assert 'rows [2]' in response.get_json()['error']
+    assert served.load_data() is before
+
+def test_ingest_adds_reviews(served, reviews):
+    client = served.app.test_client()
+    before = served.load_data()
+    asin = reviews['asin'].iloc[0]
+    response = client.post('/ingest', json=[
+        {'asin': asin, 'overall': 5, 'sentiment': 'positive', 'review_date': '2010-05-01'},
+        {'asin': 'B0NEWPRODUCT', 'overall': 1, 'sentiment': 'negative', 'review_date': '2010-05-02'}
+    ])
+    assert response.status_code == 200
+    assert response.get_json() == {'accepted': 2, 'version': f'{before.version}+2', 'reviews': len(before.store) + 2}
+    after = served.load_data()
+    assert after.cube.total() == before.cube.total() + 2
+    assert client.get('/').status_code == 200
+
+
+def test_process_executor_builds_figures_of_ingested_data(served, reviews):
+    executor = FigureExecutor(
+        served.figure_graph,
+        kind='process',
+        max_workers=1,
+        timeout=120,
+        placeholder=served.placeholder_figure,
+        build_in_process=served.build_figure_in_process,
+        in_process=lambda data: data.ingested == 0
+    )
+    try:
+        _, replaced = executor.build(['overall_plot'], served.load_data(), overall_category=None)
+        assert replaced == []
+        response = served.app.test_client().post('/ingest', json=[
+            {'asin': reviews['asin'].iloc[0], 'overall': 4, 'sentiment': 'neutral', 'review_date': '2011-01-01'}])
+        assert response.status_code == 200
+        # The worker processes only have the dataset file, so these are built on threads
+        figures, replaced = executor.build(served.CATEGORY_FIGURES, served.load_data(), overall_category=None)
+        assert replaced == []
+        assert executor.failures == 0
+        assert set(figures) == set(served.CATEGORY_FIGURES)
+    finally:
+        executor.shutdown()
+
+def test_score_classifies_like_the_scorer(dashboard):
+    client = dashboard.app.test_client()
+    texts = ['This cable is great, works perfectly!', 'Terrible battery, it broke after a week.', 'It is a cable.']
+    results = client.post('/score', json={'texts': texts}).get_json()['results']
+    scorer = SentimentScorer()
+    assert [result['sentiment'] for result in results] == [scorer.score(preprocess(text))['sentiment'] for text in texts]
+    single = client.post('/score', json={'text': texts[0]}).get_json()
+    assert single == results[0]
+
+
+@pytest.mark.parametrize('body', [{'texts': 'not a list'}, [1, 2], {'other': 'text'}])
+def test_score_rejects_anything_but_texts(dashboard, body):
+    response = dashboard.app.test_client().post('/score', json=body)
+    assert response.status_code == 400
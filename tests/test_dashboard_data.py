@@ -0,0 +1,122 @@
+"""DashboardLoader and DatasetReloader: one load at a time, swapped when the CSV or its snapshot changes"""
+import threading
+import time
+
+import pytest
+
+from dashboard_data import DashboardData, DashboardLoader
+from dataset_reloader import DatasetReloader
+from dataset_snapshot import fingerprint_version, load_reviews, read_reviews_csv, source_fingerprint, write_snapshot
+from review_store import ReviewStore
+
+
+def test_concurrent_first_requests_share_one_load():
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    loader = DashboardLoader(load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(loader.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert len(set(map(id, results))) == 1
+    assert loader.ready
+
+
+def test_a_failed_load_is_retried():
+    attempts = []
+
+    def load():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError('dataset not readable yet')
+        return 'data'
+
+    loader = DashboardLoader(load)
+    with pytest.raises(OSError):
+        loader.get()
+    assert not loader.ready
+    assert loader.get() == 'data'
+
+
+class Version:
+    def __init__(self, version, ingested=0):
+        self.version = version
+        self.source_version = version
+        self.ingested = ingested
+
+    def nbytes(self):
+        return 0
+
+
+def test_reload_swaps_the_data_and_waits_for_the_old_version_to_be_freed():
+    versions = iter(['v1', 'v2', 'v3', 'v4'])
+    loader = DashboardLoader(lambda: Version(next(versions)))
+    first = loader.get()
+    second = loader.reload()
+    assert (second.version, loader.get().version, loader.generation) == ('v2', 'v2', 2)
+    # A request still holds v1, so a third version is not loaded next to it
+    assert loader.reload() is None
+    assert loader.previous_data() is first
+    del first
+    assert loader.reload().version == 'v3'
+
+
+def test_reloads_count_the_ingested_reviews_they_discard(caplog):
+    loader = DashboardLoader(lambda: Version('v2'))
+    loader.data = Version('v1+3', ingested=3)
+    with caplog.at_level('WARNING', logger='dashboard_data'):
+        loader.reload()
+    assert loader.discarded_reviews == 3
+    assert loader.status()['discarded_reviews'] == 3
+    assert 'discarded 3 ingested reviews' in caplog.text
+
+def test_reloader_swaps_once_the_csv_settled_on_new_contents(tmp_path):
+    csv_path = tmp_path / 'reviews.csv'
+    csv_path.write_text('asin,overall\nB1,5\n')
+    loader = DashboardLoader(lambda: Version(fingerprint_version(source_fingerprint(str(csv_path)))))
+    loader.get()
+    reloaded = []
+    reloader = DatasetReloader(str(csv_path), loader, interval=0, on_reload=reloaded.append)
+    assert reloader.check() is None
+    assert reloader.check() is None
+    assert loader.reloads == 0
+
+    csv_path.write_text('asin,overall\nB1,5\nB2,1\n')
+    assert reloader.check() is None
+    new_data = reloader.check()
+    assert new_data is loader.get()
+    assert reloaded == [new_data]
+    assert reloader.check() is None
+
+
+def test_reloader_swaps_in_a_rebuilt_snapshot(reviews, tmp_path):
+    csv_path = str(tmp_path / 'reviews.csv')
+    reviews.iloc[:500].to_csv(csv_path, index=False)
+    loader = DashboardLoader(lambda: DashboardData(load_reviews(csv_path)))
+    first = loader.get()
+    reloader = DatasetReloader(csv_path, loader, interval=0)
+    assert reloader.check() is None
+    assert reloader.check() is None
+
+    # What running dataset_snapshot.py on the served CSV does
+    write_snapshot(read_reviews_csv(csv_path), csv_path)
+    assert reloader.check() is None
+    second = reloader.check()
+    assert second is loader.get()
+    assert second.version == first.version
+    assert reloader.check() is None
+
+    # A rebuild holds no new reviews, so it does not replace ingested ones
+    loader.update(lambda data: data.append(ReviewStore.from_frame(reviews.iloc[500:510].reset_index(drop=True))))
+    write_snapshot(read_reviews_csv(csv_path), csv_path)
+    assert reloader.check() is None
+    assert reloader.check() is None
+    assert loader.get().ingested == 10
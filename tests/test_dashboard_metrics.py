@@ -0,0 +1,27 @@
+"""Prometheus text rendering of the dashboard metrics"""
+import pytest
+
+from dashboard_metrics import MetricsRegistry
+
+
+def test_counters_and_histograms_render_in_the_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter('requests_total', 'Requests served', labels=['route'])
+    latency = registry.histogram('latency_seconds', 'Request latency', buckets=(0.1, 1))
+    requests.inc(route='/')
+    requests.inc(2, route='/')
+    latency.observe(0.05)
+    latency.observe(5)
+    lines = registry.render().decode().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{route="/"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+
+
+def test_metrics_reject_unknown_labels():
+    counter = MetricsRegistry().counter('requests_total', 'Requests served', labels=['route'])
+    with pytest.raises(ValueError):
+        counter.inc(status='200')
@@ -0,0 +1,34 @@
+"""Snapshot of the dashboard columns against parsing the CSV"""
+import os
+
+from dataset_snapshot import load_reviews, read_manifest, read_reviews_csv, snapshot_path
+
+
+def assert_same_store(store, expected):
+    assert list(store.frame.columns) == list(expected.frame.columns)
+    for name in expected.frame.columns:
+        assert store.frame[name].tolist() == expected.frame[name].tolist(), name
+    assert store.titles.tolist() == expected.titles.tolist()
+
+
+def test_snapshot_matches_the_csv(reviews, tmp_path):
+    csv_path = str(tmp_path / 'reviews.csv')
+    reviews.to_csv(csv_path, index=False)
+    parsed = read_reviews_csv(csv_path)
+
+    first = load_reviews(csv_path)
+    assert read_manifest(snapshot_path(csv_path))['rows'] == len(reviews)
+    second = load_reviews(csv_path)
+    for store in [first, second]:
+        assert_same_store(store, parsed)
+
+
+def test_changed_csv_rebuilds_the_snapshot(reviews, tmp_path):
+    csv_path = str(tmp_path / 'reviews.csv')
+    reviews.iloc[:100].to_csv(csv_path, index=False)
+    assert len(load_reviews(csv_path)) == 100
+
+    reviews.iloc[:200].to_csv(csv_path, index=False)
+    os.utime(csv_path, ns=(0, 0))
+    assert len(load_reviews(csv_path)) == 200
+    assert read_manifest(snapshot_path(csv_path))['rows'] == 200
@@ -0,0 +1,55 @@
+"""FigureExecutor: concurrent builds match serial ones and slow or failed figures get placeholders"""
+import threading
+
+import pytest
+
+from figure_executor import FigureExecutor
+from figure_graph import FigureGraph
+from test_figures import Data, value_graph
+
+
+@pytest.mark.parametrize('kind', ['thread', 'serial'])
+def test_builds_match_the_graph(kind):
+    executor = FigureExecutor(value_graph(), kind=kind)
+    try:
+        figures, replaced = executor.build(['scaled', 'shifted'], Data('v1', 2), factor=10)
+    finally:
+        executor.shutdown()
+    assert figures == {'scaled': 20, 'shifted': 21}
+    assert replaced == []
+
+
+def test_figures_over_the_time_budget_are_replaced_by_placeholders():
+    release = threading.Event()
+    graph = FigureGraph()
+    graph.add('fast', lambda data: 'fast figure')
+    graph.add('slow', lambda data: release.wait(5) and 'slow figure')
+    executor = FigureExecutor(graph, timeout=0.05, placeholder=lambda name: f'{name} placeholder')
+    try:
+        figures, replaced = executor.build(['fast', 'slow'], Data('v1', 2))
+    finally:
+        release.set()
+        executor.shutdown()
+    assert figures == {'fast': 'fast figure', 'slow': 'slow placeholder'}
+    assert replaced == ['slow']
+    assert executor.timeouts == 1
+
+
+def test_process_executors_need_a_builder():
+    with pytest.raises(ValueError):
+        FigureExecutor(value_graph(), kind='process')
+
+
+@pytest.mark.parametrize('kind', ['thread', 'serial'])
+def test_failed_figures_are_replaced_by_placeholders(kind):
+    graph = FigureGraph()
+    graph.add('good', lambda data: 'figure')
+    graph.add('bad', lambda data: 1 / 0)
+    executor = FigureExecutor(graph, kind=kind, timeout=10, placeholder=lambda name: f'placeholder {name}')
+    try:
+        figures, replaced = executor.build(['good', 'bad'], Data('v1', 1))
+    finally:
+        executor.shutdown()
+    assert figures == {'good': 'figure', 'bad': 'placeholder bad'}
+    assert replaced == ['bad']
+    assert executor.failures == 1
@@ -0,0 +1,26 @@
+"""Single-pass encoding of plain-dict figures"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from figure_json import dumps, encode_panels, payload_sizes
+
+
+def test_numpy_and_pandas_values_encode_as_plain_json():
+    figure = {
+        'data': [{'x': np.array([1, 2, 3]), 'y': pd.Series([0.5, 1.5, 2.5]), 'name': np.str_('a')}],
+        'layout': {'height': np.int64(400), 'labels': pd.Index(['p', 'q'])}
+    }
+    assert json.loads(dumps(figure)) == {
+        'data': [{'x': [1, 2, 3], 'y': [0.5, 1.5, 2.5], 'name': 'a'}],
+        'layout': {'height': 400, 'labels': ['p', 'q']}
+    }
+
+
+def test_panels_are_encoded_once_into_one_object():
+    panels = {'first': {'data': [], 'layout': {'title': 'First'}}, 'second': {'data': [{'y': np.arange(3)}]}}
+    body = json.loads(encode_panels(panels, include_template=False))
+    assert body == {'first': {'data': [], 'layout': {'title': 'First'}}, 'second': {'data': [{'y': [0, 1, 2]}]}}
+    assert payload_sizes.snapshot()['first']['last_bytes'] == len(dumps(panels['first']))
+    assert 'template' in json.loads(encode_panels(panels))
@@ -0,0 +1,66 @@
+"""FigureGraph: intermediates shared within a request and memoized per dataset"""
+import pytest
+
+from figure_graph import FigureGraph
+
+
+class Data:
+    def __init__(self, version, value):
+        self.version = version
+        self.value = value
+        self.ingested = 0
+
+
+def value_graph():
+    graph = FigureGraph()
+    graph.add('total', lambda data: data.value, per_dataset=True)
+    graph.add('scaled', lambda data, factor, total: total * factor, deps=['total'], params=['factor'])
+    graph.add('shifted', lambda data, factor, scaled: scaled + 1, deps=['scaled'], params=['factor'])
+    return graph
+
+
+def calls(graph, name):
+    return graph.node_timings().get(name, {}).get('calls', 0)
+
+
+def test_shared_intermediates_are_built_once_per_request():
+    graph = value_graph()
+    data = Data('v1', 2)
+    assert graph.evaluate(['scaled', 'shifted'], data, factor=10) == {'scaled': 20, 'shifted': 21}
+    assert calls(graph, 'scaled') == 1
+    graph.evaluate(['shifted'], data, factor=10)
+    assert calls(graph, 'scaled') == 2
+
+
+def test_per_dataset_nodes_are_memoized_across_requests():
+    graph = value_graph()
+    data = Data('v1', 2)
+    assert graph.evaluate(['scaled'], data, factor=10) == {'scaled': 20}
+    assert graph.evaluate(['scaled'], data, factor=3) == {'scaled': 6}
+    assert calls(graph, 'total') == 1
+
+
+def test_unknown_dependencies_are_rejected():
+    graph = FigureGraph()
+    with pytest.raises(ValueError):
+        graph.add('plot', lambda data, missing: None, deps=['missing'])
+
+
+def test_per_dataset_values_are_kept_per_version():
+    graph = value_graph()
+    old, new = Data('v1', 1), Data('v2', 2)
+    # Requests of the replaced version still running while the new one is served
+    assert graph.evaluate(['scaled'], old, factor=10) == {'scaled': 10}
+    assert graph.evaluate(['scaled'], new, factor=10) == {'scaled': 20}
+    assert graph.evaluate(['scaled'], old, factor=10) == {'scaled': 10}
+    assert graph.evaluate(['total'], new) == {'total': 2}
+    assert calls(graph, 'total') == 2
+
+
+def test_per_dataset_values_are_freed_with_their_data():
+    graph = value_graph()
+    data = Data('v1', 1)
+    graph.evaluate(['total'], data)
+    assert len(graph.memos) == 1
+    del data
+    assert len(graph.memos) == 0
@@ -0,0 +1,37 @@
+"""Vectorized top-k product ranking against the per-product loop it replaced"""
+import numpy as np
+import pytest
+
+from product_ranking import MIN_PRODUCT_REVIEWS, ProductRanking, top_k_positions
+from review_store import ReviewStore
+from sentiment_cube import SentimentCube
+
+
+def loop_scores(df, sentiment_type):
+    """sentiment_score of every ranked product, scored one product at a time"""
+    df = df[df['title'] != 'Untitled']
+    counts = df['asin'].value_counts()
+    scores = []
+    for asin in counts[counts >= MIN_PRODUCT_REVIEWS].index:
+        sentiments = df.loc[df['asin'] == asin, 'sentiment'].value_counts()
+        count = sentiments.get(sentiment_type, 0)
+        rest = len(df[df['asin'] == asin]) - count
+        scores.append(count * (count / (rest if rest > 0 else 1)))
+    return sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize('sentiment_type', ['positive', 'negative'])
+def test_ranking_matches_the_product_loop(reviews, sentiment_type):
+    ranking = ProductRanking(SentimentCube.from_store(ReviewStore.from_frame(reviews)))
+    for category in [None, 'Computers', 'Office Products']:
+        df = reviews if category is None else reviews[reviews['overall_category'] == category]
+        top = ranking.top(category, sentiment_type)
+        assert top['sentiment_score'].tolist() == pytest.approx(loop_scores(df, sentiment_type)[:ranking.k])
+
+
+def test_top_k_breaks_ties_by_total_then_position():
+    score = np.array([1.0, 3.0, 3.0, 2.0, 3.0, 0.5])
+    total = np.array([9, 10, 20, 5, 10, 1])
+    expected = np.lexsort((np.arange(len(score)), -total, -score))[:3]
+    np.testing.assert_array_equal(top_k_positions(score, total, 3), expected)
+    np.testing.assert_array_equal(top_k_positions(score[:2], total[:2], 3), [1, 0])
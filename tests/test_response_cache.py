@@ -0,0 +1,92 @@
+"""Size-bounded LRU eviction of the response cache, its compressed variants and single-flight builds"""
+import gzip
+import threading
+import time
+
+import pytest
+
+from response_cache import MIN_COMPRESS_BYTES, ResponseCache, make_etag, negotiate
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    cache = ResponseCache(max_bytes=30)
+    cache.put('a', b'a' * 10)
+    cache.put('b', b'b' * 10)
+    cache.put('c', b'c' * 10)
+    assert cache.get('a').body == b'a' * 10
+    cache.put('d', b'd' * 10)
+    assert cache.get('b') is None
+    assert [cache.get(key) is not None for key in 'acd'] == [True, True, True]
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (3, 30, 1)
+
+
+def test_bodies_over_the_limit_are_served_but_not_stored():
+    cache = ResponseCache(max_bytes=10)
+    entry = cache.put('big', b'x' * 11)
+    assert entry.etag == make_etag(b'x' * 11)
+    assert cache.get('big') is None
+    assert cache.stats()['bytes'] == 0
+
+
+def test_replacing_an_entry_keeps_the_size_exact():
+    cache = ResponseCache(max_bytes=100)
+    cache.put('a', b'a' * 40)
+    cache.put('a', b'a' * 10)
+    assert cache.stats()['bytes'] == 10
+
+
+def test_compressed_variants_are_negotiated_and_counted():
+    body = b'{"figure": "bar"}' * 200
+    cache = ResponseCache(max_bytes=10 ** 6)
+    entry = cache.put('a', body)
+    assert gzip.decompress(entry.encoded['gzip']) == body
+    assert cache.stats()['bytes'] == len(body) + sum(len(data) for data in entry.encoded.values())
+    assert negotiate(entry, {'br': False, 'gzip': True}) == ('gzip', entry.encoded['gzip'])
+    assert negotiate(entry, {'br': False, 'gzip': False}) == (None, body)
+    if 'br' in entry.encoded:
+        assert negotiate(entry, {'br': True, 'gzip': True})[0] == 'br'
+
+
+def test_small_bodies_are_not_compressed():
+    entry = ResponseCache(max_bytes=10 ** 6).put('a', b'x' * (MIN_COMPRESS_BYTES - 1))
+    assert entry.encoded == {}
+
+
+def test_concurrent_misses_share_one_build():
+    cache = ResponseCache(max_bytes=10 ** 6)
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.1)
+        return b'body', True
+    results = []
+    barrier = threading.Barrier(6)
+
+    def request():
+        barrier.wait()
+        results.append(cache.get_or_build('a', build))
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert {(entry.body, complete) for entry, complete in results} == {(b'body', True)}
+    assert cache.stats()['coalesced'] == 5
+    assert cache.get_or_build('a', build)[0].body == b'body'
+    assert len(builds) == 1
+
+
+def test_incomplete_and_failed_builds_are_not_stored():
+    cache = ResponseCache(max_bytes=10 ** 6)
+    entry, complete = cache.get_or_build('a', lambda: (b'placeholder', False))
+    assert (entry.body, complete) == (b'placeholder', False)
+    assert cache.get('a') is None
+
+    def fail():
+        raise RuntimeError('figure failed')
+    with pytest.raises(RuntimeError):
+        cache.get_or_build('b', fail)
+    assert cache.get_or_build('b', lambda: (b'body', True))[0].body == b'body'
@@ -0,0 +1,32 @@
+"""ScoreBatcher: concurrent requests are scored together, each getting its own rows"""
+import threading
+
+import numpy as np
+
+from score_batcher import ScoreBatcher
+from sentiment_scoring import SentimentScorer
+
+
+def test_concurrent_requests_share_batches():
+    batcher = ScoreBatcher(max_batch=100, max_wait=0.5)
+    requests = [['great cable works'], ['terrible battery broke', 'fine price'], ['great cable works'], []]
+    results = [None] * len(requests)
+
+    def post(index):
+        results[index] = batcher.score(requests[index], timeout=30)
+    threads = [threading.Thread(target=post, args=(index,)) for index in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    scorer = SentimentScorer()
+    for texts, scores in zip(requests, results):
+        assert scores.shape == (len(texts), 3)
+        np.testing.assert_allclose(scores, [scorer.raw_scores(text) for text in texts] or np.empty((0, 3)))
+    stats = batcher.stats()
+    assert stats['texts'] == 4
+    assert stats['batches'] < 3
+    if stats['batches'] == 1:
+        # Texts repeated within a batch are analyzed once
+        assert stats['analyzed'] == 3
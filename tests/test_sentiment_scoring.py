@@ -0,0 +1,39 @@
+"""Vectorized ensemble classification against the scalar classify()"""
+import numpy as np
+import pytest
+
+from sentiment_scoring import THRESHOLDS, classify, classify_codes, classify_scores
+
+
+def raw_score_arrays(size=20_000, seed=0):
+    """Random raw scores, with values on and around the thresholds mixed in"""
+    rng = np.random.default_rng(seed)
+    edges = np.array([0.0, THRESHOLDS.neutral_score, -THRESHOLDS.neutral_score, THRESHOLDS.neutral_combined,
+                      THRESHOLDS.polarity, -THRESHOLDS.polarity, 1.0, -1.0])
+    vader = np.where(rng.random(size) < 0.2, rng.choice(edges, size), rng.uniform(-1, 1, size))
+    polarity = np.where(rng.random(size) < 0.2, rng.choice(edges, size), rng.uniform(-1, 1, size))
+    subjectivity = np.where(rng.random(size) < 0.2,
+                            rng.choice([0.0, THRESHOLDS.neutral_subjectivity,
+                                        THRESHOLDS.objective_subjectivity, 1.0], size),
+                            rng.uniform(0, 1, size))
+    return vader, polarity, subjectivity
+
+
+@pytest.mark.parametrize('thresholds', [THRESHOLDS, THRESHOLDS._replace(neutral_confidence=0.4, polarity=0.2)])
+def test_classify_scores_matches_classify(thresholds):
+    vader, polarity, subjectivity = raw_score_arrays()
+    sentiment, neutral_confidence = classify_scores(vader, polarity, subjectivity, thresholds)
+    expected = [classify(v, p, s, thresholds) for v, p, s in zip(vader.tolist(), polarity.tolist(),
+                                                                  subjectivity.tolist())]
+    assert sentiment.tolist() == [label for label, _ in expected]
+    assert neutral_confidence.tolist() == [confidence for _, confidence in expected]
+
+
+def test_classify_codes_broadcasts_configurations():
+    vader, polarity, subjectivity = raw_score_arrays(size=2000, seed=1)
+    polarities = np.array([0.0, 0.1, 0.3])
+    codes, _ = classify_codes(vader, polarity, subjectivity, THRESHOLDS._replace(polarity=polarities[:, None]))
+    assert codes.shape == (len(polarities), len(vader))
+    for row, value in enumerate(polarities):
+        expected, _ = classify_codes(vader, polarity, subjectivity, THRESHOLDS._replace(polarity=value))
+        np.testing.assert_array_equal(codes[row], expected)
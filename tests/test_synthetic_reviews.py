@@ -0,0 +1,19 @@
+"""Synthetic datasets: reproducible, and loadable by the dashboard"""
+import pandas as pd
+
+from dataset_snapshot import load_reviews
+from synthetic_reviews import generate, write_csv
+
+
+def test_chunks_are_reproducible_and_add_up():
+    chunks = list(generate(2500, seed=3, chunk_rows=1000))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    again = pd.concat(generate(2500, seed=3, chunk_rows=1000), ignore_index=True)
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), again)
+
+
+def test_written_datasets_load_into_a_review_store(tmp_path):
+    path = write_csv(str(tmp_path / 'reviews.csv'), 2000, seed=2)
+    store = load_reviews(path)
+    assert len(store) == 2000
+    assert set(pd.read_csv(path, nrows=1).columns) >= {'asin', 'overall', 'sentiment', 'review_date'}